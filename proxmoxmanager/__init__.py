@@ -1 +1,25 @@
-from .main import ProxmoxManager
+from importlib import import_module
+
+__version__ = "1.0.4"
+
+# Submodules are imported on first access, so that "import proxmoxmanager" stays cheap
+_LAZY_ATTRIBUTES = {
+    "ProxmoxManager": ".main",
+    "FederatedProxmoxManager": ".federation",
+    "FederatedResult": ".federation",
+    "FederationError": ".federation",
+}
+
+__all__ = ["__version__", *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()))
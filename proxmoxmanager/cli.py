@@ -0,0 +1,336 @@
+from . import __version__
+from typing import Any, Callable, Dict, IO, Iterable, List, Union, TYPE_CHECKING
+from fnmatch import fnmatchcase
+import argparse
+import json
+import os
+import sys
+
+# Manager classes and API libraries are only loaded once arguments are parsed, so --version and usage errors are fast
+if TYPE_CHECKING:
+    from .main import ProxmoxManager
+    from proxmoxmanager.utils import ProxmoxVM, ProxmoxContainer
+
+# Commands that run one action for every selected VM/container
+_GUEST_ACTIONS = ("start", "stop", "shutdown", "reboot", "delete", "migrate")
+# Guests in this state don't need the action, so it is reported as "unchanged" without calling API
+_SKIP_STATUS = {"start": "running", "stop": "stopped", "shutdown": "stopped"}
+
+
+def parse_ids(specs: Iterable[str]) -> List[str]:
+    """
+    Parse VM/container IDs given as single IDs and ranges, e.g. ["100", "105-107,110"]
+    :param specs: List of strings with comma-separated IDs and ranges
+    :return: List of IDs in string format in given order without duplicates
+    """
+    res = []
+    for spec in specs:
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            first, sep, last = part.partition("-")
+            if not first.isdigit() or (sep and not last.isdigit()):
+                raise ValueError(f"Invalid ID or range: {part}")
+            if sep and int(last) < int(first):
+                raise ValueError(f"Invalid range: {part}")
+            for vmid in range(int(first), int(last if sep else first) + 1):
+                if str(vmid) not in res:
+                    res.append(str(vmid))
+    return res
+
+
+def select_guests(resources: List[Dict[str, Any]], ids: List[str] = None, node: str = None, name: str = None,
+                  status: str = None, guest_type: str = None, templates: bool = False) -> List[Dict[str, Any]]:
+    """
+    Select VMs and containers from cluster resources
+    :param resources: Cluster resources in JSON-like format (as returned by list_resources(type="vm"))
+    :param ids: Only select guests with these IDs (optional)
+    :param node: Only select guests on this node (optional)
+    :param name: Only select guests whose name matches this shell-style pattern, e.g. "web-*" (optional)
+    :param status: Only select guests with this status, e.g. "running" (optional)
+    :param guest_type: Only select guests of this type ("qemu" or "lxc") (optional)
+    :param templates: Whether to select templates too (optional, default=False)
+    :return: List of guests' info in JSON-like format sorted by ID
+    """
+    wanted = set(ids) if ids else None
+    res = []
+    for el in resources:
+        if el.get("type") not in ("qemu", "lxc") or (el.get("template") and not templates):
+            continue
+        if wanted is not None and str(el["vmid"]) not in wanted:
+            continue
+        if node is not None and el.get("node") != node:
+            continue
+        if name is not None and not fnmatchcase(el.get("name", ""), name):
+            continue
+        if status is not None and el.get("status") != status:
+            continue
+        if guest_type is not None and el["type"] != guest_type:
+            continue
+        res.append(el)
+    return sorted(res, key=lambda el: int(el["vmid"]))
+
+
+def stream_results(results: Iterable[Dict[str, Any]], out: IO[str]) -> int:
+    """
+    Write results as newline-delimited JSON as soon as they are ready
+    :param results: Results in JSON-like format
+    :param out: Text stream
+    :return: Number of results with "error" status
+    """
+    errors = 0
+    for result in results:
+        if result.get("status") == "error":
+            errors += 1
+        out.write(json.dumps(result, separators=(",", ":"), default=str) + "\n")
+        out.flush()
+    return errors
+
+
+def run_guest_action(manager: 'ProxmoxManager', guests: List[Dict[str, Any]],
+                     action: Callable[[Union['ProxmoxVM', 'ProxmoxContainer']], Any], name: str = None,
+                     parallel: int = 8, per_node: int = None, wait: bool = True,
+                     timeout: float = None) -> Iterable[Dict[str, Any]]:
+    """
+    Run action for many VMs/containers in parallel and yield results in order of completion
+    :param manager: ProxmoxManager object
+    :param guests: Guests' info in JSON-like format (as returned by select_guests)
+    :param action: Function that takes ProxmoxVM/ProxmoxContainer object and returns ID of started task,
+                   True if action was done without a task or None/False if nothing had to be done
+    :param name: Name of action used to skip guests that are already in wanted state (optional)
+    :param parallel: Maximum number of simultaneous actions (optional, default=8)
+    :param per_node: Maximum number of simultaneous actions per node (optional)
+    :param wait: Whether to wait for started tasks to finish (optional, default=True)
+    :param timeout: Number of seconds to wait for each task (optional)
+    :return: Generator of results in JSON-like format
+             ({"id": ..., "type": ..., "node": ..., "task": ..., "status": "ok"/"unchanged"/"running"/"error",
+             "error": ...})
+    """
+    from proxmoxmanager.utils import ProxmoxVM, ProxmoxContainer, ProxmoxTask, iter_in_parallel
+    api = manager._api
+
+    def call(el):
+        if name in _SKIP_STATUS and el.get("status") == _SKIP_STATUS[name]:
+            return None
+        guest_class = ProxmoxVM if el["type"] == "qemu" else ProxmoxContainer
+        upid = action(guest_class(api, str(el["vmid"]), el["node"]))
+        exit_status = None
+        if wait and isinstance(upid, str):
+            # Waiting inside worker keeps number of running tasks limited by --parallel
+            exit_status = ProxmoxTask(api, upid).wait(timeout=timeout)
+        return upid, exit_status
+
+    for el, outcome, exception in iter_in_parallel(call, guests, concurrency=parallel,
+                                                   group_key=lambda el: el["node"], group_limit=per_node):
+        result = {"id": str(el["vmid"]), "type": el["type"], "node": el["node"], "task": None, "status": "ok",
+                  "error": None}
+        if exception is not None:
+            result.update(status="error", error=str(exception))
+        elif outcome is None or not outcome[0]:
+            result["status"] = "unchanged"
+        else:
+            upid, exit_status = outcome
+            if isinstance(upid, str):
+                result["task"] = upid
+                if not wait:
+                    result["status"] = "running"
+                elif exit_status != "OK":
+                    result.update(status="error", error=exit_status)
+        yield result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    :return: Argument parser of proxmoxmanager command
+    """
+    parser = argparse.ArgumentParser(prog="proxmoxmanager", description="Manage Proxmox VE cluster. Results are "
+                                     "printed as newline-delimited JSON as soon as they are ready.")
+    parser.add_argument("--version", action="version", version=__version__)
+    parser.add_argument("--host", action="append",
+                        help="Proxmox host with optional port, can be repeated for failover (env: PROXMOX_HOST, "
+                             "comma-separated)")
+    parser.add_argument("--user", default=os.environ.get("PROXMOX_USER"),
+                        help="User that owns API token (env: PROXMOX_USER)")
+    parser.add_argument("--token-name", default=os.environ.get("PROXMOX_TOKEN_NAME"),
+                        help="Name of API token (env: PROXMOX_TOKEN_NAME)")
+    parser.add_argument("--token-value", default=os.environ.get("PROXMOX_TOKEN_VALUE"),
+                        help="Secret value of API token (env: PROXMOX_TOKEN_VALUE)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    def add_selectors(command):
+        command.add_argument("ids", nargs="*", help="IDs and ranges, e.g. 100 105-110,120")
+        command.add_argument("--node", help="Only select guests on this node")
+        command.add_argument("--name", help="Only select guests whose name matches shell-style pattern")
+        command.add_argument("--status", help="Only select guests with this status, e.g. running")
+        command.add_argument("--type", dest="guest_type", choices=("qemu", "lxc"), help="Only select VMs or "
+                             "containers")
+        command.add_argument("--templates", action="store_true", help="Select templates too")
+        command.add_argument("--all", action="store_true", help="Select all guests if no IDs or filters are given")
+
+    def add_bulk_options(command):
+        command.add_argument("--parallel", type=int, default=8, help="Maximum number of simultaneous actions "
+                             "(default: 8)")
+        command.add_argument("--per-node", type=int, help="Maximum number of simultaneous actions per node")
+        command.add_argument("--no-wait", dest="wait", action="store_false", help="Don't wait for tasks to finish")
+        command.add_argument("--timeout", type=float, help="Number of seconds to wait for each task")
+
+    inventory = commands.add_parser("inventory", help="List VMs and containers")
+    add_selectors(inventory)
+    commands.add_parser("nodes", help="List nodes")
+
+    for name in _GUEST_ACTIONS:
+        command = commands.add_parser(name, help=f"{name.capitalize()} selected VMs and containers")
+        add_selectors(command)
+        add_bulk_options(command)
+        if name == "delete":
+            command.add_argument("--purge", action="store_true", help="Also remove from backup jobs, HA and "
+                                 "replication")
+        if name == "migrate":
+            command.add_argument("--target", required=True, help="Target node")
+            command.add_argument("--bwlimit", type=int, help="Bandwidth limit in KiB/s")
+
+    clone = commands.add_parser("clone", help="Clone VM or container into one or many new guests")
+    clone.add_argument("source", help="ID of VM or container to clone")
+    clone.add_argument("--newid", required=True, nargs="+", help="IDs and ranges of new guests")
+    clone.add_argument("--name-prefix", help="Name new guests <prefix><id>")
+    clone.add_argument("--target-node", help="Node of new guests")
+    clone.add_argument("--linked", action="store_true", help="Make linked clones")
+    clone.add_argument("--storage", help="Target storage of full clones, \"auto\" for storage with most free space")
+    add_bulk_options(clone)
+
+    permission = commands.add_parser("permission", help="Add or remove permission on selected guests")
+    permission.add_argument("operation", choices=("add", "remove"))
+    add_selectors(permission)
+    permission.add_argument("--user", dest="permission_user", required=True, help="User ID")
+    permission.add_argument("--role", required=True, help="Role name, e.g. PVEVMUser")
+    permission.add_argument("--parallel", type=int, default=8, help="Maximum number of simultaneous API calls "
+                            "(default: 8)")
+
+    user = commands.add_parser("user", help="List, create or delete users")
+    user.add_argument("operation", choices=("list", "create", "delete"))
+    user.add_argument("users", nargs="*", help="User IDs")
+    user.add_argument("--realm", help="Realm of listed users, all realms if not given")
+    user.add_argument("--password", default=os.environ.get("PROXMOX_NEW_USER_PASSWORD"),
+                      help="Password of created users (env: PROXMOX_NEW_USER_PASSWORD)")
+    user.add_argument("--token", help="Also create API token with this name for created users")
+    user.add_argument("--parallel", type=int, default=8, help="Maximum number of simultaneous API calls "
+                      "(default: 8)")
+    return parser
+
+
+def main(argv: List[str] = None, manager: 'ProxmoxManager' = None, out: IO[str] = None) -> int:
+    """
+    Entry point of proxmoxmanager command
+    :param argv: Command-line arguments (optional, default=sys.argv[1:])
+    :param manager: ProxmoxManager object used instead of connecting with given credentials (optional)
+    :param out: Stream for results (optional, default=sys.stdout)
+    :return: Exit code (0 if no errors, 1 if some action failed)
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    out = out or sys.stdout
+    if manager is None:
+        from .main import ProxmoxManager
+        hosts = args.host or [host for host in os.environ.get("PROXMOX_HOST", "").split(",") if host]
+        if not hosts or not args.user or not args.token_name or not args.token_value:
+            parser.error("host, user, token name and token value are required")
+        manager = ProxmoxManager(host=hosts, user=args.user, token_name=args.token_name,
+                                 token_value=args.token_value)
+    try:
+        errors = _run_command(manager, args, out)
+    except ValueError as e:
+        parser.error(str(e))
+    return 1 if errors else 0
+
+
+def _run_command(manager: 'ProxmoxManager', args: argparse.Namespace, out: IO[str]) -> int:
+    api = manager._api
+    if args.command == "nodes":
+        return stream_results(api.list_resources(type="node"), out)
+    if args.command == "clone":
+        return stream_results(_clone(manager, args), out)
+    if args.command == "user":
+        return stream_results(_user_command(manager, args), out)
+
+    guests = select_guests(api.list_resources(type="vm"), ids=parse_ids(args.ids), node=args.node,
+                           name=args.name, status=args.status, guest_type=args.guest_type, templates=args.templates)
+    if args.command == "inventory":
+        return stream_results(guests, out)
+    # Actions are never run for the whole cluster by accident
+    if not args.all and not any((args.ids, args.node, args.name, args.status, args.guest_type)):
+        raise ValueError("Select guests by IDs or filters or use --all")
+    if not guests:
+        raise ValueError("No VMs or containers selected")
+    if args.command == "permission":
+        def action(guest):
+            method = guest.add_permission if args.operation == "add" else guest.remove_permission
+            method(args.permission_user, args.role)
+            return True
+
+        return stream_results(run_guest_action(manager, guests, action, parallel=args.parallel), out)
+    return stream_results(run_guest_action(manager, guests, _guest_action(args), name=args.command,
+                                           parallel=args.parallel, per_node=args.per_node, wait=args.wait,
+                                           timeout=args.timeout), out)
+
+
+def _guest_action(args: argparse.Namespace) -> Callable[[Union['ProxmoxVM', 'ProxmoxContainer']], Any]:
+    if args.command == "delete":
+        return lambda guest: guest.delete(purge=args.purge)
+    if args.command == "migrate":
+        return lambda guest: guest.migrate(args.target, bwlimit=args.bwlimit)
+    return lambda guest: getattr(guest, args.command)()
+
+
+def _clone(manager: 'ProxmoxManager', args: argparse.Namespace) -> Iterable[Dict[str, Any]]:
+    sources = select_guests(manager._api.list_resources(type="vm"), ids=parse_ids([args.source]), templates=True)
+    if not sources:
+        raise ValueError(f"VM or container {args.source} not found")
+    from proxmoxmanager.utils import ProxmoxVM, ProxmoxContainer
+    source = sources[0]
+    source_guest = (ProxmoxVM if source["type"] == "qemu" else ProxmoxContainer)(manager._api, str(source["vmid"]),
+                                                                                 source["node"])
+    storage = args.storage
+    if storage == "auto":
+        content = "images" if source["type"] == "qemu" else "rootdir"
+        storage = manager.storages.choose_by_most_free_space(content, node=args.target_node or source["node"],
+                                                             min_free=int(source.get("maxdisk") or 0)).id
+    # Results are reported by new IDs, so every new guest is listed as a copy of source
+    targets = [dict(source, vmid=newid, status=None) for newid in parse_ids(args.newid)]
+
+    def clone(new_guest):
+        name = f"{args.name_prefix}{new_guest.id}" if args.name_prefix else None
+        return source_guest.clone(new_guest.id, newnode=args.target_node, name=name, full=not args.linked,
+                                  storage=storage)
+
+    return run_guest_action(manager, targets, clone, parallel=args.parallel, per_node=args.per_node,
+                            wait=args.wait, timeout=args.timeout)
+
+
+def _user_command(manager: 'ProxmoxManager', args: argparse.Namespace) -> Iterable[Dict[str, Any]]:
+    if args.operation == "list":
+        users = manager.get_users(realm=args.realm)
+        return ({"id": user.fullid, "enabled": user.enabled(), "expired": user.expired()} for user in users.values())
+    if not args.users:
+        raise ValueError("At least one user is required")
+    if args.operation == "create":
+        if not args.password:
+            raise ValueError("Password is required to create users")
+        specs = [dict(user=user, password=args.password, **({"token": args.token} if args.token else {}))
+                 for user in args.users]
+        results = manager.get_users(realm=None).create_many(specs, concurrency=args.parallel)
+        return (dict(id=user, **result) for user, result in results.items())
+
+    from proxmoxmanager.utils import ProxmoxUser, iter_in_parallel
+
+    def delete(user):
+        # Users are deleted directly, without listing all users for every one of them
+        ProxmoxUser(manager._api, user).delete()
+
+    return ({"id": user, "status": "error" if exception else "ok", "error": str(exception) if exception else None}
+            for user, _, exception in iter_in_parallel(delete, args.users, concurrency=args.parallel))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
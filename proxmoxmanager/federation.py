@@ -0,0 +1,216 @@
+from .main import ProxmoxManager
+from proxmoxmanager.utils import ProxmoxNode, ProxmoxVM, ProxmoxContainer, ProxmoxException, run_in_parallel
+from typing import Dict, Any, Callable, Union, Tuple, List
+from threading import Lock
+import time
+
+
+class FederatedResult(dict):
+    """
+    Dict of results of clusters that answered, errors of clusters that failed are kept in errors field
+    """
+
+    def __init__(self, results: Dict[str, Any] = None, errors: Dict[str, str] = None):
+        """
+        :param results: Dict where keys are cluster or namespaced object names and values are results
+        :param errors: Dict where keys are cluster names and values are error messages (optional)
+        """
+        super().__init__(results or {})
+        self.errors: Dict[str, str] = dict(errors or {})
+
+
+class FederationError(ProxmoxException):
+    """
+    Raised in strict mode when some clusters failed, results of other clusters are still availible
+    """
+
+    def __init__(self, results: Dict[str, Any], errors: Dict[str, str]):
+        """
+        :param results: Results of clusters that answered
+        :param errors: Dict where keys are cluster names and values are error messages
+        """
+        super().__init__("Failed to query clusters: " + ", ".join(f"{name} ({error})" for name, error in
+                                                                  errors.items()))
+        self.results = results
+        self.errors = errors
+
+
+class FederatedProxmoxManager:
+    """
+    Manager of several independent Proxmox VE clusters that queries all of them concurrently.
+    Objects of different clusters are namespaced as "cluster/id" (e.g. "cluster1/100").
+    """
+
+    def __init__(self, clusters: Dict[str, Union[ProxmoxManager, Dict[str, str]]], concurrency: int = None):
+        """
+        :param clusters: Dict where keys are cluster names and values are ProxmoxManager objects or dicts of
+                         ProxmoxManager arguments (host, user, token_name, token_value)
+        :param concurrency: Maximum number of clusters queried simultaneously (optional, default=all of them)
+        """
+        if not clusters:
+            raise ValueError("At least one cluster is required")
+        if any("/" in name for name in clusters):
+            raise ValueError("Cluster names can't contain \"/\"")
+        self._managers: Dict[str, ProxmoxManager] = {
+            name: manager if isinstance(manager, ProxmoxManager) else ProxmoxManager(**manager)
+            for name, manager in clusters.items()}
+        self._concurrency = concurrency or len(self._managers)
+        self._latency: Dict[str, Dict[str, float]] = {
+            name: {"calls": 0, "errors": 0, "last": 0.0, "total": 0.0} for name in self._managers}
+        self._latency_lock = Lock()
+
+    @property
+    def managers(self) -> Dict[str, ProxmoxManager]:
+        """
+        :return: Dict of ProxmoxManager objects of each cluster (get-only)
+        """
+        return dict(self._managers)
+
+    @property
+    def latency(self) -> Dict[str, Dict[str, float]]:
+        """
+        Latency statistics of each cluster
+        :return: Dict where keys are cluster names and values are dicts with number of calls, number of errors,
+                 last and average latency in seconds
+        """
+        with self._latency_lock:
+            return {name: {"calls": stats["calls"], "errors": stats["errors"], "last": stats["last"],
+                           "average": stats["total"] / stats["calls"] if stats["calls"] else 0.0}
+                    for name, stats in self._latency.items()}
+
+    def map(self, func: Callable[[ProxmoxManager], Any], clusters: List[str] = None,
+            strict: bool = False) -> FederatedResult:
+        """
+        Call function for ProxmoxManager of every cluster concurrently
+        :param func: Function that takes ProxmoxManager object
+        :param clusters: Only call it for these clusters (optional)
+        :param strict: Whether to raise FederationError if some clusters failed instead of skipping them
+                       (optional, default=False)
+        :return: FederatedResult (dict where keys are cluster names and values are results of function, errors of
+                 failed clusters are in its errors field)
+        """
+        names = list(self._managers.keys()) if clusters is None else clusters
+
+        def call(name):
+            start = time.monotonic()
+            try:
+                return func(self._managers[name])
+            finally:
+                self._record_latency(name, time.monotonic() - start)
+
+        results = {}
+        errors = {}
+        for name, result, exception in run_in_parallel(call, names, concurrency=self._concurrency):
+            if exception is not None:
+                errors[name] = str(exception)
+                with self._latency_lock:
+                    self._latency[name]["errors"] += 1
+            else:
+                results[name] = result
+        if strict and errors:
+            raise FederationError(results, errors)
+        return FederatedResult(results, errors)
+
+    def list_resources(self, strict: bool = False, **kwargs) -> FederatedResult:
+        """
+        Get resources of all clusters merged into one view
+        :param strict: Whether to raise FederationError if some clusters failed (optional, default=False)
+        :param kwargs: Other arguments passed to Proxmox API (type)
+        :return: FederatedResult where keys are namespaced IDs ("cluster/id" as in Proxmox API) and values are
+                 resources' info in JSON-like format with additional "cluster" field
+        """
+        results = self.map(lambda manager: manager._api.list_resources(**kwargs), strict=strict)
+        merged = FederatedResult(errors=results.errors)
+        for name, resources in results.items():
+            for resource in resources:
+                merged[f"{name}/{resource['id']}"] = dict(resource, cluster=name)
+        return merged
+
+    def inventory(self, strict: bool = False) -> FederatedResult:
+        """
+        Get all VMs and containers of all clusters (one request per cluster)
+        :param strict: Whether to raise FederationError if some clusters failed (optional, default=False)
+        :return: FederatedResult where keys are namespaced IDs ("cluster/vmid") and values are guests' info in
+                 JSON-like format with additional "cluster" field
+        """
+        resources = self.list_resources(strict=strict, type="vm")
+        return FederatedResult({f"{el['cluster']}/{el['vmid']}": el for el in resources.values()}, resources.errors)
+
+    def nodes(self, strict: bool = False) -> FederatedResult:
+        """
+        Get all nodes of all clusters (one request per cluster)
+        :param strict: Whether to raise FederationError if some clusters failed (optional, default=False)
+        :return: FederatedResult where keys are namespaced IDs ("cluster/node") and values are nodes' info in
+                 JSON-like format with additional "cluster" field
+        """
+        resources = self.list_resources(strict=strict, type="node")
+        return FederatedResult({f"{el['cluster']}/{el['node']}": el for el in resources.values()}, resources.errors)
+
+    def guest(self, guest_id: str) -> Union[ProxmoxVM, ProxmoxContainer]:
+        """
+        Get VM or container by namespaced ID
+        :param guest_id: Namespaced ID ("cluster/vmid")
+        :return: ProxmoxVM or ProxmoxContainer object
+        """
+        name, vmid = self._split(guest_id)
+        api = self._managers[name]._api
+        for el in api.list_resources(type="vm"):
+            if str(el["vmid"]) == vmid:
+                return (ProxmoxVM if el["type"] == "qemu" else ProxmoxContainer)(api, vmid, el["node"])
+        raise KeyError(guest_id)
+
+    def choose_by_most_free_ram(self, absolute: bool = True) -> Tuple[str, ProxmoxNode]:
+        """
+        Choose online node with most free RAM among all clusters
+        :param absolute: Whether to rate free RAM in bytes or % (optional, default=True)
+        :return: Tuple of cluster name and ProxmoxNode object
+        """
+        best, best_rating = None, None
+        for el in self.nodes().values():
+            if el.get("status") != "online" or not el.get("maxmem"):
+                continue
+            free = float(el["maxmem"] - el.get("mem", 0))
+            rating = free if absolute else free / el["maxmem"]
+            if best_rating is None or rating > best_rating:
+                best, best_rating = el, rating
+        if best is None:
+            raise ProxmoxException("No online nodes found")
+        return best["cluster"], ProxmoxNode(self._managers[best["cluster"]]._api, best["node"])
+
+    def next_free_vmids(self, strict: bool = False) -> FederatedResult:
+        """
+        Get next free VM/container ID of every cluster (one request per cluster)
+        :param strict: Whether to raise FederationError if some clusters failed (optional, default=False)
+        :return: FederatedResult where keys are cluster names and values are IDs in string format
+        """
+        results = self.map(lambda manager: manager._api.get_next_vmid(), strict=strict)
+        return FederatedResult({name: str(vmid) for name, vmid in results.items()}, results.errors)
+
+    def smallest_free_vmid(self) -> str:
+        """
+        Get smallest VM/container ID that is not taken in any cluster (e.g. to move guests between clusters)
+        :return: ID in string format
+        """
+        # ID can't be guaranteed to be free if some cluster didn't answer
+        inventory = self.inventory(strict=True)
+        taken = {int(el["vmid"]) for el in inventory.values()}
+        res = 100
+        while res in taken:
+            res += 1
+        return str(res)
+
+    def _record_latency(self, name: str, latency: float) -> None:
+        with self._latency_lock:
+            stats = self._latency[name]
+            stats["calls"] += 1
+            stats["last"] = latency
+            stats["total"] += latency
+
+    def _split(self, namespaced_id: str) -> Tuple[str, str]:
+        name, sep, object_id = namespaced_id.partition("/")
+        if not sep or name not in self._managers:
+            raise KeyError(namespaced_id)
+        return name, object_id
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {list(self._managers.keys())}>"
@@ -1,5 +1,11 @@
-from proxmoxmanager.utils import APIWrapper, ProxmoxNodeDict, ProxmoxUserDict, ProxmoxVMDict, ProxmoxContainerDict
-from typing import List, Dict, Any
+from proxmoxmanager.utils import APIWrapper, ProxmoxNodeDict, ProxmoxUserDict, ProxmoxVMDict, ProxmoxContainerDict, \
+    ProxmoxStorageDict, ProxmoxTemplateCatalogue, ProxmoxRoleCatalogue
+from typing import List, Dict, Any, Optional, Union, Sequence, ContextManager, Iterable, TYPE_CHECKING
+
+# Snapshot, planner, permission matrix and profiler are only loaded by methods that use them
+if TYPE_CHECKING:
+    from proxmoxmanager.utils import ProxmoxClusterSnapshot, ProxmoxPermissionMatrix, CapacityPlanner, Transport, \
+        RequestProfiler
 
 
 class ProxmoxManager:
@@ -7,8 +13,14 @@ class ProxmoxManager:
     Smart Proxmox VE API wrapper
     """
 
-    def __init__(self, host: str, user: str, token_name: str, token_value: str):
-        self._api = APIWrapper(host=host, user=user, token_name=token_name, token_value=token_value)
+    def __init__(self, host: Union[str, Sequence[str]], user: str = None, token_name: str = None,
+                 token_value: str = None, route_node_calls: bool = False, health_check_interval: float = None,
+                 transport: 'Transport' = None):
+        self._api = APIWrapper(host=host, user=user, token_name=token_name, token_value=token_value,
+                               route_node_calls=route_node_calls, health_check_interval=health_check_interval,
+                               transport=transport)
+        self._templates: Optional[ProxmoxTemplateCatalogue] = None
+        self._roles: Optional[ProxmoxRoleCatalogue] = None
 
     @property
     def nodes(self):
@@ -26,6 +38,16 @@ class ProxmoxManager:
         """
         return ProxmoxUserDict(self._api)
 
+    def get_users(self, realm: Optional[str] = "pve", ttl: float = None, with_groups: bool = False) -> ProxmoxUserDict:
+        """
+        Get users from any realm with cached listing
+        :param realm: Only include users from this realm, None for all realms (optional, default="pve")
+        :param ttl: Number of seconds for which user listing is cached (optional)
+        :param with_groups: Whether to fetch user groups (optional, default=False)
+        :return: Dict-like object containing users
+        """
+        return ProxmoxUserDict(self._api, realm=realm, ttl=ttl, with_groups=with_groups)
+
     @property
     def vms(self) -> ProxmoxVMDict:
         """
@@ -42,19 +64,118 @@ class ProxmoxManager:
         """
         return ProxmoxContainerDict(self._api)
 
+    @property
+    def storages(self) -> ProxmoxStorageDict:
+        """
+        Get all storages
+        :return: Dict-like object containing storages
+        """
+        return ProxmoxStorageDict(self._api)
+
+    def get_storages(self, ttl: float = None) -> ProxmoxStorageDict:
+        """
+        Get all storages with cached listing
+        :param ttl: Number of seconds for which storage listing is cached (optional)
+        :return: Dict-like object containing storages
+        """
+        return ProxmoxStorageDict(self._api, ttl=ttl)
+
+    @property
+    def templates(self) -> ProxmoxTemplateCatalogue:
+        """
+        Get VM and container templates (catalogue is shared between calls and cached for 60 seconds)
+        :return: Dict-like object containing templates
+        """
+        if self._templates is None:
+            self._templates = ProxmoxTemplateCatalogue(self._api)
+        return self._templates
+
+    @property
+    def roles(self) -> ProxmoxRoleCatalogue:
+        """
+        Get roles with privilege index and local evaluation of user privileges (catalogue is shared between calls and
+        cached for 60 seconds)
+        :return: Dict-like object containing privileges of roles
+        """
+        if self._roles is None:
+            self._roles = ProxmoxRoleCatalogue(self._api)
+        return self._roles
+
+    def snapshot(self, concurrency: int = 4, rrd_timeframe: str = None) -> 'ProxmoxClusterSnapshot':
+        """
+        Take consistent point-in-time view of nodes, VMs, containers, storages, users, ACL and roles, fetched once
+        and concurrently, that can be queried offline and saved to a file
+        :param concurrency: Maximum number of simultaneous requests (optional, default=4)
+        :param rrd_timeframe: Also fetch peak usage history of nodes for this timeframe, e.g. "week" (optional)
+        :return: ProxmoxClusterSnapshot object
+        """
+        from proxmoxmanager.utils import ProxmoxClusterSnapshot
+        return ProxmoxClusterSnapshot.take(self._api, concurrency=concurrency, rrd_timeframe=rrd_timeframe)
+
+    def capacity_planner(self, rrd_timeframe: Optional[str] = "week", **kwargs) -> 'CapacityPlanner':
+        """
+        Take snapshot of cluster for offline what-if capacity planning (requires numpy)
+        :param rrd_timeframe: Timeframe of usage history to plan for peak usage, None to use current usage
+                              (optional, default="week")
+        :param kwargs: Other arguments passed to CapacityPlanner (use_peak, running_only, failure_domains, policy)
+        :return: CapacityPlanner object
+        """
+        from proxmoxmanager.utils import CapacityPlanner
+        return CapacityPlanner(self.snapshot(rrd_timeframe=rrd_timeframe), **kwargs)
+
+    def permission_matrix(self, paths: Iterable[str] = None, concurrency: int = 4) -> 'ProxmoxPermissionMatrix':
+        """
+        Compute effective privileges of all users on all paths from ACL, groups and roles fetched once
+        :param paths: ACL paths to evaluate (optional, default=paths from ACL, all nodes, storages and
+                      VMs/containers)
+        :param concurrency: Maximum number of simultaneous requests (optional, default=4)
+        :return: ProxmoxPermissionMatrix object
+        """
+        from proxmoxmanager.utils import ProxmoxPermissionMatrix
+        return ProxmoxPermissionMatrix.build(self._api, paths=paths, concurrency=concurrency)
+
+    def profile(self, stack_depth: int = 8) -> ContextManager['RequestProfiler']:
+        """
+        Record every API request made inside with-block, e.g. to find repeated requests:
+        with proxmox_manager.profile() as profiler: ...
+        :param stack_depth: Number of caller frames saved for each request (optional, default=8)
+        :return: Context manager that gives RequestProfiler object
+        """
+        return self._api.profile(stack_depth=stack_depth)
+
     def list_roles(self) -> List[Dict[str, Any]]:
         """
-        Get list of availible roles
+        Get list of availible roles (served from roles catalogue, see roles)
         :return: List of roles' info in JSON-like format
         """
-        return self._api.list_roles()
+        return self.roles.values()
 
     def list_role_names(self):
         """
         Get list of names of avalible roles (without any other info)
         :return: List of string role names
         """
-        return [role["roleid"] for role in self.list_roles()]
+        return list(self.roles.keys())
+
+    def create_role(self, roleid: str, privs: str = None) -> None:
+        """
+        Create role, cached roles catalogue is invalidated
+        :param roleid: Role name
+        :param privs: Comma-separated privileges, e.g. "VM.Audit,VM.Console" (optional)
+        :return: None
+        """
+        kwargs = {"privs": privs} if privs is not None else {}
+        self._api.create_role(roleid=roleid, **kwargs)
+        self.roles.invalidate()
+
+    def delete_role(self, roleid: str) -> None:
+        """
+        Delete role, cached roles catalogue is invalidated
+        :param roleid: Role name
+        :return: None
+        """
+        self._api.delete_role(roleid=roleid)
+        self.roles.invalidate()
 
     def smallest_free_vmid(self) -> str:
         """
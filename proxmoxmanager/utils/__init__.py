@@ -1,3 +1,56 @@
-from .decorators import return_default_on_exception, reraise_exception_on_exception
-from .api import APIWrapper
-from .classes import *
+from importlib import import_module
+
+# Submodules are imported on first access, so that importing one of them doesn't pull in the rest
+_LAZY_ATTRIBUTES = {
+    "return_default_on_exception": ".decorators",
+    "reraise_exception_on_exception": ".decorators",
+    "run_in_parallel": ".parallel",
+    "iter_in_parallel": ".parallel",
+    "SessionManager": ".sessions",
+    "UserSession": ".sessions",
+    "Transport": ".transports",
+    "RecordingTransport": ".transports",
+    "ReplayTransport": ".transports",
+    "RequestProfiler": ".profiling",
+    "APIWrapper": ".api",
+    "ProxmoxNode": ".classes",
+    "ProxmoxNodeDict": ".classes",
+    "ProxmoxNodeTable": ".classes",
+    "ProxmoxUser": ".classes",
+    "ProxmoxUserDict": ".classes",
+    "ProxmoxVM": ".classes",
+    "ProxmoxVMDict": ".classes",
+    "ProxmoxContainer": ".classes",
+    "ProxmoxContainerDict": ".classes",
+    "ProxmoxStorage": ".classes",
+    "ProxmoxStorageDict": ".classes",
+    "ProxmoxTemplateCatalogue": ".classes",
+    "ProxmoxClusterSnapshot": ".classes",
+    "ProxmoxRoleCatalogue": ".classes",
+    "ProxmoxPermissionMatrix": ".classes",
+    "CapacityPlanner": ".classes",
+    "ProxmoxConfig": ".classes",
+    "ProxmoxVMConfig": ".classes",
+    "ProxmoxContainerConfig": ".classes",
+    "ProxmoxTask": ".classes",
+    "wait_for_tasks": ".classes",
+    "follow_task_log": ".classes",
+    "follow_task_logs": ".classes",
+    "run_bulk_action": ".classes",
+    "BackupScheduler": ".classes",
+    "ProxmoxException": ".classes",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()))
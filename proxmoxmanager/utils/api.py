@@ -1,4 +1,9 @@
-from proxmoxer import ProxmoxAPI
+from .sessions import SessionManager
+from .endpoints import EndpointPool, RoutedResource
+from .transports import Transport
+from .profiling import RequestProfiler
+from contextlib import contextmanager
+from typing import Union, Sequence, Optional, Iterator, List
 
 
 class APIWrapper:
@@ -6,22 +11,76 @@ class APIWrapper:
     Class that wraps proxmoxer library without changing any returns and only simplifying API endpoint calls
     """
 
-    def __init__(self, host: str, user: str, token_name: str, token_value: str):
-        self._proxmoxer = ProxmoxAPI(host=host, user=user, token_name=token_name, token_value=token_value,
-                                     verify_ssl=False)
-        self._host = host
+    def __init__(self, host: Union[str, Sequence[str]], user: str = None, token_name: str = None,
+                 token_value: str = None, route_node_calls: bool = False, health_check_interval: float = None,
+                 transport: Transport = None):
+        """
+        :param host: Host with optional port or list of hosts of the same cluster to fail over between
+        :param user: User that owns API token
+        :param token_name: Name of API token
+        :param token_value: Secret value of API token
+        :param route_node_calls: Whether to send node-scoped calls straight to the owning node if it is one of the
+                                 hosts (optional, default=False)
+        :param health_check_interval: Number of seconds between background health probes of hosts, None to only
+                                      track health passively (optional)
+        :param transport: Transport that executes requests instead of connecting to hosts, e.g. ReplayTransport
+                          (optional)
+        """
+        hosts = [host] if isinstance(host, str) else list(host)
+        self._pool: Optional[EndpointPool] = None
+        if transport is None:
+            if user is None or token_name is None or token_value is None:
+                raise ValueError("User, token name and token value are required")
+            self._pool = EndpointPool(hosts, user=user, token_name=token_name, token_value=token_value,
+                                      route_node_calls=route_node_calls)
+            transport = self._pool
+            if health_check_interval is not None:
+                self._pool.start_health_checks(health_check_interval)
+        self._transport = transport
+        self._proxmoxer = RoutedResource(transport)
+        self._host = hosts[0]
+        # User sessions fail over between the same hosts as token-authenticated requests
+        self._sessions = SessionManager(host=hosts)
 
     @property
     def host(self):
         return self._host
 
+    @property
+    def endpoints(self) -> Optional[EndpointPool]:
+        return self._pool
+
+    @property
+    def transport(self) -> Transport:
+        return self._transport
+
+    @contextmanager
+    def profile(self, stack_depth: int = 8) -> Iterator[RequestProfiler]:
+        """
+        Record every request made inside with-block
+        :param stack_depth: Number of caller frames saved for each request (optional, default=8)
+        :return: RequestProfiler object
+        """
+        previous = self._proxmoxer
+        profiler = RequestProfiler(previous._transport, stack_depth=stack_depth)
+        self._proxmoxer = RoutedResource(profiler)
+        try:
+            yield profiler
+        finally:
+            self._proxmoxer = previous
+
+    @property
+    def sessions(self) -> SessionManager:
+        return self._sessions
+
     def get_user_tokens(self, userid: str, password: str):
-        tmp_api = ProxmoxAPI(host=self._host, user=userid, password=password, verify_ssl=False)
-        return tmp_api.get_tokens()
+        return self._sessions.get(userid, password).get_tokens()
 
     def change_user_password(self, userid: str, old_password: str, new_password: str, **kwargs):
-        tmp_api = ProxmoxAPI(host=self._host, user=userid, password=old_password, verify_ssl=False)
-        return tmp_api.access.password.put(userid=userid, password=new_password, **kwargs)
+        result = self._sessions.get(userid, old_password).api.access.password.put(userid=userid,
+                                                                                   password=new_password, **kwargs)
+        self._sessions.invalidate(userid)
+        return result
 
     def get_version(self, **kwargs):
         return self._proxmoxer.version.get(**kwargs)
@@ -38,9 +97,24 @@ class APIWrapper:
     def delete_user(self, userid: str, **kwargs):
         return self._proxmoxer.access.users(userid).delete(**kwargs)
 
+    def list_user_tokens(self, userid: str, **kwargs):
+        return self._proxmoxer.access.users(userid).token.get(**kwargs)
+
+    def create_user_token(self, userid: str, tokenid: str, **kwargs):
+        return self._proxmoxer.access.users(userid).token(tokenid).post(**kwargs)
+
+    def delete_user_token(self, userid: str, tokenid: str, **kwargs):
+        return self._proxmoxer.access.users(userid).token(tokenid).delete(**kwargs)
+
     def list_roles(self, **kwargs):
         return self._proxmoxer.access.roles.get(**kwargs)
 
+    def create_role(self, roleid: str, **kwargs):
+        return self._proxmoxer.access.roles.post(roleid=roleid, **kwargs)
+
+    def delete_role(self, roleid: str, **kwargs):
+        return self._proxmoxer.access.roles(roleid).delete(**kwargs)
+
     def list_permissions(self, **kwargs):
         return self._proxmoxer.access.permissions.get(**kwargs)
 
@@ -56,9 +130,24 @@ class APIWrapper:
     def get_node_status(self, node: str, **kwargs):
         return self._proxmoxer.nodes(node).status.get(**kwargs)
 
+    def get_node_rrd_data(self, node: str, **kwargs):
+        return self._proxmoxer.nodes(node).rrddata.get(**kwargs)
+
     def list_resources(self, **kwargs):
         return self._proxmoxer.cluster.resources.get(**kwargs)
 
+    def get_next_vmid(self, **kwargs):
+        return self._proxmoxer.cluster.nextid.get(**kwargs)
+
+    def list_storages(self, node: str, **kwargs):
+        return self._proxmoxer.nodes(node).storage.get(**kwargs)
+
+    def get_storage_status(self, node: str, storage: str, **kwargs):
+        return self._proxmoxer.nodes(node).storage(storage).status.get(**kwargs)
+
+    def list_storage_content(self, node: str, storage: str, **kwargs):
+        return self._proxmoxer.nodes(node).storage(storage).content.get(**kwargs)
+
     def list_vms(self, node, **kwargs):
         return self._proxmoxer.nodes(node).qemu.get(**kwargs)
 
@@ -68,12 +157,45 @@ class APIWrapper:
     def get_vm_config(self, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).qemu(vmid).config.get(**kwargs)
 
+    def update_vm_config(self, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).config.put(**kwargs)
+
+    def update_vm_config_async(self, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).config.post(**kwargs)
+
     def delete_vm(self, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).qemu(vmid).delete(**kwargs)
 
     def clone_vm(self, newid: str, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).qemu(vmid).clone.post(newid=newid, **kwargs)
 
+    def migrate_vm(self, target: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).migrate.post(target=target, **kwargs)
+
+    def list_vm_snapshots(self, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).snapshot.get(**kwargs)
+
+    def create_vm_snapshot(self, snapname: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).snapshot.post(snapname=snapname, **kwargs)
+
+    def rollback_vm_snapshot(self, snapname: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).snapshot(snapname).rollback.post(**kwargs)
+
+    def delete_vm_snapshot(self, snapname: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).snapshot(snapname).delete(**kwargs)
+
+    def agent_exec(self, node: str, vmid: str, command: List[str], **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).agent.exec.post(command=command, **kwargs)
+
+    def get_agent_exec_status(self, node: str, vmid: str, pid: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).agent("exec-status").get(pid=pid, **kwargs)
+
+    def agent_file_read(self, node: str, vmid: str, file: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).agent("file-read").get(file=file, **kwargs)
+
+    def agent_file_write(self, node: str, vmid: str, file: str, content: str, **kwargs):
+        return self._proxmoxer.nodes(node).qemu(vmid).agent("file-write").post(file=file, content=content, **kwargs)
+
     def list_containers(self, node: str, **kwargs):
         return self._proxmoxer.nodes(node).lxc.get(**kwargs)
 
@@ -83,12 +205,33 @@ class APIWrapper:
     def get_container_config(self, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).lxc(vmid).config.get(**kwargs)
 
+    def update_container_config(self, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).lxc(vmid).config.put(**kwargs)
+
+    def get_container_pending(self, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).lxc(vmid).pending.get(**kwargs)
+
     def delete_container(self, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).lxc(vmid).delete(**kwargs)
 
     def clone_container(self, newid: str, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).lxc(vmid).clone.post(newid=newid, **kwargs)
 
+    def migrate_container(self, target: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).lxc(vmid).migrate.post(target=target, **kwargs)
+
+    def list_container_snapshots(self, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).lxc(vmid).snapshot.get(**kwargs)
+
+    def create_container_snapshot(self, snapname: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).lxc(vmid).snapshot.post(snapname=snapname, **kwargs)
+
+    def rollback_container_snapshot(self, snapname: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).lxc(vmid).snapshot(snapname).rollback.post(**kwargs)
+
+    def delete_container_snapshot(self, snapname: str, node: str, vmid: str, **kwargs):
+        return self._proxmoxer.nodes(node).lxc(vmid).snapshot(snapname).delete(**kwargs)
+
     def start_vm(self, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).qemu(vmid).status.start.post(**kwargs)
 
@@ -128,6 +271,9 @@ class APIWrapper:
     def resume_container(self, node: str, vmid: str, **kwargs):
         return self._proxmoxer.nodes(node).lxc(vmid).status.resume.post(**kwargs)
 
+    def create_backup(self, node: str, **kwargs):
+        return self._proxmoxer.nodes(node).vzdump.post(**kwargs)
+
     def list_tasks(self, node: str, **kwargs):
         return self._proxmoxer.nodes(node).tasks.get(**kwargs)
 
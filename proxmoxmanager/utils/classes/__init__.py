@@ -1,5 +1,45 @@
-from .nodes import ProxmoxNode, ProxmoxNodeDict
-from .users import ProxmoxUser, ProxmoxUserDict
-from .vms import ProxmoxVM, ProxmoxVMDict
-from .containers import ProxmoxContainer, ProxmoxContainerDict
-from .errors import ProxmoxException
+from importlib import import_module
+
+# Modules are imported on first access, so that e.g. planner isn't loaded together with guest classes
+_LAZY_ATTRIBUTES = {
+    "ProxmoxNode": ".nodes",
+    "ProxmoxNodeDict": ".nodes",
+    "ProxmoxNodeTable": ".node_table",
+    "ProxmoxUser": ".users",
+    "ProxmoxUserDict": ".users",
+    "ProxmoxVM": ".vms",
+    "ProxmoxVMDict": ".vms",
+    "ProxmoxContainer": ".containers",
+    "ProxmoxContainerDict": ".containers",
+    "ProxmoxStorage": ".storages",
+    "ProxmoxStorageDict": ".storages",
+    "ProxmoxTemplateCatalogue": ".templates",
+    "ProxmoxClusterSnapshot": ".cluster",
+    "ProxmoxRoleCatalogue": ".roles",
+    "ProxmoxPermissionMatrix": ".permissions",
+    "CapacityPlanner": ".planner",
+    "ProxmoxConfig": ".configs",
+    "ProxmoxVMConfig": ".configs",
+    "ProxmoxContainerConfig": ".configs",
+    "ProxmoxTask": ".tasks",
+    "wait_for_tasks": ".tasks",
+    "follow_task_log": ".tasks",
+    "follow_task_logs": ".tasks",
+    "run_bulk_action": ".tasks",
+    "BackupScheduler": ".backups",
+    "ProxmoxException": ".errors",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()))
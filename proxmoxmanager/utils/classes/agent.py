@@ -0,0 +1,155 @@
+from ..api import APIWrapper
+from .errors import ProxmoxException
+from typing import Dict, Any, List, Union, Iterable, Iterator, BinaryIO
+import base64
+import shlex
+import time
+
+# file-write and exec input-data accept about 60 KiB, base64 encoding makes content a third bigger
+WRITE_CHUNK_SIZE = 45 * 1024
+# Output of exec is kept in memory of guest agent, so it is read in moderate pieces
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Appending and reading by offset are not available in agent API, they are done by POSIX shell in guest
+_APPEND_SCRIPT = 'base64 -d >> "$1"'
+_READ_SCRIPT = '[ -r "$1" ] || { echo "Can\'t read $1" >&2; exit 1; }; ' \
+               'dd if="$1" bs="$2" skip="$3" count=1 2>/dev/null | base64'
+
+
+def agent_command(command: Union[str, List[str]]) -> List[str]:
+    """
+    :param command: Command as list of program and arguments or string that is split like in shell
+    :return: List of program and arguments
+    """
+    return shlex.split(command) if isinstance(command, str) else [str(arg) for arg in command]
+
+
+def run_agent_command(api: APIWrapper, node: str, vmid: str, command: Union[str, List[str]], input_data: str = None,
+                      timeout: float = None, min_interval: float = 0.1, max_interval: float = 2.0) -> Dict[str, Any]:
+    """
+    Run command with QEMU guest agent and wait for it to exit
+    :param api: APIWrapper object
+    :param node: Node ID
+    :param vmid: VM ID
+    :param command: Command as list of program and arguments or string that is split like in shell
+    :param input_data: Data passed to standard input of command (optional)
+    :param timeout: Number of seconds to wait (optional)
+    :param min_interval: Number of seconds before first status check (optional, default=0.1)
+    :param max_interval: Maximum number of seconds between status checks (optional, default=2.0)
+    :return: Exec status in JSON-like format ("exitcode", "out-data", "err-data"...)
+    """
+    kwargs = {"input-data": input_data} if input_data is not None else {}
+    pid = api.agent_exec(node=node, vmid=vmid, command=agent_command(command), **kwargs)["pid"]
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    interval = min_interval
+    while True:
+        time.sleep(interval)
+        status = api.get_agent_exec_status(node=node, vmid=vmid, pid=str(pid))
+        if str(status.get("exited", 0)) == "1":
+            return status
+        if deadline is not None and time.monotonic() >= deadline:
+            raise ProxmoxException(f"Timed out waiting for command {pid} in VM {vmid}")
+        # Short commands are noticed quickly, long ones are not polled too often
+        interval = min(interval * 2, max_interval)
+
+
+def iter_chunks(data: Union[str, bytes, BinaryIO, Iterable[bytes]], chunk_size: int) -> Iterator[bytes]:
+    """
+    Split data into chunks without reading file-like objects and iterables into memory at once
+    :param data: String, bytes, binary file-like object or iterable of bytes
+    :param chunk_size: Size of chunks in bytes
+    :return: Generator of chunks, all of them except the last one are chunk_size long
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if isinstance(data, (bytes, bytearray)):
+        for start in range(0, len(data), chunk_size):
+            yield bytes(data[start:start + chunk_size])
+        return
+    if hasattr(data, "read"):
+        while True:
+            chunk = data.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    buffer = b""
+    for piece in data:
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield buffer[:chunk_size]
+            buffer = buffer[chunk_size:]
+    if buffer:
+        yield buffer
+
+
+def write_agent_file(api: APIWrapper, node: str, vmid: str, path: str,
+                     data: Union[str, bytes, BinaryIO, Iterable[bytes]], chunk_size: int = WRITE_CHUNK_SIZE,
+                     timeout: float = None) -> int:
+    """
+    Write file in VM with QEMU guest agent chunk by chunk. First chunk is written with file-write (works in any guest
+    OS), following chunks are appended by POSIX shell command.
+    :param api: APIWrapper object
+    :param node: Node ID
+    :param vmid: VM ID
+    :param path: Path of file in guest
+    :param data: String, bytes, binary file-like object or iterable of bytes
+    :param chunk_size: Number of bytes sent by one request (optional, default=WRITE_CHUNK_SIZE)
+    :param timeout: Number of seconds to wait for each appending command (optional)
+    :return: Number of bytes written
+    """
+    if chunk_size > WRITE_CHUNK_SIZE:
+        raise ValueError(f"Chunk size can't be bigger than {WRITE_CHUNK_SIZE} bytes")
+    written = 0
+    for chunk in iter_chunks(data, chunk_size):
+        content = base64.b64encode(chunk).decode("ascii")
+        if not written:
+            api.agent_file_write(node=node, vmid=vmid, file=path, content=content, encode="0")
+        else:
+            status = run_agent_command(api, node, vmid, ["sh", "-c", _APPEND_SCRIPT, "sh", path], input_data=content,
+                                       timeout=timeout)
+            if str(status.get("exitcode", 0)) != "0":
+                raise ProxmoxException(f"Failed to write {path} in VM {vmid}: {status.get('err-data', '').strip()}")
+        written += len(chunk)
+    if not written:
+        api.agent_file_write(node=node, vmid=vmid, file=path, content="", encode="0")
+    return written
+
+
+def read_agent_file(api: APIWrapper, node: str, vmid: str, path: str, chunk_size: int = READ_CHUNK_SIZE,
+                    timeout: float = None) -> Iterator[bytes]:
+    """
+    Read file in VM with QEMU guest agent chunk by chunk. First 16 MiB are read with file-read (works in any guest OS),
+    rest of bigger files is read by POSIX shell command.
+    :param api: APIWrapper object
+    :param node: Node ID
+    :param vmid: VM ID
+    :param path: Path of file in guest
+    :param chunk_size: Number of bytes yielded at once and read by one command (optional, default=READ_CHUNK_SIZE)
+    :param timeout: Number of seconds to wait for each reading command (optional)
+    :return: Generator of chunks of file
+    """
+    result = api.agent_file_read(node=node, vmid=vmid, file=path)
+    content = result.get("content") or ""
+    # Proxmox VE sends each byte of file as one character
+    try:
+        content = content.encode("latin-1")
+    except UnicodeEncodeError:
+        content = content.encode("utf-8")
+    yield from iter_chunks(content, chunk_size)
+    # file-read returns at most 16 MiB and marks bigger files as truncated
+    if str(result.get("truncated", 0)).lower() not in ("1", "true"):
+        return
+    # Exec reads whole chunks, so the part of first chunk that was already read by file-read is skipped
+    index, skip = divmod(len(content), chunk_size)
+    while True:
+        status = run_agent_command(api, node, vmid, ["sh", "-c", _READ_SCRIPT, "sh", path, str(chunk_size),
+                                                     str(index)], timeout=timeout)
+        if str(status.get("exitcode", 0)) != "0":
+            raise ProxmoxException(f"Failed to read {path} in VM {vmid}: {status.get('err-data', '').strip()}")
+        chunk = base64.b64decode(status.get("out-data", ""))
+        if chunk[skip:]:
+            yield chunk[skip:]
+        if len(chunk) < chunk_size:
+            return
+        index += 1
+        skip = 0
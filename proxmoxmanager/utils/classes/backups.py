@@ -0,0 +1,200 @@
+from ..api import APIWrapper
+from .tasks import wait_for_tasks
+from typing import Dict, Any, List, Union, Callable, Optional, Iterable
+from collections import defaultdict
+import re
+import time
+
+BACKUP_MODES = ("snapshot", "suspend", "stop")
+# vzdump reports failures of single guests in task log, e.g. "ERROR: Backup of VM 101 failed - ..."
+_GUEST_ERROR = re.compile(r"ERROR: Backup of VM (\d+) failed - (.*)")
+
+
+def backup_kwargs(storage: str = None, mode: str = "snapshot", compress: str = "zstd",
+                  notes: str = None) -> Dict[str, str]:
+    """
+    Build arguments of vzdump API call
+    :param storage: Target storage (optional, default=storage from node's vzdump.conf)
+    :param mode: "snapshot", "suspend" or "stop" (optional, default="snapshot")
+    :param compress: Compression algorithm ("0", "gzip", "lzo" or "zstd") (optional, default="zstd")
+    :param notes: Template of backup notes, e.g. "{{guestname}}" (optional)
+    :return: Dict of arguments
+    """
+    if mode not in BACKUP_MODES:
+        raise ValueError(f"Backup mode has to be one of {', '.join(BACKUP_MODES)}")
+    kwargs = {"mode": mode, "compress": compress}
+    if storage is not None:
+        kwargs["storage"] = storage
+    if notes is not None:
+        kwargs["notes-template"] = notes
+    return kwargs
+
+
+class BackupScheduler:
+    """
+    Backs up many VMs/containers with as few vzdump tasks as possible without overloading backup storages.
+    Guests of each node are split into batches of similar total size, one vzdump task is started per batch,
+    largest batches first, while limiting number of simultaneous tasks per storage and per node.
+    """
+
+    def __init__(self, api: APIWrapper, storage: Union[str, Dict[str, str]] = None, mode: str = "snapshot",
+                 compress: str = "zstd", notes: str = None, max_per_storage: int = 2, max_per_node: int = 1,
+                 batch_size: int = None, interval: float = 5.0):
+        """
+        :param api: APIWrapper object
+        :param storage: Target storage or dict where keys are node IDs and values are storages
+                        (optional, default=storage from each node's vzdump.conf)
+        :param mode: "snapshot", "suspend" or "stop" (optional, default="snapshot")
+        :param compress: Compression algorithm ("0", "gzip", "lzo" or "zstd") (optional, default="zstd")
+        :param notes: Template of backup notes, e.g. "{{guestname}}" (optional)
+        :param max_per_storage: Maximum number of simultaneous vzdump tasks writing to one storage
+                                (optional, default=2)
+        :param max_per_node: Maximum number of simultaneous vzdump tasks on one node (optional, default=1)
+        :param batch_size: Maximum number of guests backed up by one vzdump task (optional, default=all guests
+                           of node)
+        :param interval: Number of seconds between task checks (optional, default=5.0)
+        """
+        if max_per_storage < 1 or max_per_node < 1:
+            raise ValueError("Limits of simultaneous tasks have to be at least 1")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("Batch size has to be at least 1")
+        backup_kwargs(mode=mode)
+        self._api = api
+        self._storage = storage
+        self._mode = mode
+        self._compress = compress
+        self._notes = notes
+        self._max_per_storage = max_per_storage
+        self._max_per_node = max_per_node
+        self._batch_size = batch_size
+        self._interval = interval
+
+    def plan(self, vmids: List[Union[str, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Split guests into vzdump jobs using a single inventory request
+        :param vmids: IDs of VMs/containers (optional, default=all guests)
+        :return: List of jobs in JSON-like format ({"node": ..., "storage": ..., "vmids": [...], "size": ...})
+                 in order in which they are started, storage is None for default one
+        """
+        return self._plan(self._api.list_resources(type="vm"), vmids)
+
+    def run(self, vmids: List[Union[str, int]] = None, timeout: float = None,
+            progress: Callable[[Dict[str, Any], int, int], None] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Back up guests and wait for all vzdump tasks to finish
+        :param vmids: IDs of VMs/containers (optional, default=all guests)
+        :param timeout: Number of seconds to wait for all tasks (optional)
+        :param progress: Function called after each finished job with job (with additional "task" and
+                         "exitstatus" fields), number of finished jobs and total number of jobs (optional)
+        :return: Dict where keys are VM/container IDs and values are results in JSON-like format
+                 ({"node": ..., "task": ..., "status": "ok"/"running"/"error", "error": ...})
+        """
+        resources = self._api.list_resources(type="vm")
+        jobs = self._plan(resources, vmids)
+        found = {vmid for job in jobs for vmid in job["vmids"]}
+        results = {str(vmid): {"node": None, "task": None, "status": "error", "error": f"Guest {vmid} not found"}
+                   for vmid in (vmids or []) if str(vmid) not in found}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pending = list(jobs)
+        running: Dict[str, Dict[str, Any]] = {}
+        finished = 0
+
+        while pending or running:
+            for job in self._startable(pending, running.values()):
+                pending.remove(job)
+                try:
+                    upid = self._api.create_backup(node=job["node"], vmid=",".join(job["vmids"]),
+                                                   **backup_kwargs(job["storage"], self._mode, self._compress,
+                                                                   self._notes))
+                except Exception as e:
+                    finished += 1
+                    self._finish(job, None, str(e), results, progress, finished, len(jobs))
+                    continue
+                running[upid] = job
+            if not running:
+                continue
+            for upid, exit_status in wait_for_tasks(self._api, running.keys(), timeout=0).items():
+                finished += 1
+                self._finish(running.pop(upid), upid, exit_status, results, progress, finished, len(jobs))
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if running:
+                time.sleep(self._interval)
+
+        for upid, job in running.items():
+            for vmid in job["vmids"]:
+                results[vmid] = {"node": job["node"], "task": upid, "status": "running", "error": None}
+        for job in pending:
+            for vmid in job["vmids"]:
+                results[vmid] = {"node": job["node"], "task": None, "status": "error",
+                                 "error": "Backup was not started before timeout"}
+        return results
+
+    def _plan(self, resources: List[Dict[str, Any]], vmids: Optional[List[Union[str, int]]]) -> List[Dict[str, Any]]:
+        wanted = None if vmids is None else {str(vmid) for vmid in vmids}
+        guests = defaultdict(list)
+        for el in resources:
+            if el.get("type") not in ("qemu", "lxc") or (wanted is not None and str(el["vmid"]) not in wanted):
+                continue
+            guests[el["node"]].append(el)
+
+        jobs = []
+        for node, node_guests in guests.items():
+            storage = self._storage.get(node) if isinstance(self._storage, dict) else self._storage
+            count = 1 if self._batch_size is None else -(-len(node_guests) // self._batch_size)
+            batches = [{"node": node, "storage": storage, "vmids": [], "size": 0} for _ in range(count)]
+            # Largest guests first, each into the smallest batch that still has room, so batches finish together
+            for el in sorted(node_guests, key=lambda el: (-int(el.get("maxdisk") or 0), int(el["vmid"]))):
+                batch = min((batch for batch in batches if self._batch_size is None or
+                             len(batch["vmids"]) < self._batch_size), key=lambda batch: batch["size"])
+                batch["vmids"].append(str(el["vmid"]))
+                batch["size"] += int(el.get("maxdisk") or 0)
+            jobs += [batch for batch in batches if batch["vmids"]]
+        return sorted(jobs, key=lambda job: -job["size"])
+
+    def _startable(self, pending: List[Dict[str, Any]], running: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        per_node = defaultdict(int)
+        per_storage = defaultdict(int)
+        for job in running:
+            per_node[job["node"]] += 1
+            per_storage[self._storage_key(job)] += 1
+        res = []
+        for job in pending:
+            if per_node[job["node"]] < self._max_per_node and \
+                    per_storage[self._storage_key(job)] < self._max_per_storage:
+                per_node[job["node"]] += 1
+                per_storage[self._storage_key(job)] += 1
+                res.append(job)
+        return res
+
+    def _finish(self, job: Dict[str, Any], upid: Optional[str], exit_status: str, results: Dict[str, Dict[str, Any]],
+                progress: Optional[Callable[[Dict[str, Any], int, int], None]], finished: int, total: int) -> None:
+        errors = {}
+        if upid is not None and exit_status != "OK":
+            # Task fails if any guest failed, log tells which ones
+            try:
+                start = 0
+                while True:
+                    lines = self._api.get_task_logs(node=job["node"], upid=upid, start=start, limit=500)
+                    for line in lines:
+                        match = _GUEST_ERROR.search(line.get("t", ""))
+                        if match is not None:
+                            errors[match.group(1)] = match.group(2)
+                    if len(lines) < 500:
+                        break
+                    start += len(lines)
+            except Exception:
+                # Without log every guest of failed task is reported as failed
+                errors = {}
+        for vmid in job["vmids"]:
+            result = {"node": job["node"], "task": upid, "status": "ok", "error": None}
+            if upid is None or (exit_status != "OK" and (not errors or vmid in errors)):
+                result.update(status="error", error=errors.get(vmid, exit_status))
+            results[vmid] = result
+        if progress is not None:
+            progress(dict(job, task=upid, exitstatus=exit_status), finished, total)
+
+    @staticmethod
+    def _storage_key(job: Dict[str, Any]) -> str:
+        # Default storage is configured per node, so it is only shared within one node
+        return job["storage"] if job["storage"] is not None else f"{job['node']}/default"
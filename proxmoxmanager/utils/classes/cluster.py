@@ -0,0 +1,261 @@
+from ..api import APIWrapper
+from ..parallel import run_in_parallel
+from .errors import ProxmoxException
+from typing import Dict, Any, List, Mapping, Tuple
+from collections import defaultdict
+from types import MappingProxyType
+import gzip
+import json
+import time
+
+# Version of file format written by ProxmoxClusterSnapshot.save
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def _freeze(value: Any) -> Any:
+    # Dicts become read-only views and lists become tuples, so data can be shared by properties without copying
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(el) for key, el in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(el) for el in value)
+    return value
+
+
+class ProxmoxClusterSnapshot:
+    """
+    Frozen point-in-time view of a cluster: nodes, VMs, containers, storages, users, ACL and roles fetched once
+    (concurrently) and indexed for offline queries. Can be saved to a file and loaded later for analysis.
+    Properties return read-only views (MappingProxyType and tuples) that can't be used to change snapshot.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        :param data: Raw API responses as returned by to_dict() (keys "taken_at", "resources", "users", "acl",
+                     "roles")
+        """
+        self._data = data
+        frozen = _freeze(data)
+        self._nodes: Dict[str, Mapping[str, Any]] = {}
+        self._guests: Dict[str, Mapping[str, Any]] = {}
+        self._storages: Dict[str, Mapping[str, Any]] = {}
+        self._guests_by_node: Dict[str, List[str]] = defaultdict(list)
+        for el in frozen["resources"]:
+            if el.get("type") == "node":
+                self._nodes[el["node"]] = el
+            elif el.get("type") in ("qemu", "lxc"):
+                self._guests[str(el["vmid"])] = el
+                self._guests_by_node[el["node"]].append(str(el["vmid"]))
+            elif el.get("type") == "storage":
+                # Same keys as in ProxmoxStorageDict: shared storages by ID, local ones by "node/storage"
+                shared = str(el.get("shared", 0)) == "1"
+                self._storages.setdefault(el["storage"] if shared else f"{el['node']}/{el['storage']}", el)
+        self._guests_by_node = dict(self._guests_by_node)
+        self._users = {el["userid"]: el for el in frozen["users"]}
+        self._acl: Tuple[Mapping[str, Any], ...] = frozen["acl"]
+        self._rrd = frozen.get("rrd", MappingProxyType({}))
+        self._groups_of: Dict[str, List[str]] = {}
+        for userid, el in self._users.items():
+            groups = el.get("groups") or []
+            if isinstance(groups, str):
+                groups = groups.split(",")
+            self._groups_of[userid] = [group for group in groups if group]
+        self._roles = {el["roleid"]: tuple(sorted(priv for priv in str(el.get("privs") or "").split(",") if priv))
+                       for el in data["roles"]}
+
+    @classmethod
+    def take(cls, api: APIWrapper, concurrency: int = 4, rrd_timeframe: str = None) -> 'ProxmoxClusterSnapshot':
+        """
+        Fetch state of cluster with one request for each kind of data, all of them in parallel
+        :param api: APIWrapper object
+        :param concurrency: Maximum number of simultaneous requests (optional, default=4)
+        :param rrd_timeframe: Also fetch peak usage history of online nodes for this timeframe ("hour", "day",
+                              "week", "month" or "year") (optional)
+        :return: ProxmoxClusterSnapshot object
+        """
+        fetchers = {
+            "resources": api.list_resources,
+            "users": lambda: api.list_users(full="1"),
+            "acl": api.get_access_control_list,
+            "roles": api.list_roles,
+        }
+        data: Dict[str, Any] = {"version": SNAPSHOT_FORMAT_VERSION, "taken_at": time.time()}
+        errors = {}
+        for name, result, exception in run_in_parallel(lambda name: fetchers[name](), fetchers.keys(),
+                                                       concurrency=concurrency):
+            if exception is not None:
+                errors[name] = str(exception)
+            else:
+                data[name] = result
+        if not errors and rrd_timeframe is not None:
+            nodes = [el["node"] for el in data["resources"] if el.get("type") == "node" and
+                     el.get("status") == "online"]
+            data["rrd"] = {}
+            for node, result, exception in run_in_parallel(
+                    lambda node: api.get_node_rrd_data(node=node, timeframe=rrd_timeframe, cf="MAX"), nodes,
+                    concurrency=concurrency):
+                if exception is not None:
+                    errors[f"rrd/{node}"] = str(exception)
+                else:
+                    data["rrd"][node] = result
+        if errors:
+            raise ProxmoxException(f"Failed to take snapshot of cluster: {errors}")
+        return cls(data)
+
+    @classmethod
+    def load(cls, filename: str) -> 'ProxmoxClusterSnapshot':
+        """
+        Load snapshot saved by save()
+        :param filename: File name (gzip-compressed if it ends with ".gz")
+        :return: ProxmoxClusterSnapshot object
+        """
+        opener = gzip.open if filename.endswith(".gz") else open
+        with opener(filename, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise ProxmoxException(f"Unsupported snapshot format version: {data.get('version')}")
+        return cls(data)
+
+    def save(self, filename: str) -> None:
+        """
+        Save snapshot to JSON file
+        :param filename: File name, file is gzip-compressed if it ends with ".gz"
+        :return: None
+        """
+        opener = gzip.open if filename.endswith(".gz") else open
+        with opener(filename, "wt", encoding="utf-8") as f:
+            json.dump(self._data, f, separators=(",", ":"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: Raw API responses in JSON-like format
+        """
+        return json.loads(json.dumps(self._data))
+
+    @property
+    def taken_at(self) -> float:
+        """
+        :return: Time when snapshot was taken (UNIX timestamp) (get-only)
+        """
+        return self._data["taken_at"]
+
+    @property
+    def age(self) -> float:
+        """
+        :return: Number of seconds since snapshot was taken (get-only)
+        """
+        return time.time() - self.taken_at
+
+    @property
+    def nodes(self) -> Mapping[str, Mapping[str, Any]]:
+        """
+        :return: Dict where keys are node IDs and values are nodes' info in JSON-like format (get-only)
+        """
+        return MappingProxyType(self._nodes)
+
+    @property
+    def guests(self) -> Mapping[str, Mapping[str, Any]]:
+        """
+        :return: Dict where keys are VM/container IDs and values are guests' info in JSON-like format (get-only)
+        """
+        return MappingProxyType(self._guests)
+
+    @property
+    def vms(self) -> Dict[str, Mapping[str, Any]]:
+        """
+        :return: Dict where keys are VM IDs and values are VMs' info in JSON-like format (get-only)
+        """
+        return {vmid: el for vmid, el in self._guests.items() if el["type"] == "qemu"}
+
+    @property
+    def containers(self) -> Dict[str, Mapping[str, Any]]:
+        """
+        :return: Dict where keys are container IDs and values are containers' info in JSON-like format (get-only)
+        """
+        return {vmid: el for vmid, el in self._guests.items() if el["type"] == "lxc"}
+
+    @property
+    def storages(self) -> Mapping[str, Mapping[str, Any]]:
+        """
+        :return: Dict where keys are storage IDs (shared) or "node/storage" (local) and values are storages' info
+                 in JSON-like format (get-only)
+        """
+        return MappingProxyType(self._storages)
+
+    @property
+    def users(self) -> Mapping[str, Mapping[str, Any]]:
+        """
+        :return: Dict where keys are full user IDs and values are users' info in JSON-like format (get-only)
+        """
+        return MappingProxyType(self._users)
+
+    @property
+    def acl(self) -> Tuple[Mapping[str, Any], ...]:
+        """
+        :return: Access control list entries in JSON-like format (get-only)
+        """
+        return self._acl
+
+    @property
+    def roles(self) -> Mapping[str, Tuple[str, ...]]:
+        """
+        :return: Dict where keys are role names and values are sorted privileges (get-only)
+        """
+        return MappingProxyType(self._roles)
+
+    @property
+    def rrd(self) -> Mapping[str, Tuple[Mapping[str, Any], ...]]:
+        """
+        :return: Dict where keys are node IDs and values are usage history in JSON-like format, empty if snapshot was
+                 taken without rrd_timeframe (get-only)
+        """
+        return self._rrd
+
+    def guests_on(self, node: str) -> List[Mapping[str, Any]]:
+        """
+        :param node: Node ID
+        :return: List of info of VMs/containers located on node
+        """
+        return [self._guests[vmid] for vmid in self._guests_by_node.get(node, [])]
+
+    def groups_of(self, userid: str) -> List[str]:
+        """
+        :param userid: Full user ID (e.g. "username@pve")
+        :return: List of groups of user
+        """
+        return list(self._groups_of.get(userid, []))
+
+    def acl_for(self, userid: str) -> List[Mapping[str, Any]]:
+        """
+        Get ACL entries that apply to user directly or through user's groups
+        :param userid: Full user ID (e.g. "username@pve")
+        :return: List of access control list entries in JSON-like format
+        """
+        groups = set(self.groups_of(userid))
+        return [el for el in self._acl if (el.get("type") == "user" and el.get("ugid") == userid) or
+                (el.get("type") == "group" and el.get("ugid") in groups)]
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get totals of the cluster
+        :return: Dict in JSON-like format with numbers of nodes, guests and users, and memory and disk usage of
+                 online nodes and available storages
+        """
+        online = [el for el in self._nodes.values() if el.get("status") == "online"]
+        return {
+            "taken_at": self.taken_at,
+            "nodes": len(self._nodes),
+            "nodes_online": len(online),
+            "vms": sum(1 for el in self._guests.values() if el["type"] == "qemu"),
+            "containers": sum(1 for el in self._guests.values() if el["type"] == "lxc"),
+            "running": sum(1 for el in self._guests.values() if el.get("status") == "running"),
+            "templates": sum(1 for el in self._guests.values() if str(el.get("template", 0)) == "1"),
+            "users": len(self._users),
+            "mem": sum(int(el.get("mem") or 0) for el in online),
+            "maxmem": sum(int(el.get("maxmem") or 0) for el in online),
+            "storage_used": sum(int(el.get("disk") or 0) for el in self._storages.values()),
+            "storage_total": sum(int(el.get("maxdisk") or 0) for el in self._storages.values()),
+        }
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {len(self._nodes)} nodes, {len(self._guests)} guests at " \
+               f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.taken_at))}>"
@@ -0,0 +1,257 @@
+from typing import Dict, Any, Tuple, Optional, Union
+import re
+
+CONFIG_CONFLICT_STATUS = 500
+CONFIG_CONFLICT_MESSAGE = "detected modified configuration - file changed by other user"
+
+
+class ProxmoxConfig:
+    """
+    Read-only view of a VM/container config with lazily parsed comma-packed values
+    (e.g. "virtio=AA:BB:CC:DD:EE:FF,bridge=vmbr0")
+    """
+
+    # Keys whose values are comma-packed property strings
+    PACKED_KEYS = re.compile(r"^(net\d+|unused\d+)$")
+    # Keys that are describing disks/volumes
+    DISK_KEYS = re.compile(r"^$")
+    # Name under which value without "=" (e.g. volume ID of a disk) is stored
+    DEFAULT_PROPERTY = "value"
+
+    def __init__(self, raw: Dict[str, Any]):
+        self._raw = dict(raw)
+        self._parsed: Dict[str, Dict[str, str]] = {}
+
+    @property
+    def digest(self) -> Optional[str]:
+        """
+        :return: SHA1 digest of config used to prevent concurrent modifications (get-only)
+        """
+        return self._raw.get("digest")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get raw value of config key
+        :param key: Config key
+        :param default: Value to return if key is absent (optional)
+        :return: Raw value
+        """
+        return self._raw.get(key, default)
+
+    def parsed(self, key: str) -> Dict[str, str]:
+        """
+        Get value of config key parsed into a dict (parsing is done only once per key)
+        :param key: Config key
+        :return: Dict of properties
+        """
+        if key not in self._parsed:
+            self._parsed[key] = self.parse_value(self._raw[key], self._default_property(key))
+        return self._parsed[key]
+
+    def is_packed(self, key: str) -> bool:
+        """
+        Whether value of config key is a comma-packed property string
+        :param key: Config key
+        :return: True/False
+        """
+        return bool(self.PACKED_KEYS.match(key))
+
+    @property
+    def disks(self) -> Dict[str, Dict[str, str]]:
+        """
+        :return: Dict of parsed disks/volumes (get-only)
+        """
+        return {key: self.parsed(key) for key in self._raw if self.DISK_KEYS.match(key)}
+
+    @property
+    def networks(self) -> Dict[str, Dict[str, str]]:
+        """
+        :return: Dict of parsed network interfaces (get-only)
+        """
+        return {key: self.parsed(key) for key in self._raw if re.match(r"^net\d+$", key)}
+
+    def diff(self, other: Union['ProxmoxConfig', Dict[str, Any]]) -> Dict[str, Tuple[Any, Any]]:
+        """
+        Compare this config with another one (comma-packed values are compared as parsed properties, so order of
+        properties doesn't matter, other values are compared as strings)
+        :param other: Other config or dict of raw values
+        :return: Dict where keys are changed config keys and values are tuples (this value, other value)
+        """
+        other_raw = other._raw if isinstance(other, ProxmoxConfig) else other
+        result = {}
+        for key in self._raw.keys() | other_raw.keys():
+            if key == "digest":
+                continue
+            old, new = self._raw.get(key), other_raw.get(key)
+            if not self._values_equal(key, old, new):
+                result[key] = (old, new)
+        return result
+
+    def changes(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get only those of given values that differ from this config
+        :param values: Dict of new values (dicts are packed, None means key should be deleted)
+        :return: Dict of changed values ready to be sent to API
+        """
+        result = {}
+        for key, value in values.items():
+            if isinstance(value, dict):
+                value = self.pack_value(value, self._default_property(key))
+            if value is None:
+                if key in self._raw:
+                    result[key] = None
+            elif not self._values_equal(key, self._raw.get(key), value):
+                result[key] = value
+        return result
+
+    def update_kwargs(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get arguments for config update API call that change only differing keys
+        :param values: Dict of new values (dicts are packed, None means key should be deleted)
+        :return: Dict of arguments including "delete" and "digest" (empty if nothing has to be changed)
+        """
+        changes = self.changes(values)
+        if not changes:
+            return {}
+        kwargs = {key: value for key, value in changes.items() if value is not None}
+        delete = [key for key, value in changes.items() if value is None]
+        if delete:
+            kwargs["delete"] = ",".join(delete)
+        if self.digest is not None:
+            kwargs["digest"] = self.digest
+        return kwargs
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: Raw config in JSON-like format
+        """
+        return dict(self._raw)
+
+    @staticmethod
+    def parse_value(value: Any, default_property: str = DEFAULT_PROPERTY) -> Dict[str, str]:
+        """
+        Parse comma-packed property string
+        :param value: String like "local-lvm:vm-100-disk-0,size=32G"
+        :param default_property: Name for item without "=" (optional, default="value")
+        :return: Dict of properties
+        """
+        result = {}
+        for item in str(value).split(","):
+            if not item:
+                continue
+            if "=" in item:
+                name, _, prop = item.partition("=")
+                result[name] = prop
+            else:
+                result[default_property] = item
+        return result
+
+    @staticmethod
+    def pack_value(properties: Dict[str, Any], default_property: str = DEFAULT_PROPERTY) -> str:
+        """
+        Pack dict of properties into comma-packed property string
+        :param properties: Dict of properties
+        :param default_property: Name of property that is written without "=" (optional, default="value")
+        :return: Comma-packed string
+        """
+        items = [str(properties[default_property])] if default_property in properties else []
+        items += [f"{name}={prop}" for name, prop in properties.items() if name != default_property]
+        return ",".join(items)
+
+    def _default_property(self, key: str) -> str:
+        return self.DEFAULT_PROPERTY
+
+    def _values_equal(self, key: str, a: Any, b: Any) -> bool:
+        if a is None or b is None:
+            return a is b
+        if str(a) == str(b):
+            return True
+        if self.is_packed(key):
+            default_property = self._default_property(key)
+            return self.parse_value(a, default_property) == self.parse_value(b, default_property)
+        return False
+
+    def __getitem__(self, key: str) -> Any:
+        return self._raw[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._raw
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def keys(self):
+        return self._raw.keys()
+
+    def values(self):
+        return self._raw.values()
+
+    def items(self):
+        return self._raw.items()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {repr(self._raw)}>"
+
+    def __eq__(self, other: Union['ProxmoxConfig', Dict[str, Any]]):
+        if not isinstance(other, (ProxmoxConfig, dict)):
+            return NotImplemented
+        return not self.diff(other)
+
+    # Configs compare equal to dicts with the same values, which are unhashable too
+    __hash__ = None
+
+
+class ProxmoxVMConfig(ProxmoxConfig):
+    """
+    Config of QEMU virtual machine
+    """
+
+    PACKED_KEYS = re.compile(r"^((ide|sata|scsi|virtio|net|unused|ipconfig|hostpci|usb|numa)\d+|efidisk0|tpmstate0|"
+                             r"agent|vga|boot|rng0|audio0|spice_enhancements|smbios1)$")
+    DISK_KEYS = re.compile(r"^((ide|sata|scsi|virtio)\d+|efidisk0|tpmstate0)$")
+
+    def _default_property(self, key: str) -> str:
+        if self.DISK_KEYS.match(key) or key.startswith("unused"):
+            return "file"
+        if key == "agent":
+            return "enabled"
+        if key == "vga":
+            return "type"
+        return self.DEFAULT_PROPERTY
+
+
+class ProxmoxContainerConfig(ProxmoxConfig):
+    """
+    Config of LXC container
+    """
+
+    PACKED_KEYS = re.compile(r"^((mp|net|unused|dev)\d+|rootfs|features)$")
+    DISK_KEYS = re.compile(r"^(rootfs|mp\d+)$")
+
+    @property
+    def mount_points(self) -> Dict[str, Dict[str, str]]:
+        """
+        :return: Dict of parsed mount points (get-only)
+        """
+        return {key: self.parsed(key) for key in self._raw if re.match(r"^mp\d+$", key)}
+
+    def _default_property(self, key: str) -> str:
+        if self.DISK_KEYS.match(key) or key.startswith("unused"):
+            return "volume"
+        if key.startswith("dev"):
+            return "path"
+        return self.DEFAULT_PROPERTY
+
+
+def is_config_conflict(exception: Exception) -> bool:
+    """
+    Check if exception was raised because config was modified since it was read (digest mismatch)
+    :param exception: Exception raised by API call
+    :return: True/False
+    """
+    # Proxmox VE reports digest mismatch as internal server error with this message
+    return getattr(exception, "status_code", None) == CONFIG_CONFLICT_STATUS and \
+        CONFIG_CONFLICT_MESSAGE in str(exception)
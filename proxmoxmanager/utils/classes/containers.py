@@ -1,7 +1,14 @@
 from ..api import APIWrapper
 from .nodes import ProxmoxNode, ProxmoxNodeDict
+from .storages import ProxmoxStorage
 from .users import ProxmoxUser
-from typing import Dict, List, Tuple, Any, Union
+from .tasks import ProxmoxTask, run_bulk_action
+from .snapshots import check_snapshot_name, CURRENT_SNAPSHOT
+from .backups import backup_kwargs
+from .configs import ProxmoxContainerConfig, is_config_conflict
+from ..parallel import run_in_parallel, iter_in_parallel
+from typing import Dict, List, Tuple, Any, Union, Callable
+from threading import Event
 
 
 class ProxmoxContainer:
@@ -38,6 +45,76 @@ class ProxmoxContainer:
         """
         return self._api.get_container_config(node=self._node, vmid=self._vmid)
 
+    def get_parsed_config(self) -> ProxmoxContainerConfig:
+        """
+        Get detailed config as a parsed object
+        :return: ProxmoxContainerConfig object
+        """
+        return ProxmoxContainerConfig(self.get_config())
+
+    def set_config(self, values: Dict[str, Any], current: ProxmoxContainerConfig = None) -> None:
+        """
+        Update config, sending only changed keys together with digest of current config
+        :param values: Dict of new values (dicts are packed, None means key should be deleted)
+        :param current: Current config, fetched if not given (optional)
+        :return: None
+        """
+        if current is None:
+            current = self.get_parsed_config()
+        kwargs = current.update_kwargs(values)
+        if not kwargs:
+            return
+        self._api.update_container_config(node=self._node, vmid=self._vmid, **kwargs)
+
+    def update_config(self, values: Dict[str, Any], current: ProxmoxContainerConfig = None,
+                      retries: int = 3) -> bool:
+        """
+        Update config, re-reading config and retrying if it was modified concurrently
+        :param values: Dict of new values (dicts are packed, None means key should be deleted)
+        :param current: Current config, fetched if not given (optional)
+        :param retries: How many times to retry on digest mismatch (optional, default=3)
+        :return: True if config was changed, False if nothing had to be changed
+        """
+        for attempt in range(retries + 1):
+            if current is None:
+                current = self.get_parsed_config()
+            kwargs = current.update_kwargs(values)
+            if not kwargs:
+                return False
+            try:
+                self._api.update_container_config(node=self._node, vmid=self._vmid, **kwargs)
+                return True
+            except Exception as e:
+                if attempt == retries or not is_config_conflict(e):
+                    raise
+                current = None
+
+    def get_pending_changes(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get config changes that were saved but not applied to running container yet
+        :return: Dict where keys are config keys and values are dicts with current "value" and new "pending" value
+                 or "delete"
+        """
+        return {el["key"]: el for el in self._api.get_container_pending(node=self._node, vmid=self._vmid)
+                if "pending" in el or el.get("delete")}
+
+    def apply_config(self, values: Dict[str, Any], retries: int = 3,
+                     check_pending: bool = True) -> Dict[str, Any]:
+        """
+        Update config and find out which changes could not be hot-applied to running container
+        :param values: Dict of new values (dicts are packed, None means key should be deleted)
+        :param retries: How many times to retry on digest mismatch (optional, default=3)
+        :param check_pending: Whether to check which changed keys need restart (optional, default=True)
+        :return: Dict with keys "changed" (True/False) and "restart_required" (list of given config keys that only
+                 take effect after restart)
+        """
+        changed = self.update_config(values, retries=retries)
+        restart_required = []
+        if changed and check_pending:
+            # Changes that were already pending before aren't caused by this call
+            restart_required = sorted(set(self.get_pending_changes().keys()) & set(values.keys()))
+        return {"changed": changed, "restart_required": restart_required}
+
     def running(self) -> bool:
         """
         Whether container is currently running
@@ -55,13 +132,15 @@ class ProxmoxContainer:
         return "template" in config.keys() and config["template"] == 1
 
     def clone(self, newid: Union[str, int], newnode: Union[str, ProxmoxNode] = None, name: str = None,
-              full: bool = True) -> str:
+              full: bool = True, storage: Union[str, ProxmoxStorage] = None) -> str:
         """
         Clone LXC container
         :param newid: ID of new LXC (integer number 100-999999999)
         :param newnode: New node ID or ProxmoxNode object (optional)
         :param name: Name of new LXC (optional)
         :param full: Whether to make storage unlinked (note that linked might not be supported) (optional, default=True)
+        :param storage: Target storage ID or ProxmoxStorage object for full clone, e.g. chosen with
+                        ProxmoxStorageDict.choose_by_most_free_space (optional)
         :return: ID of cloning task
         """
         try:
@@ -78,14 +157,45 @@ class ProxmoxContainer:
             kwargs["target"] = newnode
         if name is not None:
             kwargs["hostname"] = name
+        if storage is not None:
+            if isinstance(storage, ProxmoxStorage):
+                storage = storage.id
+            kwargs["storage"] = storage
         return self._api.clone_container(**kwargs)
 
-    def delete(self) -> str:
+    def migrate(self, target: Union[str, ProxmoxNode], restart: bool = None, timeout: int = None,
+                bwlimit: int = None) -> str:
+        """
+        Migrate container to other node (running containers can only be migrated with restart)
+        :param target: Target node ID or ProxmoxNode object
+        :param restart: Whether to use restart migration (optional, default=whether container is running)
+        :param timeout: Number of seconds to wait for container shutdown in restart mode (optional)
+        :param bwlimit: Bandwidth limit in KiB/s (optional)
+        :return: ID of migration task
+        """
+        if isinstance(target, ProxmoxNode):
+            target = target.id
+        if restart is None:
+            restart = self.running()
+        kwargs = {"target": target, "node": self._node, "vmid": self._vmid, "restart": '1' if restart else '0'}
+        if timeout is not None:
+            kwargs["timeout"] = str(timeout)
+        if bwlimit is not None:
+            kwargs["bwlimit"] = str(bwlimit)
+        return self._api.migrate_container(**kwargs)
+
+    def delete(self, purge: bool = False) -> str:
         """
         Delete this container
+        :param purge: Whether to also remove it from backup jobs, HA and replication and destroy unreferenced disks
+                      (optional, default=False)
         :return: ID of deleting task
         """
-        return self._api.delete_container(node=self._node, vmid=self._vmid)
+        kwargs = {"node": self._node, "vmid": self._vmid}
+        if purge:
+            kwargs["purge"] = '1'
+            kwargs["destroy-unreferenced-disks"] = '1'
+        return self._api.delete_container(**kwargs)
 
     def start(self) -> str:
         """
@@ -144,6 +254,63 @@ class ProxmoxContainer:
         kwargs = {"node": self._node, "vmid": self._vmid}
         return self._api.resume_container(**kwargs)
 
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """
+        Get list of snapshots of this container
+        :return: List of snapshots' info in JSON-like format (name, description, snaptime, parent...)
+        """
+        snapshots = self._api.list_container_snapshots(node=self._node, vmid=self._vmid)
+        return [el for el in snapshots if el.get("name") != CURRENT_SNAPSHOT]
+
+    def snapshot(self, name: str, description: str = None) -> str:
+        """
+        Create snapshot of this container
+        :param name: Snapshot name (2-40 letters, digits, "-" and "_" starting with a letter)
+        :param description: Description of snapshot (optional)
+        :return: ID of task
+        """
+        kwargs = {"snapname": check_snapshot_name(name), "node": self._node, "vmid": self._vmid}
+        if description is not None:
+            kwargs["description"] = description
+        return self._api.create_container_snapshot(**kwargs)
+
+    def rollback(self, name: str, start: bool = False) -> str:
+        """
+        Roll this container back to snapshot
+        :param name: Snapshot name
+        :param start: Whether to start container after rollback (optional, default=False)
+        :return: ID of task
+        """
+        kwargs = {"snapname": name, "node": self._node, "vmid": self._vmid}
+        if start:
+            kwargs["start"] = '1'
+        return self._api.rollback_container_snapshot(**kwargs)
+
+    def delete_snapshot(self, name: str, force: bool = False) -> str:
+        """
+        Delete snapshot of this container
+        :param name: Snapshot name
+        :param force: Whether to remove snapshot from config even if removing disk snapshots fails
+                      (optional, default=False)
+        :return: ID of task
+        """
+        kwargs = {"snapname": name, "node": self._node, "vmid": self._vmid}
+        if force:
+            kwargs["force"] = '1'
+        return self._api.delete_container_snapshot(**kwargs)
+
+    def backup(self, storage: str = None, mode: str = "snapshot", compress: str = "zstd", notes: str = None) -> str:
+        """
+        Back up this container with vzdump
+        :param storage: Target storage (optional, default=storage from node's vzdump.conf)
+        :param mode: "snapshot", "suspend" or "stop" (optional, default="snapshot")
+        :param compress: Compression algorithm ("0", "gzip", "lzo" or "zstd") (optional, default="zstd")
+        :param notes: Template of backup notes, e.g. "{{guestname}}" (optional)
+        :return: ID of task
+        """
+        return self._api.create_backup(node=self._node, vmid=self._vmid,
+                                       **backup_kwargs(storage=storage, mode=mode, compress=compress, notes=notes))
+
     def view_permissions(self) -> List[Tuple[ProxmoxUser, str]]:
         """
         Get a list of users with permissions for this container and their roles
@@ -151,8 +318,8 @@ class ProxmoxContainer:
         """
         path = "/vms/" + self._vmid
         resp = self._api.get_access_control_list()
-        return [(ProxmoxUser(self._api, el["ugid"].split("@")[0]), el["roleid"]) for el in resp if
-                el["path"] and el["type"] == "user" and el["ugid"].split("@")[1] == "pve" and el["path"] == path]
+        return [(ProxmoxUser(self._api, el["ugid"]), el["roleid"]) for el in resp if
+                el["path"] and el["type"] == "user" and el["path"] == path]
 
     def add_permission(self, user: Union[str, ProxmoxUser], role: str) -> None:
         """
@@ -162,9 +329,9 @@ class ProxmoxContainer:
         :return: None
         """
         path = "/vms/" + self._vmid
-        if isinstance(user, ProxmoxUser):
-            user = user.id
-        self._api.update_access_control_list(path=path, roles=role, users=user + "@pve", delete="0", propagate="0")
+        if not isinstance(user, ProxmoxUser):
+            user = ProxmoxUser(self._api, user)
+        self._api.update_access_control_list(path=path, roles=role, users=user.fullid, delete="0", propagate="0")
 
     def remove_permission(self, user: Union[str, ProxmoxUser], role: str) -> None:
         """
@@ -174,9 +341,9 @@ class ProxmoxContainer:
         :return: None
         """
         path = "/vms/" + self._vmid
-        if isinstance(user, ProxmoxUser):
-            user = user.id
-        self._api.update_access_control_list(path=path, roles=role, users=user + "@pve", delete="1", propagate="0")
+        if not isinstance(user, ProxmoxUser):
+            user = ProxmoxUser(self._api, user)
+        self._api.update_access_control_list(path=path, roles=role, users=user.fullid, delete="1", propagate="0")
 
     def remove_all_permissions(self) -> None:
         """
@@ -223,6 +390,183 @@ class ProxmoxContainerDict:
         self._get_containers()
         self._containers[vmid].delete()
 
+    def remove_many(self, vmids: List[Union[str, int]], stop_first: bool = True, purge: bool = True,
+                    concurrency: int = 8, per_node: int = None,
+                    timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Remove many containers in parallel using a single inventory request
+        :param vmids: List of container IDs
+        :param stop_first: Whether to stop running containers before removing them (optional, default=True)
+        :param purge: Whether to also remove them from backup jobs, HA and replication and destroy unreferenced
+                      disks (optional, default=True)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional)
+        :param timeout: Number of seconds to wait for each stage of tasks (optional)
+        :return: Dict where keys are container IDs and values are results in JSON-like format
+        """
+        targets, resources, results = self._find_many(vmids)
+
+        if stop_first:
+            running = {vmid: target for vmid, target in targets.items() if
+                       resources[vmid].get("status") == "running"}
+            for vmid, result in run_bulk_action(self._api, running, lambda target: target.stop(),
+                                                concurrency=concurrency, per_node=per_node, timeout=timeout).items():
+                if result["status"] != "ok":
+                    result["error"] = f"Failed to stop: {result['error'] or result['status']}"
+                    results[vmid] = result
+                    del targets[vmid]
+
+        results.update(run_bulk_action(self._api, targets, lambda target: target.delete(purge=purge),
+                                       concurrency=concurrency, per_node=per_node, timeout=timeout))
+        return results
+
+    def snapshot_many(self, vmids: List[Union[str, int]], name: str, description: str = None,
+                      concurrency: int = 8, per_node: int = 2, wait: bool = True,
+                      timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshot many containers in parallel using a single inventory request
+        :param vmids: List of container IDs
+        :param name: Snapshot name (2-40 letters, digits, "-" and "_" starting with a letter)
+        :param description: Description of snapshots (optional)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional, default=2)
+        :param wait: Whether to wait for snapshot tasks to finish (optional, default=True)
+        :param timeout: Number of seconds to wait for tasks (optional)
+        :return: Dict where keys are container IDs and values are results in JSON-like format
+        """
+        check_snapshot_name(name)
+        targets, _, results = self._find_many(vmids)
+        results.update(run_bulk_action(self._api, targets,
+                                       lambda target: target.snapshot(name, description=description),
+                                       concurrency=concurrency, per_node=per_node, wait=wait, timeout=timeout))
+        return results
+
+    def rollback_many(self, vmids: List[Union[str, int]], name: str, start: bool = False, concurrency: int = 8,
+                      per_node: int = 2, wait: bool = True, timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Roll many containers back to snapshot with the same name in parallel using a single inventory request
+        :param vmids: List of container IDs
+        :param name: Snapshot name
+        :param start: Whether to start containers after rollback (optional, default=False)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional, default=2)
+        :param wait: Whether to wait for rollback tasks to finish (optional, default=True)
+        :param timeout: Number of seconds to wait for tasks (optional)
+        :return: Dict where keys are container IDs and values are results in JSON-like format
+        """
+        targets, _, results = self._find_many(vmids)
+        results.update(run_bulk_action(self._api, targets, lambda target: target.rollback(name, start=start),
+                                       concurrency=concurrency, per_node=per_node, wait=wait, timeout=timeout))
+        return results
+
+    def apply_configs(self, changes: Dict[Union[str, int], Dict[str, Any]], concurrency: int = 8,
+                      per_node: int = 4, retries: int = 3, wait: bool = True,
+                      timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Update configs of many containers in parallel, retrying on digest mismatch
+        :param changes: Dict where keys are container IDs and values are dicts of new config values
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional, default=4)
+        :param retries: How many times to retry on digest mismatch (optional, default=3)
+        :param wait: Whether to wait for update tasks to finish (optional, default=True)
+        :param timeout: Number of seconds to wait for tasks (optional)
+        :return: Dict where keys are container IDs and values are results in JSON-like format
+        """
+        changes = {str(vmid): values for vmid, values in changes.items()}
+        self._get_containers()
+        targets = {vmid: self._containers[vmid] for vmid in changes if vmid in self._containers}
+        results = {vmid: {"node": None, "task": None, "status": "error", "error": f"Container {vmid} not found"}
+                   for vmid in changes if vmid not in targets}
+        results.update(run_bulk_action(self._api, targets,
+                                       lambda target: target.update_config(changes[target.id], retries=retries),
+                                       concurrency=concurrency, per_node=per_node, wait=wait, timeout=timeout))
+        return results
+
+    def push_configs(self, changes: Dict[Union[str, int], Dict[str, Any]], restart: bool = False,
+                     max_unavailable: int = 1, per_node: int = 4, retries: int = 3, timeout: float = None,
+                     stop_on_error: bool = True,
+                     progress: Callable[[str, Dict[str, Any], int, int], None] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Update configs of many containers node by node using a single inventory request, report which changes need
+        restart of running containers and optionally restart them in a rolling fashion
+        :param changes: Dict where keys are container IDs and values are dicts of new config values
+        :param restart: Whether to reboot running containers whose changes could not be hot-applied
+                        (optional, default=False)
+        :param max_unavailable: Maximum number of containers rebooting at the same time (optional, default=1)
+        :param per_node: Maximum number of simultaneous config updates on one node (optional, default=4)
+        :param retries: How many times to retry on digest mismatch (optional, default=3)
+        :param timeout: Number of seconds to wait for each reboot (optional)
+        :param stop_on_error: Whether to stop rollout after the first failed update or reboot, containers that were
+                              not processed are reported as "skipped" (optional, default=True)
+        :param progress: Function called after each container is done with container ID, its result, number of
+                         finished containers and total number of containers (optional)
+        :return: Dict where keys are container IDs and values are results in JSON-like format ({"node": ...,
+                 "status": "ok"/"unchanged"/"skipped"/"error", "restart_required": [...], "restarted": True/False,
+                 "task": ..., "error": ...})
+        """
+        targets, resources, results = self._find_many(list(changes.keys()))
+        changes = {str(vmid): values for vmid, values in changes.items()}
+        for result in results.values():
+            result.update(restart_required=[], restarted=False)
+        by_node: Dict[str, List[str]] = {}
+        for vmid, target in targets.items():
+            by_node.setdefault(target.node.id, []).append(vmid)
+        # Set after first error if stop_on_error, reboots that are already queued are skipped
+        halted = Event()
+        done = 0
+
+        def update(vmid):
+            return targets[vmid].apply_config(changes[vmid], retries=retries,
+                                              check_pending=resources[vmid].get("status") == "running")
+
+        def reboot(vmid):
+            if halted.is_set():
+                return None
+            upid = targets[vmid].reboot()
+            return upid, ProxmoxTask(self._api, upid).wait(timeout=timeout)
+
+        for node in sorted(by_node):
+            node_results = {}
+            if halted.is_set():
+                for vmid in by_node[node]:
+                    node_results[vmid] = {"node": node, "status": "skipped", "restart_required": [],
+                                          "restarted": False, "task": None, "error": "Stopped after previous error"}
+            else:
+                for vmid, outcome, exception in run_in_parallel(update, by_node[node], concurrency=per_node):
+                    result = {"node": node, "status": "ok", "restart_required": [], "restarted": False,
+                              "task": None, "error": None}
+                    if exception is not None:
+                        result.update(status="error", error=str(exception))
+                    else:
+                        result["restart_required"] = outcome["restart_required"]
+                        if not outcome["changed"]:
+                            result["status"] = "unchanged"
+                    node_results[vmid] = result
+                if stop_on_error and any(result["status"] == "error" for result in node_results.values()):
+                    halted.set()
+
+            to_restart = [vmid for vmid, result in node_results.items() if result["restart_required"]]
+            if restart and to_restart and not halted.is_set():
+                for vmid, outcome, exception in iter_in_parallel(reboot, to_restart, concurrency=max_unavailable):
+                    result = node_results[vmid]
+                    if exception is not None:
+                        result.update(status="error", error=str(exception))
+                    elif outcome is not None:
+                        result["task"] = outcome[0]
+                        if outcome[1] != "OK":
+                            result.update(status="error", error=outcome[1])
+                        else:
+                            result.update(restarted=True, restart_required=[])
+                    if stop_on_error and result["status"] == "error":
+                        halted.set()
+
+            for vmid, result in node_results.items():
+                results[vmid] = result
+                done += 1
+                if progress is not None:
+                    progress(vmid, result, done, len(targets))
+        return results
+
     def __len__(self):
         self._get_containers()
         return len(self._containers)
@@ -246,3 +590,14 @@ class ProxmoxContainerDict:
             resp = self._api.list_containers(node)
             containers += [ProxmoxContainer(self._api, str(cont["vmid"]), node) for cont in resp]
         self._containers = {cont.id: cont for cont in containers}
+
+    def _find_many(self, vmids: List[Union[str, int]]) \
+            -> Tuple[Dict[str, ProxmoxContainer], Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        # One inventory request instead of listing every node, IDs that are not found are reported as errors
+        vmids = [str(vmid) for vmid in vmids]
+        resources = {str(el["vmid"]): el for el in self._api.list_resources(type="vm") if el.get("type") == "lxc"}
+        results = {vmid: {"node": None, "task": None, "status": "error", "error": f"Container {vmid} not found"}
+                   for vmid in vmids if vmid not in resources}
+        targets = {vmid: ProxmoxContainer(self._api, vmid, resources[vmid]["node"]) for vmid in vmids
+                   if vmid in resources}
+        return targets, resources, results
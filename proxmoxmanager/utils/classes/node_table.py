@@ -0,0 +1,252 @@
+from .errors import ProxmoxException
+from typing import Dict, Any, List, Iterable, Union, Callable
+
+# Policies for scoring nodes, higher score is better
+POLICIES = ("most_free_ram", "most_free_ram_fraction", "most_free_disk", "least_cpu", "fewest_guests")
+_COLUMNS = ("cpu", "maxcpu", "mem", "maxmem", "disk", "maxdisk", "online", "guests")
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("ProxmoxNodeTable requires numpy, install it with: pip install proxmoxmanager[numpy]") \
+            from None
+    return numpy
+
+
+class ProxmoxNodeTable:
+    """
+    Columnar state of nodes (NumPy arrays of CPU, memory, disk, number of guests and online flags) built from a single
+    cluster resources listing. Filtering, scoring and top-k selection are vectorised and placement updates arrays
+    in place, so the table can be used for fast repeated what-if simulations without any requests.
+    Requires numpy (pip install proxmoxmanager[numpy]).
+    """
+
+    def __init__(self, resources: List[Dict[str, Any]]):
+        """
+        :param resources: Cluster resources in JSON-like format (nodes and optionally VMs/containers to count guests)
+        """
+        np = _import_numpy()
+        nodes = sorted((el for el in resources if el.get("type") == "node"), key=lambda el: el["node"])
+        self._ids: List[str] = [el["node"] for el in nodes]
+        self._index: Dict[str, int] = {node: i for i, node in enumerate(self._ids)}
+        self.cpu = np.array([float(el.get("cpu") or 0) for el in nodes], dtype=np.float64)
+        self.maxcpu = np.array([int(el.get("maxcpu") or 0) for el in nodes], dtype=np.int64)
+        self.mem = np.array([int(el.get("mem") or 0) for el in nodes], dtype=np.int64)
+        self.maxmem = np.array([int(el.get("maxmem") or 0) for el in nodes], dtype=np.int64)
+        self.disk = np.array([int(el.get("disk") or 0) for el in nodes], dtype=np.int64)
+        self.maxdisk = np.array([int(el.get("maxdisk") or 0) for el in nodes], dtype=np.int64)
+        self.online = np.array([el.get("status") == "online" for el in nodes], dtype=bool)
+        self.guests = np.zeros(len(nodes), dtype=np.int64)
+        for el in resources:
+            if el.get("type") in ("qemu", "lxc") and el.get("node") in self._index:
+                self.guests[self._index[el["node"]]] += 1
+
+    @property
+    def ids(self) -> List[str]:
+        """
+        :return: Node IDs in order of rows (get-only)
+        """
+        return list(self._ids)
+
+    @property
+    def free_mem(self):
+        """
+        :return: Array of free memory in bytes (get-only)
+        """
+        return self.maxmem - self.mem
+
+    @property
+    def free_disk(self):
+        """
+        :return: Array of free root disk space in bytes (get-only)
+        """
+        return self.maxdisk - self.disk
+
+    def copy(self) -> 'ProxmoxNodeTable':
+        """
+        Copy table, e.g. to simulate placements without changing original state
+        :return: ProxmoxNodeTable object
+        """
+        table = self.__class__.__new__(self.__class__)
+        table._ids = self._ids
+        table._index = self._index
+        for name in _COLUMNS:
+            setattr(table, name, getattr(self, name).copy())
+        return table
+
+    def add_nodes(self, nodes: List[Dict[str, Any]]) -> None:
+        """
+        Add rows for new (e.g. planned) nodes
+        :param nodes: Nodes' info in JSON-like format like in cluster resources (keys "node", "maxmem", "maxcpu",
+                      "maxdisk", optionally "mem", "disk", "cpu" and "status", default status is "online")
+        :return: None
+        """
+        np = _import_numpy()
+        nodes = [dict({"type": "node", "status": "online"}, **el) for el in nodes]
+        duplicates = [el["node"] for el in nodes if el["node"] in self._index]
+        if duplicates:
+            raise ValueError(f"Nodes already exist: {', '.join(duplicates)}")
+        added = self.__class__(nodes)
+        self._ids = self._ids + added._ids
+        self._index = {node: i for i, node in enumerate(self._ids)}
+        for name in _COLUMNS:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(added, name)]))
+
+    def remove_nodes(self, nodes: Iterable[str]) -> None:
+        """
+        Remove rows of nodes
+        :param nodes: Node IDs
+        :return: None
+        """
+        np = _import_numpy()
+        removed = {str(node) for node in nodes}
+        keep = np.array([node not in removed for node in self._ids], dtype=bool)
+        self._ids = [node for node in self._ids if node not in removed]
+        self._index = {node: i for i, node in enumerate(self._ids)}
+        for name in _COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def mask(self, online_only: bool = True, min_free_mem: int = 0, min_free_disk: int = 0,
+             max_guests: int = None, nodes: Iterable[str] = None):
+        """
+        Get boolean array of nodes that satisfy all conditions
+        :param online_only: Only nodes that are online (optional, default=True)
+        :param min_free_mem: Minimum free memory in bytes (optional, default=0)
+        :param min_free_disk: Minimum free root disk space in bytes (optional, default=0)
+        :param max_guests: Maximum number of VMs/containers on node (optional)
+        :param nodes: Only nodes with these IDs (optional)
+        :return: NumPy boolean array
+        """
+        np = _import_numpy()
+        mask = self.free_mem >= min_free_mem
+        if online_only:
+            mask &= self.online
+        if min_free_disk:
+            mask &= self.free_disk >= min_free_disk
+        if max_guests is not None:
+            mask &= self.guests <= max_guests
+        if nodes is not None:
+            allowed = np.zeros(len(self._ids), dtype=bool)
+            allowed[[self._index[str(node)] for node in nodes if str(node) in self._index]] = True
+            mask &= allowed
+        return mask
+
+    def score(self, policy: Union[str, Callable[['ProxmoxNodeTable'], Any]] = "most_free_ram"):
+        """
+        Score every node
+        :param policy: One of POLICIES or function that takes ProxmoxNodeTable and returns array of scores
+                       (optional, default="most_free_ram")
+        :return: NumPy float array, higher score is better
+        """
+        np = _import_numpy()
+        if callable(policy):
+            return np.asarray(policy(self), dtype=np.float64)
+        if policy == "most_free_ram":
+            return self.free_mem.astype(np.float64)
+        if policy == "most_free_ram_fraction":
+            return np.divide(self.free_mem, self.maxmem, out=np.zeros(len(self._ids)), where=self.maxmem > 0)
+        if policy == "most_free_disk":
+            return self.free_disk.astype(np.float64)
+        if policy == "least_cpu":
+            return -self.cpu
+        if policy == "fewest_guests":
+            return -self.guests.astype(np.float64)
+        raise ValueError(f"Unknown policy: {policy}")
+
+    def top_k(self, k: int, policy: Union[str, Callable[['ProxmoxNodeTable'], Any]] = "most_free_ram",
+              **filters) -> List[str]:
+        """
+        Choose k best nodes
+        :param k: Number of nodes
+        :param policy: How to score nodes, see score (optional, default="most_free_ram")
+        :param filters: Conditions passed to mask (online_only, min_free_mem, min_free_disk, max_guests, nodes)
+        :return: IDs of at most k nodes, best first
+        """
+        np = _import_numpy()
+        candidates = np.flatnonzero(self.mask(**filters))
+        if k <= 0 or not len(candidates):
+            return []
+        scores = self.score(policy)[candidates]
+        if k < len(candidates):
+            # Only k best nodes are sorted
+            part = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return [self._ids[i] for i in candidates[order]]
+
+    def choose(self, policy: Union[str, Callable[['ProxmoxNodeTable'], Any]] = "most_free_ram", **filters) -> str:
+        """
+        Choose best node
+        :param policy: How to score nodes, see score (optional, default="most_free_ram")
+        :param filters: Conditions passed to mask (online_only, min_free_mem, min_free_disk, max_guests, nodes)
+        :return: Node ID
+        """
+        np = _import_numpy()
+        scores = np.where(self.mask(**filters), self.score(policy), -np.inf)
+        if not len(scores) or scores.max() == -np.inf:
+            raise ProxmoxException("No suitable nodes found")
+        return self._ids[int(scores.argmax())]
+
+    def place(self, guests: List[Dict[str, Any]],
+              policy: Union[str, Callable[['ProxmoxNodeTable'], Any]] = "most_free_ram", online_only: bool = True,
+              nodes: Iterable[str] = None, strict: bool = True) -> Dict[str, str]:
+        """
+        Choose node for every guest and update table in place as if guests were created there
+        :param guests: List of dicts with keys "vmid", "maxmem" and optionally "maxdisk" (bytes)
+        :param policy: How to score nodes, see score (optional, default="most_free_ram")
+        :param online_only: Only place guests on online nodes (optional, default=True)
+        :param nodes: Only place guests on nodes with these IDs (optional)
+        :param strict: Whether to raise exception if some guest doesn't fit, otherwise it is left out of result
+                       (optional, default=True)
+        :return: Dict where keys are VM/container IDs and values are node IDs
+        """
+        np = _import_numpy()
+        allowed = self.mask(online_only=online_only, nodes=nodes)
+        placement = {}
+        # Biggest guests are placed first so that they still fit somewhere
+        for guest in sorted(guests, key=lambda el: el.get("maxmem", 0), reverse=True):
+            maxmem = int(guest.get("maxmem") or 0)
+            maxdisk = int(guest.get("maxdisk") or 0)
+            fits = allowed & (self.free_mem >= maxmem) & (self.free_disk >= maxdisk)
+            scores = np.where(fits, self.score(policy), -np.inf)
+            if scores.max(initial=-np.inf) == -np.inf:
+                if not strict:
+                    continue
+                raise ProxmoxException(f"No node has enough resources for {guest['vmid']}")
+            node = self._ids[int(scores.argmax())]
+            self.reserve(node, maxmem=maxmem, maxdisk=maxdisk)
+            placement[str(guest["vmid"])] = node
+        return placement
+
+    def reserve(self, node: str, maxmem: int = 0, maxdisk: int = 0) -> None:
+        """
+        Update table in place as if guest was created on node (nothing is checked, so node can be overcommitted)
+        :param node: Node ID
+        :param maxmem: Memory of guest in bytes (optional, default=0)
+        :param maxdisk: Disk space of guest in bytes (optional, default=0)
+        :return: None
+        """
+        i = self._index[str(node)]
+        self.mem[i] += int(maxmem)
+        self.disk[i] += int(maxdisk)
+        self.guests[i] += 1
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: Dict where keys are node IDs and values are nodes' state in JSON-like format
+        """
+        return {node: {"cpu": float(self.cpu[i]), "maxcpu": int(self.maxcpu[i]), "mem": int(self.mem[i]),
+                       "maxmem": int(self.maxmem[i]), "disk": int(self.disk[i]), "maxdisk": int(self.maxdisk[i]),
+                       "guests": int(self.guests[i]), "online": bool(self.online[i])}
+                for i, node in enumerate(self._ids)}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key: str) -> bool:
+        return str(key) in self._index
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self._ids}>"
@@ -1,9 +1,25 @@
 from ..api import APIWrapper
+from ..parallel import iter_in_parallel
 from .errors import ProxmoxException
-from typing import Dict, Any, List, Tuple
+from .tasks import ProxmoxTask
+from .node_table import ProxmoxNodeTable, _import_numpy
+from typing import Dict, Any, List, Tuple, Union, Callable, Optional
 from random import choice
 
 
+def _has_numpy() -> bool:
+    # Nodes are scored by ProxmoxNodeTable when numpy is installed, callers fall back to plain loops otherwise
+    try:
+        _import_numpy()
+    except ImportError:
+        return False
+    return True
+
+
+def _node_table(api: APIWrapper) -> Optional[ProxmoxNodeTable]:
+    return ProxmoxNodeTable(api.list_resources(type="node")) if _has_numpy() else None
+
+
 class ProxmoxNode:
     def __init__(self, api: APIWrapper, node: str):
         self._api = api
@@ -32,6 +48,114 @@ class ProxmoxNode:
         """
         return self._api.get_node_status(node=self._node)
 
+    def plan_drain(self, target_policy: Union[str, Callable, Dict[str, str]] = "most_free_ram",
+                   targets: List[Union[str, 'ProxmoxNode']] = None) -> Dict[str, str]:
+        """
+        Choose target node for every VM/container located on this node
+        :param target_policy: "most_free_ram", "fewest_guests" (with numpy nodes are scored by ProxmoxNodeTable),
+                              function that takes guest info and dict of candidate nodes' info and returns node ID,
+                              or dict of VM/container IDs and node IDs (optional, default="most_free_ram")
+        :param targets: Only choose between a given list of nodes (optional)
+        :return: Dict where keys are VM/container IDs and values are target node IDs
+        """
+        return self._plan_drain(self._api.list_resources(), target_policy, targets)
+
+    def drain(self, target_policy: Union[str, Callable, Dict[str, str]] = "most_free_ram", max_parallel: int = 2,
+              max_per_target: int = 1, bwlimit: int = None, targets: List[Union[str, 'ProxmoxNode']] = None,
+              timeout: float = None,
+              progress: Callable[[str, Dict[str, Any], int, int], None] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Migrate all VMs/containers away from this node (e.g. for maintenance)
+        :param target_policy: How to choose target nodes, see plan_drain (optional, default="most_free_ram")
+        :param max_parallel: Maximum number of simultaneous migrations from this node (optional, default=2)
+        :param max_per_target: Maximum number of simultaneous migrations to one node (optional, default=1)
+        :param bwlimit: Bandwidth limit of each migration in KiB/s (optional)
+        :param targets: Only migrate to a given list of nodes (optional)
+        :param timeout: Number of seconds to wait for each migration (optional)
+        :param progress: Function called after each migration with VM/container ID, its result,
+                         number of finished migrations and total number of migrations (optional)
+        :return: Dict where keys are VM/container IDs and values are results in JSON-like format
+        """
+        resources = self._api.list_resources()
+        placement = self._plan_drain(resources, target_policy, targets)
+        guests = {str(el["vmid"]): el for el in resources if el.get("type") in ("qemu", "lxc") and
+                  el.get("node") == self._node}
+
+        def migrate(vmid):
+            running = guests[vmid].get("status") == "running"
+            kwargs = {"target": placement[vmid], "node": self._node, "vmid": vmid}
+            if bwlimit is not None:
+                kwargs["bwlimit"] = str(bwlimit)
+            if guests[vmid]["type"] == "qemu":
+                upid = self._api.migrate_vm(online='1' if running else '0', **kwargs)
+            else:
+                upid = self._api.migrate_container(restart='1' if running else '0', **kwargs)
+            return upid, ProxmoxTask(self._api, upid).wait(timeout=timeout)
+
+        results = {}
+        for vmid, outcome, exception in iter_in_parallel(migrate, placement.keys(), concurrency=max_parallel,
+                                                         group_key=placement.get, group_limit=max_per_target):
+            result = {"type": guests[vmid]["type"], "target": placement[vmid], "task": None, "status": "ok",
+                      "error": None}
+            if exception is not None:
+                result.update(status="error", error=str(exception))
+            else:
+                result["task"] = outcome[0]
+                if outcome[1] != "OK":
+                    result.update(status="error", error=outcome[1])
+            results[vmid] = result
+            if progress is not None:
+                progress(vmid, result, len(results), len(placement))
+        return results
+
+    def _plan_drain(self, resources: List[Dict[str, Any]], target_policy: Union[str, Callable, Dict[str, str]],
+                    targets: List[Union[str, 'ProxmoxNode']]) -> Dict[str, str]:
+        guests = [el for el in resources if el.get("type") in ("qemu", "lxc") and el.get("node") == self._node]
+        if isinstance(target_policy, dict):
+            target_policy = {str(vmid): str(node) for vmid, node in target_policy.items()}
+            missing = [str(el["vmid"]) for el in guests if str(el["vmid"]) not in target_policy]
+            if missing:
+                raise ValueError(f"No target node given for {', '.join(missing)}")
+            return {str(el["vmid"]): target_policy[str(el["vmid"])] for el in guests}
+
+        candidates = {el["node"]: el for el in resources if el.get("type") == "node" and
+                      el.get("status") == "online" and el["node"] != self._node}
+        if targets is not None:
+            targets = {str(node) for node in targets}
+            candidates = {node: info for node, info in candidates.items() if node in targets}
+        if not candidates:
+            raise ProxmoxException("No online nodes found")
+        if not callable(target_policy) and target_policy not in ("most_free_ram", "fewest_guests"):
+            raise ValueError(f"Unknown target policy: {target_policy}")
+        # String policies are scored by node table, without numpy free memory and guests are counted here
+        table = ProxmoxNodeTable(resources) if not callable(target_policy) and _has_numpy() else None
+        free_memory = {node: info.get("maxmem", 0) - info.get("mem", 0) for node, info in candidates.items()}
+        guest_counts = {node: 0 for node in candidates}
+        if table is None:
+            for el in resources:
+                if el.get("type") in ("qemu", "lxc") and el.get("node") in guest_counts:
+                    guest_counts[el["node"]] += 1
+
+        placement = {}
+        # Biggest guests are placed first so that they still fit somewhere
+        for guest in sorted(guests, key=lambda el: el.get("maxmem", 0), reverse=True):
+            if callable(target_policy):
+                node = str(target_policy(guest, candidates))
+            elif table is not None:
+                node = table.choose(target_policy, nodes=candidates.keys())
+            elif target_policy == "most_free_ram":
+                node = max(free_memory, key=free_memory.get)
+            else:
+                node = min(guest_counts, key=guest_counts.get)
+            placement[str(guest["vmid"])] = node
+            # Memory of guest is reserved even if node doesn't have enough of it, as Proxmox VE allows overcommit
+            if table is not None:
+                table.reserve(node, maxmem=guest.get("maxmem", 0))
+            elif node in free_memory:
+                free_memory[node] -= guest.get("maxmem", 0)
+                guest_counts[node] += 1
+        return placement
+
     def __repr__(self):
         return f"<{self.__class__.__name__}: {self._node}>"
 
@@ -77,13 +201,26 @@ class ProxmoxNodeDict:
     @staticmethod
     def get_memory_info(nodes: List[ProxmoxNode]) -> List[Tuple[ProxmoxNode, float, float]]:
         """
-        Get memory info for a specific list of nodes
+        Get memory info for a specific list of nodes (with numpy it is computed from a single cluster resources
+        request, otherwise status of every node is requested)
         :param nodes: list of ProxmoxNode objects
         :return: A list of tuples (ProxmoxNode, [free memory (float)], [fraction of free memory (float)])
         """
+        table = _node_table(nodes[0]._api) if nodes else None
+        if table is not None:
+            free = table.free_mem.astype(float)
+            fraction = table.score("most_free_ram_fraction")
+            rows = {node: i for i, node in enumerate(table.ids) if table.maxmem[i] > 0}
+        else:
+            rows = {}
         result = []
 
         for node in nodes:
+            i = rows.get(node.id)
+            if i is not None:
+                result.append((node, float(free[i]), float(fraction[i])))
+                continue
+            # Nodes without memory in cluster resources (e.g. offline ones) are asked directly
             memory_info = node.get_status_report()["memory"]
             rating_abs = float(memory_info["free"])
             rating = rating_abs / float(memory_info["total"])
@@ -93,12 +230,23 @@ class ProxmoxNodeDict:
 
     def choose_by_most_free_ram(self, absolute: bool = True, online_only: bool = True, nodes: List[ProxmoxNode] = None) -> ProxmoxNode:
         """
-        Choose from list of availible nodes with most free RAM
+        Choose from list of availible nodes with most free RAM (with numpy nodes are scored by ProxmoxNodeTable
+        built from a single cluster resources request)
         :param absolute: Whether to rate free RAM in bytes or % (optional, default=True)
         :param online_only: Only choose between nodes that are currently online (optional, default=True)
         :param nodes: Only choose between a given list of nodes (optional)
         :return: ProxmoxNode object
         """
+        table = _node_table(self._api)
+        if table is not None:
+            candidates = {node.id: node for node in nodes} if nodes is not None else None
+            try:
+                node = table.choose("most_free_ram" if absolute else "most_free_ram_fraction",
+                                    online_only=online_only, nodes=candidates)
+            except ProxmoxException:
+                raise ProxmoxException(f"No {'online ' if online_only else ''}nodes found") from None
+            return candidates[node] if candidates is not None else ProxmoxNode(self._api, node)
+
         if nodes is None:
             nodes = self.values()
 
@@ -116,6 +264,13 @@ class ProxmoxNodeDict:
 
         return best_node
 
+    def get_table(self) -> ProxmoxNodeTable:
+        """
+        Get columnar state of all nodes for vectorised filtering, scoring and placement (requires numpy)
+        :return: ProxmoxNodeTable object built from a single cluster resources request
+        """
+        return ProxmoxNodeTable(self._api.list_resources())
+
     def __len__(self):
         self._get_nodes()
         return len(self._nodes)
@@ -0,0 +1,159 @@
+from ..api import APIWrapper
+from .cluster import ProxmoxClusterSnapshot
+from .roles import SUPERUSER, normalize_path, build_acl_tree, effective_roles_on_path
+from typing import Dict, Any, List, Iterable, FrozenSet
+
+
+class ProxmoxPermissionMatrix:
+    """
+    Effective privileges of every user on every path, computed in one pass from ACL, user groups and roles that are
+    fetched once. Privileges are stored as bitsets (one int per user and path, only non-empty ones are kept), so
+    queries and export don't make any requests.
+    """
+
+    def __init__(self, snapshot: ProxmoxClusterSnapshot, paths: Iterable[str] = None):
+        """
+        :param snapshot: ProxmoxClusterSnapshot object to take ACL, users, groups and roles from
+        :param paths: ACL paths to evaluate (optional, default=paths from ACL, all nodes, storages and VMs/containers)
+        """
+        self._taken_at = snapshot.taken_at
+        roles = snapshot.roles
+        self._privilege_names: List[str] = sorted(set().union(*roles.values()))
+        self._bits = {priv: 1 << i for i, priv in enumerate(self._privilege_names)}
+        self._role_masks = {roleid: self._mask(privs) for roleid, privs in roles.items()}
+        self._acl = build_acl_tree(snapshot.acl)
+        self._groups_of = {userid: snapshot.groups_of(userid) for userid in snapshot.users.keys()}
+        # Roles on pool also apply to guests in it
+        self._pools = {vmid: el["pool"] for vmid, el in snapshot.guests.items() if el.get("pool")}
+        if paths is None:
+            paths = set(self._acl.keys())
+            paths.update("/nodes/" + node for node in snapshot.nodes.keys())
+            paths.update("/storage/" + storage.split("/")[-1] for storage in snapshot.storages.keys())
+            paths.update("/vms/" + vmid for vmid in snapshot.guests.keys())
+        self._paths: List[str] = sorted({normalize_path(path) for path in paths})
+        # user -> path -> bitset of privileges, users and paths without privileges are left out
+        self._matrix: Dict[str, Dict[str, int]] = {}
+        acl_ugids = {ugid for node in self._acl.values() for kind in node.values() for ugid in kind.keys()}
+        for userid, groups in self._groups_of.items():
+            if userid != SUPERUSER and userid not in acl_ugids and not acl_ugids.intersection(groups):
+                continue
+            row = {}
+            for path in self._paths:
+                mask = self._evaluate(userid, path)
+                if mask:
+                    row[path] = mask
+            if row:
+                self._matrix[userid] = row
+
+    @classmethod
+    def build(cls, api: APIWrapper, paths: Iterable[str] = None,
+              concurrency: int = 4) -> 'ProxmoxPermissionMatrix':
+        """
+        Fetch ACL, users, roles and cluster resources (once, in parallel) and compute matrix
+        :param api: APIWrapper object
+        :param paths: ACL paths to evaluate (optional, default=paths from ACL, all nodes, storages and
+                      VMs/containers)
+        :param concurrency: Maximum number of simultaneous requests (optional, default=4)
+        :return: ProxmoxPermissionMatrix object
+        """
+        return cls(ProxmoxClusterSnapshot.take(api, concurrency=concurrency), paths=paths)
+
+    @property
+    def users(self) -> List[str]:
+        """
+        :return: IDs of users that have any privileges (get-only)
+        """
+        return sorted(self._matrix.keys())
+
+    @property
+    def paths(self) -> List[str]:
+        """
+        :return: Evaluated ACL paths (get-only)
+        """
+        return list(self._paths)
+
+    @property
+    def privilege_names(self) -> List[str]:
+        """
+        :return: Names of all privileges, in order of bits (get-only)
+        """
+        return list(self._privilege_names)
+
+    def privileges(self, userid: str, path: str) -> FrozenSet[str]:
+        """
+        :param userid: Full user ID (e.g. "username@pve")
+        :param path: ACL path, paths not given on creation are evaluated on the fly
+        :return: Set of privileges of user on path
+        """
+        return frozenset(self._names(self._get_mask(userid, normalize_path(path))))
+
+    def has_privilege(self, userid: str, path: str, privilege: str) -> bool:
+        """
+        :param userid: Full user ID (e.g. "username@pve")
+        :param path: ACL path
+        :param privilege: Privilege name, e.g. "VM.PowerMgmt"
+        :return: Whether user has privilege on path
+        """
+        bit = self._bits.get(privilege, 0)
+        return bool(self._get_mask(userid, normalize_path(path)) & bit)
+
+    def users_with(self, privilege: str, path: str) -> List[str]:
+        """
+        :param privilege: Privilege name, e.g. "VM.PowerMgmt"
+        :param path: ACL path
+        :return: IDs of users that have privilege on path
+        """
+        bit = self._bits.get(privilege, 0)
+        path = normalize_path(path)
+        return [userid for userid in sorted(self._matrix.keys()) if self._get_mask(userid, path) & bit]
+
+    def paths_of(self, userid: str, privilege: str = None) -> List[str]:
+        """
+        :param userid: Full user ID (e.g. "username@pve")
+        :param privilege: Only paths where user has this privilege (optional, default=paths with any privilege)
+        :return: Evaluated paths where user has privileges
+        """
+        bit = self._bits.get(privilege, 0) if privilege is not None else -1
+        return [path for path, mask in self._matrix.get(userid, {}).items() if mask & bit]
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """
+        :return: List of dicts with keys "userid", "path" and "privileges" (sorted), one for every non-empty cell
+        """
+        return [{"userid": userid, "path": path, "privileges": self._names(mask)}
+                for userid in sorted(self._matrix.keys()) for path, mask in self._matrix[userid].items()]
+
+    def to_dict(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        :return: Dict user ID -> path -> sorted list of privileges in JSON-like format
+        """
+        return {userid: {path: self._names(mask) for path, mask in row.items()}
+                for userid, row in sorted(self._matrix.items())}
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {len(self._matrix)} users x {len(self._paths)} paths>"
+
+    def _mask(self, privileges: Iterable[str]) -> int:
+        mask = 0
+        for priv in privileges:
+            mask |= self._bits[priv]
+        return mask
+
+    def _names(self, mask: int) -> List[str]:
+        return [priv for i, priv in enumerate(self._privilege_names) if mask >> i & 1]
+
+    def _evaluate(self, userid: str, path: str) -> int:
+        if userid == SUPERUSER:
+            return (1 << len(self._privilege_names)) - 1
+        mask = 0
+        for roleid in effective_roles_on_path(self._acl, self._groups_of.get(userid, []), userid, path, self._pools):
+            mask |= self._role_masks.get(roleid, 0)
+        return mask
+
+    def _get_mask(self, userid: str, path: str) -> int:
+        row = self._matrix.get(userid)
+        if row is not None and path in row:
+            return row[path]
+        if path in self._paths and userid in self._groups_of:
+            return 0
+        return self._evaluate(userid, path)
@@ -0,0 +1,155 @@
+from .cluster import ProxmoxClusterSnapshot
+from .node_table import ProxmoxNodeTable, _import_numpy
+from typing import Dict, Any, List, Iterable, Union, Callable
+
+# Size of new guest if not specified otherwise
+DEFAULT_GUEST_SIZE = {"maxmem": 2 * 1024 ** 3, "maxcpu": 2}
+
+
+class CapacityPlanner:
+    """
+    Offline what-if capacity planning on top of ProxmoxClusterSnapshot: simulates adding, removing and draining nodes
+    and onboarding new guests using the same placement as ProxmoxNodeTable, and reports overcommit ratios and
+    failure-domain headroom. No requests are made, scenarios only copy prepared NumPy arrays, so thousands of them
+    can be evaluated quickly. Requires numpy (pip install proxmoxmanager[numpy]).
+    """
+
+    def __init__(self, snapshot: ProxmoxClusterSnapshot, use_peak: bool = True, running_only: bool = True,
+                 failure_domains: Dict[str, List[str]] = None,
+                 policy: Union[str, Callable[[ProxmoxNodeTable], Any]] = "most_free_ram"):
+        """
+        :param snapshot: ProxmoxClusterSnapshot object (take it with rrd_timeframe to plan for peak usage)
+        :param use_peak: Whether to use peak memory and CPU usage from snapshot's usage history instead of current
+                         usage where history is available (optional, default=True)
+        :param running_only: Whether to only account for running guests (optional, default=True)
+        :param failure_domains: Dict where keys are failure domain names (e.g. racks) and values are lists of node
+                                IDs (optional, default=every node is its own failure domain)
+        :param policy: How to choose nodes for guests, see ProxmoxNodeTable.score (optional, default="most_free_ram")
+        """
+        np = _import_numpy()
+        self._policy = policy
+        self._failure_domains = failure_domains
+        nodes = []
+        rrd = snapshot.rrd if use_peak else {}
+        for el in snapshot.nodes.values():
+            el = dict(el)
+            history = rrd.get(el["node"], [])
+            if history:
+                el["mem"] = max([int(el.get("mem") or 0)] + [int(row.get("memused") or 0) for row in history])
+                el["cpu"] = max([float(el.get("cpu") or 0)] + [float(row.get("cpu") or 0) for row in history])
+            nodes.append(el)
+        self._guests = [el for el in snapshot.guests.values() if str(el.get("template", 0)) != "1" and
+                        (not running_only or el.get("status") == "running")]
+        self._table = ProxmoxNodeTable(nodes + self._guests)
+        # Guests in the form used for placement, grouped by node to find guests to move without scanning all of them
+        self._guests_by_node: Dict[str, List[Dict[str, Any]]] = {}
+        for el in self._guests:
+            self._guests_by_node.setdefault(el.get("node"), []).append(
+                {"vmid": str(el["vmid"]), "maxmem": int(el.get("maxmem") or 0), "maxcpu": int(el.get("maxcpu") or 0)})
+        index = {node: i for i, node in enumerate(self._table.ids)}
+        self._alloc_mem = np.zeros(len(index), dtype=np.int64)
+        self._alloc_cpu = np.zeros(len(index), dtype=np.int64)
+        for el in self._guests:
+            if el.get("node") in index:
+                self._alloc_mem[index[el["node"]]] += int(el.get("maxmem") or 0)
+                self._alloc_cpu[index[el["node"]]] += int(el.get("maxcpu") or 0)
+
+    def plan(self, add_nodes: List[Dict[str, Any]] = None, remove_nodes: Iterable[str] = None,
+             drain_nodes: Iterable[str] = None, new_guests: Union[int, List[Dict[str, Any]]] = 0,
+             guest_size: Dict[str, Any] = None, details: bool = False) -> Dict[str, Any]:
+        """
+        Simulate one scenario
+        :param add_nodes: New nodes' info (keys "node", "maxmem", "maxcpu", optionally "maxdisk") (optional)
+        :param remove_nodes: IDs of nodes that are removed, their guests are moved to other nodes (optional)
+        :param drain_nodes: IDs of nodes that stay in cluster but are emptied, e.g. for maintenance (optional)
+        :param new_guests: Number of new guests of guest_size or list of new guests' info (keys "vmid", "maxmem",
+                           "maxcpu") (optional, default=0)
+        :param guest_size: Dict with keys "maxmem" (bytes) and "maxcpu" for new guests given by number
+                           (optional, default=2 GiB and 2 cores)
+        :param details: Whether to include state of every node in result (optional, default=False)
+        :return: Dict in JSON-like format with placement of moved and new guests, unplaced guests, memory and CPU
+                 overcommit ratios of online nodes and memory headroom left after failure of each failure domain
+                 (negative headroom means guests of failed domain don't fit on remaining nodes)
+        """
+        np = _import_numpy()
+        removed = {str(node) for node in remove_nodes or []}
+        drained = {str(node) for node in drain_nodes or []}
+        base_ids = self._table.ids
+        table = self._table.copy()
+        alloc_mem = dict(zip(base_ids, self._alloc_mem.tolist()))
+        alloc_cpu = dict(zip(base_ids, self._alloc_cpu.tolist()))
+        if add_nodes:
+            table.add_nodes(add_nodes)
+        if removed:
+            table.remove_nodes(removed)
+        moved = [el for node in sorted(removed | drained) for el in self._guests_by_node.get(node, [])]
+        for node in drained:
+            if node in table:
+                i = table.ids.index(node)
+                table.online[i] = False
+                table.mem[i] = 0
+                table.guests[i] = 0
+                alloc_mem[node] = alloc_cpu[node] = 0
+        if isinstance(new_guests, int):
+            size = dict(DEFAULT_GUEST_SIZE, **(guest_size or {}))
+            new_guests = [dict(size, vmid=f"new-{i}") for i in range(new_guests)]
+        guests = moved + [{"vmid": str(el["vmid"]), "maxmem": int(el.get("maxmem") or 0),
+                           "maxcpu": int(el.get("maxcpu") or 0)} for el in new_guests]
+        placement = table.place(guests, policy=self._policy, strict=False)
+        for el in guests:
+            node = placement.get(el["vmid"])
+            if node is not None:
+                alloc_mem[node] = alloc_mem.get(node, 0) + el["maxmem"]
+                alloc_cpu[node] = alloc_cpu.get(node, 0) + el["maxcpu"]
+
+        ids = table.ids
+        allocated_mem = np.array([alloc_mem.get(node, 0) for node in ids], dtype=np.int64)
+        allocated_cpu = np.array([alloc_cpu.get(node, 0) for node in ids], dtype=np.int64)
+        online = table.online
+        free = np.where(online, table.free_mem, 0)
+        total_mem = int(table.maxmem[online].sum())
+        total_cpu = int(table.maxcpu[online].sum())
+
+        # Membership matrix: one row per failure domain, one column per node
+        domains = self._failure_domains or {node: [node] for node in ids}
+        covered = {node for members in domains.values() for node in members}
+        domains = dict(domains, **{node: [node] for node in ids if node not in covered})
+        names = sorted(domains)
+        index = {node: i for i, node in enumerate(ids)}
+        membership = np.zeros((len(names), len(ids)), dtype=np.int64)
+        for row, name in enumerate(names):
+            membership[row, [index[node] for node in domains[name] if node in index]] = 1
+        headroom = (int(free.sum()) - membership @ free) - membership @ np.where(online, allocated_mem, 0)
+
+        result = {
+            "nodes": int(online.sum()),
+            "placement": placement,
+            "unplaced": [el["vmid"] for el in guests if el["vmid"] not in placement],
+            "mem_total": total_mem,
+            "mem_used": int(table.mem[online].sum()),
+            "mem_allocated": int(allocated_mem[online].sum()),
+            "mem_overcommit": float(allocated_mem[online].sum() / total_mem) if total_mem else None,
+            "cpu_total": total_cpu,
+            "cpu_allocated": int(allocated_cpu[online].sum()),
+            "cpu_overcommit": float(allocated_cpu[online].sum() / total_cpu) if total_cpu else None,
+            "headroom": {name: int(value) for name, value in zip(names, headroom.tolist())},
+            "min_headroom": int(headroom.min()) if len(names) else None,
+        }
+        result["survives_failure"] = not result["unplaced"] and (result["min_headroom"] or 0) >= 0
+        if details:
+            nodes = table.to_dict()
+            for i, node in enumerate(ids):
+                nodes[node].update(mem_allocated=int(allocated_mem[i]), cpu_allocated=int(allocated_cpu[i]))
+            result["details"] = nodes
+        return result
+
+    def sweep(self, scenarios: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Simulate many scenarios
+        :param scenarios: Dicts of arguments of plan
+        :return: List of results of plan in the same order
+        """
+        return [self.plan(**scenario) for scenario in scenarios]
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {len(self._table)} nodes, {len(self._guests)} guests>"
@@ -0,0 +1,252 @@
+from ..api import APIWrapper
+from ..parallel import run_in_parallel
+from .errors import ProxmoxException
+from typing import Dict, Any, List, Optional, FrozenSet, Tuple, Iterable
+from collections import defaultdict
+from threading import Lock
+import time
+
+# Role that takes away all privileges on a path
+NO_ACCESS_ROLE = "NoAccess"
+# User that has all privileges regardless of ACL
+SUPERUSER = "root@pam"
+
+
+def normalize_path(path: str) -> str:
+    return "/" + "/".join(part for part in path.split("/") if part)
+
+
+def build_acl_tree(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Dict[str, bool]]]]:
+    """
+    Index access control list by path
+    :param entries: Access control list entries in JSON-like format
+    :return: Dict path -> "user"/"group" -> user/group ID -> role name -> whether role is propagated
+    """
+    acl = {}
+    for el in entries:
+        if el.get("type") not in ("user", "group"):
+            continue
+        node = acl.setdefault(normalize_path(el["path"]), {"user": {}, "group": {}})
+        node[el["type"]].setdefault(el["ugid"], {})[el["roleid"]] = str(el.get("propagate", 1)) == "1"
+    return acl
+
+
+def effective_roles_on_path(acl: Dict[str, Dict[str, Dict[str, Dict[str, bool]]]], groups: Iterable[str],
+                            userid: str, path: str, pools: Dict[str, str] = None) -> Dict[str, bool]:
+    """
+    Evaluate roles of user on path like Proxmox VE does, including roles on pool of VM/container for "/vms/<vmid>"
+    :param acl: Access control list indexed by build_acl_tree()
+    :param groups: Groups of user
+    :param userid: Full user ID (e.g. "username@pve")
+    :param path: Normalized ACL path
+    :param pools: Dict where keys are VM/container IDs and values are names of pools they are in (optional)
+    :return: Dict where keys are role names and values are whether role is propagated
+    """
+    roles = _roles_on_path(acl, groups, userid, path)
+    parts = [part for part in path.split("/") if part]
+    pool = pools.get(parts[1]) if pools and len(parts) == 2 and parts[0] == "vms" else None
+    if pool:
+        # Roles on pool are added to roles on guest itself
+        for roleid, propagate in _roles_on_path(acl, groups, userid, normalize_path("/pool/" + pool)).items():
+            roles[roleid] = roles.get(roleid, False) or propagate
+    if NO_ACCESS_ROLE in roles:
+        return {NO_ACCESS_ROLE: roles[NO_ACCESS_ROLE]}
+    return roles
+
+
+def _roles_on_path(acl: Dict[str, Dict[str, Dict[str, Dict[str, bool]]]], groups: Iterable[str], userid: str,
+                   path: str) -> Dict[str, bool]:
+    roles: Dict[str, bool] = {}
+    parts = [part for part in path.split("/") if part]
+    for depth in range(len(parts) + 1):
+        node = acl.get("/" + "/".join(parts[:depth]))
+        if node is None:
+            continue
+        final = depth == len(parts)
+        new = {roleid: propagate for roleid, propagate in node["user"].get(userid, {}).items() if final or propagate}
+        if not new:
+            for group in groups:
+                new.update({roleid: propagate for roleid, propagate in node["group"].get(group, {}).items()
+                            if final or propagate})
+        if new:
+            # Entries on deeper path replace inherited ones
+            roles = new
+    return roles
+
+
+class ProxmoxRoleCatalogue:
+    """
+    Cached roles with parsed privilege sets and privilege -> roles index. ACL and user groups are cached together with
+    roles, so privileges of user on a path are evaluated locally, the same way Proxmox VE does it: ACL entries are
+    applied from "/" down to the path, entries on deeper paths replace inherited ones, user entries take precedence over
+    group entries on the same path, only propagated entries are inherited by subpaths and roles on pool of
+    VM/container are added to roles on "/vms/<vmid>".
+    """
+
+    def __init__(self, api: APIWrapper, ttl: float = 60):
+        """
+        :param api: APIWrapper object
+        :param ttl: Number of seconds for which roles, ACL, user groups and pools of guests are cached, None to fetch
+                    them on every access (optional, default=60)
+        """
+        self._api = api
+        self._ttl = ttl
+        self._lock = Lock()
+        self._fetched_at: Optional[float] = None
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._privileges: Dict[str, FrozenSet[str]] = {}
+        self._by_privilege: Dict[str, List[str]] = {}
+        # path -> ("user" or "group") -> user/group ID -> role ID -> propagate
+        self._acl: Dict[str, Dict[str, Dict[str, Dict[str, bool]]]] = {}
+        self._groups_of: Dict[str, FrozenSet[str]] = {}
+        # VM/container ID -> pool
+        self._pools: Dict[str, str] = {}
+        self._effective: Dict[Tuple[str, str], FrozenSet[str]] = {}
+
+    def keys(self):
+        self._get_roles()
+        return self._info.keys()
+
+    def values(self):
+        self._get_roles()
+        return [dict(el) for el in self._info.values()]
+
+    def items(self):
+        self._get_roles()
+        return [(roleid, dict(el)) for roleid, el in self._info.items()]
+
+    def privileges(self, roleid: str) -> FrozenSet[str]:
+        """
+        :param roleid: Role name
+        :return: Set of privileges of role
+        """
+        self._get_roles()
+        return self._privileges[roleid]
+
+    def roles_with(self, privilege: str) -> List[str]:
+        """
+        :param privilege: Privilege name, e.g. "VM.PowerMgmt"
+        :return: Names of roles that include privilege
+        """
+        self._get_roles()
+        return list(self._by_privilege.get(privilege, []))
+
+    def effective_roles(self, userid: str, path: str) -> Dict[str, bool]:
+        """
+        Evaluate roles of user on path using cached ACL (no requests if cache is not expired)
+        :param userid: Full user ID (e.g. "username@pve")
+        :param path: ACL path, e.g. "/vms/100"
+        :return: Dict where keys are role names and values are whether role is propagated
+        """
+        self._get_roles()
+        with self._lock:
+            acl, groups_of, pools = self._acl, self._groups_of, self._pools
+        return effective_roles_on_path(acl, groups_of.get(userid, frozenset()), userid, normalize_path(path), pools)
+
+    def effective_privileges(self, userid: str, path: str) -> FrozenSet[str]:
+        """
+        Evaluate privileges of user on path using cached roles and ACL (no requests if cache is not expired)
+        :param userid: Full user ID (e.g. "username@pve")
+        :param path: ACL path, e.g. "/vms/100"
+        :return: Set of privileges
+        """
+        self._get_roles()
+        key = (userid, normalize_path(path))
+        with self._lock:
+            # Consistent view even if cache is refreshed by another thread meanwhile
+            effective, acl, groups_of, pools = self._effective, self._acl, self._groups_of, self._pools
+            role_privileges = self._privileges
+        privileges = effective.get(key)
+        if privileges is None:
+            if userid == SUPERUSER:
+                privileges = frozenset().union(*role_privileges.values())
+            else:
+                roles = effective_roles_on_path(acl, groups_of.get(userid, frozenset()), *key, pools)
+                privileges = frozenset().union(*(role_privileges.get(roleid, frozenset()) for roleid in roles))
+            effective[key] = privileges
+        return privileges
+
+    def has_privilege(self, userid: str, path: str, privilege: str) -> bool:
+        """
+        :param userid: Full user ID (e.g. "username@pve")
+        :param path: ACL path, e.g. "/vms/100"
+        :param privilege: Privilege name, e.g. "VM.PowerMgmt"
+        :return: Whether user has privilege on path
+        """
+        return privilege in self.effective_privileges(userid, path)
+
+    def refresh(self) -> None:
+        """
+        Fetch roles, ACL, user groups and pools of guests again even if cached ones are not expired yet
+        :return: None
+        """
+        self.invalidate()
+        self._get_roles()
+
+    def invalidate(self) -> None:
+        """
+        Forget cached roles, ACL, user groups and pools of guests, they are fetched again on next access
+        :return: None
+        """
+        with self._lock:
+            self._fetched_at = None
+
+    def __len__(self):
+        self._get_roles()
+        return len(self._info)
+
+    def __getitem__(self, key: str) -> FrozenSet[str]:
+        return self.privileges(key)
+
+    def __contains__(self, key: str) -> bool:
+        self._get_roles()
+        return key in self._info
+
+    def __iter__(self):
+        self._get_roles()
+        return iter(self._info)
+
+    def __repr__(self):
+        self._get_roles()
+        return f"<{self.__class__.__name__}: {sorted(self._info.keys())}>"
+
+    def _get_roles(self):
+        with self._lock:
+            if self._ttl is not None and self._fetched_at is not None and \
+                    time.monotonic() - self._fetched_at < self._ttl:
+                return
+            fetchers = {
+                "roles": self._api.list_roles,
+                "acl": self._api.get_access_control_list,
+                "users": lambda: self._api.list_users(full="1"),
+                "resources": lambda: self._api.list_resources(type="vm"),
+            }
+            data = {}
+            for name, result, exception in run_in_parallel(lambda name: fetchers[name](), fetchers.keys(),
+                                                           concurrency=len(fetchers)):
+                if exception is not None:
+                    raise ProxmoxException(f"Failed to get {name}: {exception}")
+                data[name] = result
+            info = {el["roleid"]: el for el in data["roles"]}
+            privileges = {roleid: frozenset(priv for priv in str(el.get("privs") or "").split(",") if priv)
+                          for roleid, el in info.items()}
+            by_privilege = defaultdict(list)
+            for roleid in sorted(privileges):
+                for priv in privileges[roleid]:
+                    by_privilege[priv].append(roleid)
+            acl = build_acl_tree(data["acl"])
+            groups_of = {}
+            for el in data["users"]:
+                groups = el.get("groups") or []
+                if isinstance(groups, str):
+                    groups = groups.split(",")
+                groups_of[el["userid"]] = frozenset(group for group in groups if group)
+            pools = {str(el["vmid"]): el["pool"] for el in data["resources"] if el.get("vmid") and el.get("pool")}
+            self._info = info
+            self._privileges = privileges
+            self._by_privilege = dict(by_privilege)
+            self._acl = acl
+            self._groups_of = groups_of
+            self._pools = pools
+            self._effective = {}
+            self._fetched_at = time.monotonic()
@@ -0,0 +1,17 @@
+import re
+
+# Proxmox VE only accepts snapshot names that start with a letter, "current" is reserved for the live state
+_SNAPSHOT_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_\-]{1,39}$")
+CURRENT_SNAPSHOT = "current"
+
+
+def check_snapshot_name(name: str) -> str:
+    """
+    Check that snapshot name is accepted by Proxmox VE
+    :param name: Snapshot name
+    :return: Same name
+    """
+    if not _SNAPSHOT_NAME.match(name) or name == CURRENT_SNAPSHOT:
+        raise ValueError(f"Invalid snapshot name: {name} (2-40 letters, digits, \"-\" and \"_\" starting with a "
+                         f"letter, \"{CURRENT_SNAPSHOT}\" is reserved)")
+    return name
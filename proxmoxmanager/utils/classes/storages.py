@@ -0,0 +1,256 @@
+from ..api import APIWrapper
+from .errors import ProxmoxException
+from .nodes import ProxmoxNode
+from typing import Dict, Any, List, Optional, Union
+from collections import defaultdict
+import time
+
+
+class ProxmoxStorage:
+    def __init__(self, api: APIWrapper, storage: str, nodes: List[str], info: Dict[str, Any] = None):
+        """
+        :param api: APIWrapper object
+        :param storage: Storage ID
+        :param nodes: IDs of nodes on which storage is available (more than one for shared storages)
+        :param info: Storage info from cluster resources (optional)
+        """
+        self._api = api
+        self._storage = storage
+        self._nodes = list(nodes)
+        self._info = info or {}
+
+    @property
+    def id(self) -> str:
+        """
+        :return: Storage ID (get-only)
+        """
+        return self._storage
+
+    @property
+    def node(self) -> ProxmoxNode:
+        """
+        :return: Node through which storage is accessed (first available node for shared storages) (get-only)
+        """
+        return ProxmoxNode(self._api, self._nodes[0])
+
+    @property
+    def nodes(self) -> List[str]:
+        """
+        :return: IDs of all nodes on which storage is available (get-only)
+        """
+        return list(self._nodes)
+
+    @property
+    def shared(self) -> bool:
+        """
+        :return: Whether storage is shared between nodes (get-only)
+        """
+        return str(self._info.get("shared", 0)) == "1"
+
+    @property
+    def content(self) -> List[str]:
+        """
+        :return: Content types allowed on storage, e.g. ["images", "rootdir", "backup"] (get-only)
+        """
+        return [el for el in str(self._info.get("content", "")).split(",") if el]
+
+    @property
+    def total(self) -> int:
+        """
+        :return: Size of storage in bytes from cluster resources (get-only)
+        """
+        return int(self._info.get("maxdisk") or 0)
+
+    @property
+    def used(self) -> int:
+        """
+        :return: Used space in bytes from cluster resources (get-only)
+        """
+        return int(self._info.get("disk") or 0)
+
+    @property
+    def free(self) -> int:
+        """
+        :return: Free space in bytes from cluster resources (get-only)
+        """
+        return max(self.total - self.used, 0)
+
+    def supports(self, content: str) -> bool:
+        """
+        Whether storage allows content type
+        :param content: Content type, e.g. "images", "rootdir", "iso", "vztmpl", "backup", "snippets"
+        :return: True/False
+        """
+        return content in self.content
+
+    def get_status_report(self) -> Dict[str, Any]:
+        """
+        Get current status of storage (fresh usage numbers, unlike free/used/total properties)
+        :return: Storage status in JSON-like format
+        """
+        return self._api.get_storage_status(node=self._nodes[0], storage=self._storage)
+
+    def list_content(self, content: str = None, vmid: Union[str, int] = None) -> List[Dict[str, Any]]:
+        """
+        Get list of volumes on storage
+        :param content: Only list volumes of this content type (optional)
+        :param vmid: Only list volumes of this VM/container (optional)
+        :return: List of volumes' info in JSON-like format (volid, format, size...)
+        """
+        kwargs = {"node": self._nodes[0], "storage": self._storage}
+        if content is not None:
+            kwargs["content"] = content
+        if vmid is not None:
+            kwargs["vmid"] = str(vmid)
+        return self._api.list_storage_content(**kwargs)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self._storage} on {', '.join(self._nodes)}>"
+
+    def __str__(self):
+        return self._storage
+
+    def __eq__(self, other: 'ProxmoxStorage'):
+        return self._storage == other._storage and set(self._nodes) == set(other._nodes)
+
+
+class ProxmoxStorageDict:
+    """
+    Storages of the cluster built from a single cluster resources request. Shared storages are keyed by storage ID,
+    storages local to one node are keyed by "node/storage" (e.g. "node1/local-lvm").
+    """
+
+    def __init__(self, api: APIWrapper, ttl: float = None):
+        """
+        :param api: APIWrapper object
+        :param ttl: Number of seconds for which storage listing is cached, None to fetch it on every access
+                    (optional)
+        """
+        self._api = api
+        self._ttl = ttl
+        self._fetched_at: Optional[float] = None
+        self._storages: Dict[str, ProxmoxStorage] = {}
+        self._by_node: Dict[str, List[str]] = {}
+        self._by_content: Dict[str, List[str]] = {}
+
+    def keys(self):
+        self._get_storages()
+        return self._storages.keys()
+
+    def values(self):
+        self._get_storages()
+        return self._storages.values()
+
+    def items(self):
+        self._get_storages()
+        return self._storages.items()
+
+    def on_node(self, node: Union[str, ProxmoxNode]) -> Dict[str, ProxmoxStorage]:
+        """
+        Get storages available on node (local ones and shared ones)
+        :param node: Node ID or ProxmoxNode object
+        :return: Dict where keys are storage IDs and values are ProxmoxStorage objects
+        """
+        if isinstance(node, ProxmoxNode):
+            node = node.id
+        self._get_storages()
+        return {self._storages[key].id: self._storages[key] for key in self._by_node.get(node, [])}
+
+    def shared(self) -> Dict[str, ProxmoxStorage]:
+        """
+        Get storages that are shared between nodes
+        :return: Dict where keys are storage IDs and values are ProxmoxStorage objects
+        """
+        self._get_storages()
+        return {key: storage for key, storage in self._storages.items() if storage.shared}
+
+    def with_content(self, content: str, node: Union[str, ProxmoxNode] = None,
+                     min_free: int = 0) -> List[ProxmoxStorage]:
+        """
+        Find storages that allow content type using capacity index (no additional requests)
+        :param content: Content type, e.g. "images", "rootdir", "iso", "vztmpl", "backup"
+        :param node: Only storages available on this node (optional)
+        :param min_free: Only storages with at least this much free space in bytes (optional, default=0)
+        :return: List of ProxmoxStorage objects, most free space first
+        """
+        if isinstance(node, ProxmoxNode):
+            node = node.id
+        self._get_storages()
+        res = []
+        # Index is sorted by free space, so the scan can stop at the first storage that is too small
+        for key in self._by_content.get(content, []):
+            storage = self._storages[key]
+            if storage.free < min_free:
+                break
+            if node is None or node in storage.nodes:
+                res.append(storage)
+        return res
+
+    def choose_by_most_free_space(self, content: str = "images", node: Union[str, ProxmoxNode] = None,
+                                  min_free: int = 0) -> ProxmoxStorage:
+        """
+        Choose storage with most free space that allows content type
+        :param content: Content type (optional, default="images")
+        :param node: Only storages available on this node (optional)
+        :param min_free: Only storages with at least this much free space in bytes (optional, default=0)
+        :return: ProxmoxStorage object
+        """
+        candidates = self.with_content(content, node=node, min_free=min_free)
+        if not candidates:
+            raise ProxmoxException(f"No storage for {content} with {min_free} bytes free" +
+                                   (f" on node {node}" if node is not None else ""))
+        return candidates[0]
+
+    def refresh(self) -> None:
+        """
+        Fetch storage listing again even if cached one is not expired yet
+        :return: None
+        """
+        self._fetched_at = None
+        self._get_storages()
+
+    def __len__(self):
+        self._get_storages()
+        return len(self._storages)
+
+    def __getitem__(self, key: str) -> ProxmoxStorage:
+        self._get_storages()
+        return self._storages[key]
+
+    def __contains__(self, key: str) -> bool:
+        self._get_storages()
+        return key in self._storages
+
+    def __iter__(self):
+        self._get_storages()
+        return iter(self._storages)
+
+    def __repr__(self):
+        self._get_storages()
+        return f"<{self.__class__.__name__}: {repr(self._storages)}>"
+
+    def _get_storages(self):
+        if self._ttl is not None and self._fetched_at is not None and \
+                time.monotonic() - self._fetched_at < self._ttl:
+            return
+        # Shared storage is listed once for every node it is available on
+        entries = defaultdict(list)
+        for el in self._api.list_resources(type="storage"):
+            if el.get("type") != "storage" or el.get("status", "available") != "available":
+                continue
+            shared = str(el.get("shared", 0)) == "1"
+            entries[el["storage"] if shared else f"{el['node']}/{el['storage']}"].append(el)
+        storages = {key: ProxmoxStorage(self._api, els[0]["storage"], sorted(el["node"] for el in els), els[0])
+                    for key, els in entries.items()}
+        by_node = defaultdict(list)
+        by_content = defaultdict(list)
+        for key, storage in storages.items():
+            for node in storage.nodes:
+                by_node[node].append(key)
+            for content in storage.content:
+                by_content[content].append(key)
+        self._storages = storages
+        self._by_node = dict(by_node)
+        self._by_content = {content: sorted(keys, key=lambda key: -storages[key].free)
+                            for content, keys in by_content.items()}
+        self._fetched_at = time.monotonic()
@@ -0,0 +1,286 @@
+from ..api import APIWrapper
+from ..parallel import run_in_parallel
+from .errors import ProxmoxException
+from typing import Dict, Any, List, Iterable, Iterator, Callable, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Event
+import time
+
+
+class ProxmoxTask:
+    def __init__(self, api: APIWrapper, upid: str):
+        self._api = api
+        self._upid = upid
+        # UPID has format "UPID:node:pid:pstart:starttime:type:id:user:"
+        parts = upid.split(":")
+        if len(parts) < 8 or parts[0] != "UPID":
+            raise ValueError(f"Invalid task ID: {upid}")
+        self._node = parts[1]
+        self._type = parts[5]
+
+    @property
+    def id(self) -> str:
+        """
+        :return: Unique ID of task (UPID) (get-only)
+        """
+        return self._upid
+
+    @property
+    def node(self) -> str:
+        """
+        :return: ID of node on which task is running (get-only)
+        """
+        return self._node
+
+    @property
+    def type(self) -> str:
+        """
+        :return: Type of task, e.g. "qmclone" (get-only)
+        """
+        return self._type
+
+    def get_status_report(self) -> Dict[str, Any]:
+        """
+        Get detailed status info about this task
+        :return: Task info in JSON-like format
+        """
+        return self._api.get_task_status(node=self._node, upid=self._upid)
+
+    def running(self) -> bool:
+        """
+        Whether task is still running
+        :return: True/False
+        """
+        return self.get_status_report().get("status") == "running"
+
+    def get_logs(self, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Get log of this task
+        :param kwargs: Other arguments passed to Proxmox API (start, limit)
+        :return: List of log lines in JSON-like format
+        """
+        return self._api.get_task_logs(node=self._node, upid=self._upid, **kwargs)
+
+    def wait(self, timeout: float = None, interval: float = 1.0) -> str:
+        """
+        Wait for task to finish
+        :param timeout: Number of seconds to wait (optional)
+        :param interval: Number of seconds between checks (optional, default=1.0)
+        :return: Exit status of task ("OK" if successful)
+        """
+        result = wait_for_tasks(self._api, [self._upid], timeout=timeout, interval=interval)
+        if self._upid not in result:
+            raise ProxmoxException(f"Timed out waiting for task {self._upid}")
+        return result[self._upid]
+
+    def follow_logs(self, min_interval: float = 0.5, max_interval: float = 5.0, limit: int = 500,
+                    timeout: float = None) -> Iterator[str]:
+        """
+        Yield lines of task log as they appear until task finishes (see follow_task_log)
+        :param min_interval: Number of seconds between checks while log is growing (optional, default=0.5)
+        :param max_interval: Maximum number of seconds between checks while log is idle (optional, default=5.0)
+        :param limit: Maximum number of lines fetched by one request (optional, default=500)
+        :param timeout: Number of seconds to follow log (optional)
+        :return: Generator of log lines
+        """
+        return follow_task_log(self._api, self._upid, min_interval=min_interval, max_interval=max_interval,
+                               limit=limit, timeout=timeout)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self._upid}>"
+
+    def __str__(self):
+        return self._upid
+
+    def __eq__(self, other: 'ProxmoxTask'):
+        return self._upid == other._upid
+
+
+def wait_for_tasks(api: APIWrapper, upids: Iterable[str], timeout: float = None,
+                   interval: float = 1.0) -> Dict[str, str]:
+    """
+    Wait for many tasks to finish, polling each node once per round instead of each task
+    :param api: APIWrapper object
+    :param upids: IDs of tasks
+    :param timeout: Number of seconds to wait (optional)
+    :param interval: Number of seconds between checks (optional, default=1.0)
+    :return: Dict where keys are IDs of tasks and values are their exit statuses ("OK" if successful),
+             tasks that did not finish before timeout are omitted
+    """
+    pending = defaultdict(set)
+    for upid in upids:
+        task = ProxmoxTask(api, upid)
+        pending[task.node].add(upid)
+    result = {}
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while pending:
+        for node in list(pending.keys()):
+            active = {task["upid"] for task in api.list_tasks(node=node, source="active")}
+            for upid in pending[node] - active:
+                status = api.get_task_status(node=node, upid=upid)
+                if status.get("status") == "running":
+                    continue
+                result[upid] = status.get("exitstatus", "")
+                pending[node].discard(upid)
+            if not pending[node]:
+                del pending[node]
+        if not pending:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        time.sleep(interval)
+
+    return result
+
+
+def follow_task_log(api: APIWrapper, upid: str, min_interval: float = 0.5, max_interval: float = 5.0,
+                    limit: int = 500, timeout: float = None) -> Iterator[str]:
+    """
+    Yield lines of task log as they appear until task finishes. Only new lines are fetched on every check, check
+    interval is doubled while log is idle (up to max_interval) and reset when new lines appear.
+    :param api: APIWrapper object
+    :param upid: ID of task
+    :param min_interval: Number of seconds between checks while log is growing (optional, default=0.5)
+    :param max_interval: Maximum number of seconds between checks while log is idle (optional, default=5.0)
+    :param limit: Maximum number of lines fetched by one request (optional, default=500)
+    :param timeout: Number of seconds to follow log (optional)
+    :return: Generator of log lines
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    return _follow_task_log(api, upid, min_interval, max_interval, limit, deadline, Event())
+
+
+def follow_task_logs(api: APIWrapper, upids: Iterable[str], concurrency: int = 8, min_interval: float = 0.5,
+                     max_interval: float = 5.0, limit: int = 500,
+                     timeout: float = None) -> Iterator[Tuple[str, str]]:
+    """
+    Follow logs of many tasks concurrently (see follow_task_log), lines of different tasks are interleaved in order
+    of arrival
+    :param api: APIWrapper object
+    :param upids: IDs of tasks
+    :param concurrency: Maximum number of logs followed simultaneously (optional, default=8)
+    :param min_interval: Number of seconds between checks while log is growing (optional, default=0.5)
+    :param max_interval: Maximum number of seconds between checks while log is idle (optional, default=5.0)
+    :param limit: Maximum number of lines fetched by one request (optional, default=500)
+    :param timeout: Number of seconds to follow logs (optional)
+    :return: Generator of tuples (task ID, log line)
+    """
+    upids = list(upids)
+    if not upids:
+        return
+    # Invalid IDs are reported before any thread is started
+    for upid in upids:
+        ProxmoxTask(api, upid)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    lines: Queue = Queue()
+    stop = Event()
+    finished = object()
+    errors = {}
+
+    def follow(upid):
+        try:
+            for line in _follow_task_log(api, upid, min_interval, max_interval, limit, deadline, stop):
+                lines.put((upid, line))
+        except Exception as e:
+            errors[upid] = str(e)
+        finally:
+            lines.put((upid, finished))
+
+    executor = ThreadPoolExecutor(max_workers=min(concurrency, len(upids)))
+    try:
+        for upid in upids:
+            executor.submit(follow, upid)
+        remaining = len(upids)
+        while remaining:
+            upid, line = lines.get()
+            if line is finished:
+                remaining -= 1
+            else:
+                yield upid, line
+    finally:
+        # Workers are stopped if caller stops iterating early
+        stop.set()
+        executor.shutdown(wait=True)
+    if errors:
+        raise ProxmoxException(f"Failed to follow logs of tasks: {errors}")
+
+
+def _follow_task_log(api: APIWrapper, upid: str, min_interval: float, max_interval: float, limit: int,
+                     deadline: Optional[float], stop: Event) -> Iterator[str]:
+    node = ProxmoxTask(api, upid).node
+    offset = 0
+    interval = min_interval
+    finished = False
+    while not stop.is_set():
+        # Lines are numbered from 1, so "n" of the last received line is offset of the next one
+        new_lines = [el for el in api.get_task_logs(node=node, upid=upid, start=offset, limit=limit)
+                     if int(el.get("n", 0)) > offset]
+        for el in new_lines:
+            offset = max(offset, int(el["n"]))
+            yield el.get("t", "")
+        if len(new_lines) >= limit:
+            continue
+        if finished:
+            return
+        if new_lines:
+            interval = min_interval
+        else:
+            # Status is only checked while log is idle, a finished task is detected one check later at most
+            if api.get_task_status(node=node, upid=upid).get("status") != "running":
+                finished = True
+                continue
+            interval = min(interval * 2, max_interval)
+        delay = interval
+        if deadline is not None:
+            if time.monotonic() >= deadline:
+                raise ProxmoxException(f"Timed out following log of task {upid}")
+            delay = min(interval, deadline - time.monotonic())
+        stop.wait(max(delay, 0))
+
+
+def run_bulk_action(api: APIWrapper, targets: Dict[str, Any], action: Callable[[Any], Optional[str]],
+                    concurrency: int = 8, per_node: int = None, wait: bool = True, timeout: float = None,
+                    interval: float = 1.0) -> Dict[str, Dict[str, Any]]:
+    """
+    Run action that starts a task for many VMs/containers in parallel and track resulting tasks
+    :param api: APIWrapper object
+    :param targets: Dict where keys are IDs and values are objects with "node" field (e.g. ProxmoxVM)
+    :param action: Function that takes target and returns ID of started task, True if action was done without
+                   a task or None/False if nothing had to be done
+    :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+    :param per_node: Maximum number of simultaneous API calls per node (optional)
+    :param wait: Whether to wait for started tasks to finish (optional, default=True)
+    :param timeout: Number of seconds to wait for tasks (optional)
+    :param interval: Number of seconds between task checks (optional, default=1.0)
+    :return: Dict where keys are IDs and values are results in JSON-like format
+             ({"node": ..., "task": ..., "status": "ok"/"unchanged"/"running"/"error", "error": ...})
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    outcomes = run_in_parallel(lambda key: action(targets[key]), targets.keys(), concurrency=concurrency,
+                               group_key=lambda key: str(targets[key].node), group_limit=per_node)
+    for key, upid, exception in outcomes:
+        result = {"node": str(targets[key].node), "task": upid, "status": "ok", "error": None}
+        if exception is not None:
+            result.update(status="error", error=str(exception))
+        elif not upid:
+            result.update(task=None, status="unchanged")
+        elif not isinstance(upid, str):
+            result["task"] = None
+        elif not wait:
+            result["status"] = "running"
+        results[key] = result
+
+    if wait:
+        upids = {result["task"]: key for key, result in results.items() if result["status"] == "ok" and
+                 result["task"] is not None}
+        exit_statuses = wait_for_tasks(api, upids.keys(), timeout=timeout, interval=interval)
+        for upid, key in upids.items():
+            if upid not in exit_statuses:
+                results[key]["status"] = "running"
+            elif exit_statuses[upid] != "OK":
+                results[key].update(status="error", error=exit_statuses[upid])
+
+    return results
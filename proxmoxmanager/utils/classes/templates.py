@@ -0,0 +1,199 @@
+from ..api import APIWrapper
+from ..parallel import run_in_parallel
+from .errors import ProxmoxException
+from .nodes import ProxmoxNode
+from .storages import ProxmoxStorage
+from .vms import ProxmoxVM
+from .containers import ProxmoxContainer
+from typing import Dict, Any, List, Optional, Union
+from collections import defaultdict
+from threading import Lock
+import re
+import time
+
+# Tags are separated by ";" in new Proxmox VE versions and by "," or spaces in old ones
+_TAG_SEPARATOR = re.compile(r"[;,\s]+")
+
+
+class ProxmoxTemplateCatalogue:
+    """
+    Cached catalogue of VM and container templates built from a single cluster resources request and indexed by
+    name and tag. OS types are not part of cluster resources, so configs of templates are only fetched (in parallel,
+    once per listing) when templates are looked up by OS type.
+    """
+
+    def __init__(self, api: APIWrapper, ttl: float = 60, concurrency: int = 8):
+        """
+        :param api: APIWrapper object
+        :param ttl: Number of seconds for which template listing is cached, None to fetch it on every access
+                    (optional, default=60)
+        :param concurrency: Maximum number of simultaneous config requests for OS type index (optional, default=8)
+        """
+        self._api = api
+        self._ttl = ttl
+        self._concurrency = concurrency
+        self._lock = Lock()
+        self._fetched_at: Optional[float] = None
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        self._by_tag: Dict[str, List[str]] = {}
+        self._by_ostype: Optional[Dict[str, List[str]]] = None
+
+    def keys(self):
+        self._get_templates()
+        return self._info.keys()
+
+    def values(self):
+        return [self[vmid] for vmid in self.keys()]
+
+    def items(self):
+        return [(vmid, self[vmid]) for vmid in self.keys()]
+
+    def info(self, vmid: Union[str, int]) -> Dict[str, Any]:
+        """
+        Get cached info of template from cluster resources (no additional requests)
+        :param vmid: Template ID
+        :return: Template info in JSON-like format (name, node, type, tags, maxdisk...)
+        """
+        self._get_templates()
+        return dict(self._info[str(vmid)])
+
+    def tags(self) -> List[str]:
+        """
+        :return: All tags used by templates
+        """
+        self._get_templates()
+        return sorted(self._by_tag.keys())
+
+    def ostypes(self) -> List[str]:
+        """
+        :return: All OS types of templates (fetches configs of templates on first call)
+        """
+        return sorted(self._get_ostypes().keys())
+
+    def find(self, name: str = None, tag: str = None, ostype: str = None,
+             guest_type: str = None) -> List[Union[ProxmoxVM, ProxmoxContainer]]:
+        """
+        Find templates using indexes
+        :param name: Only templates with this name (optional)
+        :param tag: Only templates with this tag (optional)
+        :param ostype: Only templates with this OS type, e.g. "l26", "win11", "debian" (fetches configs of
+                       templates on first use) (optional)
+        :param guest_type: Only VM ("qemu") or container ("lxc") templates (optional)
+        :return: List of ProxmoxVM and ProxmoxContainer objects sorted by ID
+        """
+        self._get_templates()
+        vmids = set(self._info.keys())
+        if name is not None:
+            vmids &= set(self._by_name.get(name, []))
+        if tag is not None:
+            vmids &= set(self._by_tag.get(tag, []))
+        if ostype is not None:
+            vmids &= set(self._get_ostypes().get(ostype, []))
+        if guest_type is not None:
+            vmids = {vmid for vmid in vmids if self._info[vmid]["type"] == guest_type}
+        return [self[vmid] for vmid in sorted(vmids, key=int)]
+
+    def get(self, name: str) -> Union[ProxmoxVM, ProxmoxContainer]:
+        """
+        Get template by name
+        :param name: Template name
+        :return: ProxmoxVM or ProxmoxContainer object
+        """
+        templates = self.find(name=name)
+        if not templates:
+            raise KeyError(name)
+        if len(templates) > 1:
+            raise ProxmoxException(f"Template name {name} is ambiguous: {', '.join(el.id for el in templates)}")
+        return templates[0]
+
+    def clone_from_template(self, name: str, newid: Union[str, int] = None,
+                            newnode: Union[str, ProxmoxNode] = None, new_name: str = None, full: bool = True,
+                            storage: Union[str, ProxmoxStorage] = None) -> str:
+        """
+        Clone template found by name
+        :param name: Template name (or ID)
+        :param newid: ID of new VM/container (optional, default=next free ID)
+        :param newnode: New node ID or ProxmoxNode object (optional)
+        :param new_name: Name of new VM/container (optional)
+        :param full: Whether to make storage unlinked (optional, default=True)
+        :param storage: Target storage ID or ProxmoxStorage object for full clone (optional)
+        :return: ID of cloning task
+        """
+        template = self[name] if str(name) in self.keys() else self.get(name)
+        if newid is None:
+            newid = self._api.get_next_vmid()
+        return template.clone(newid, newnode=newnode, name=new_name, full=full, storage=storage)
+
+    def refresh(self) -> None:
+        """
+        Fetch template listing again even if cached one is not expired yet
+        :return: None
+        """
+        self._fetched_at = None
+        self._get_templates()
+
+    def __len__(self):
+        self._get_templates()
+        return len(self._info)
+
+    def __getitem__(self, key: Union[str, int]) -> Union[ProxmoxVM, ProxmoxContainer]:
+        self._get_templates()
+        info = self._info[str(key)]
+        return (ProxmoxVM if info["type"] == "qemu" else ProxmoxContainer)(self._api, str(key), info["node"])
+
+    def __contains__(self, key: Union[str, int]) -> bool:
+        self._get_templates()
+        return str(key) in self._info
+
+    def __iter__(self):
+        self._get_templates()
+        return iter(self._info)
+
+    def __repr__(self):
+        self._get_templates()
+        return f"<{self.__class__.__name__}: {sorted(self._info.keys(), key=int)}>"
+
+    def _get_templates(self):
+        with self._lock:
+            if self._ttl is not None and self._fetched_at is not None and \
+                    time.monotonic() - self._fetched_at < self._ttl:
+                return
+            info = {str(el["vmid"]): el for el in self._api.list_resources(type="vm")
+                    if el.get("type") in ("qemu", "lxc") and str(el.get("template", 0)) == "1"}
+            by_name = defaultdict(list)
+            by_tag = defaultdict(list)
+            for vmid, el in info.items():
+                if el.get("name"):
+                    by_name[el["name"]].append(vmid)
+                for tag in _TAG_SEPARATOR.split(el.get("tags") or ""):
+                    if tag:
+                        by_tag[tag].append(vmid)
+            self._info = info
+            self._by_name = dict(by_name)
+            self._by_tag = dict(by_tag)
+            self._by_ostype = None
+            self._fetched_at = time.monotonic()
+
+    def _get_ostypes(self) -> Dict[str, List[str]]:
+        self._get_templates()
+        with self._lock:
+            if self._by_ostype is not None:
+                return self._by_ostype
+            info = self._info
+            fetched_at = self._fetched_at
+
+        def ostype(vmid):
+            getter = self._api.get_vm_config if info[vmid]["type"] == "qemu" else self._api.get_container_config
+            return getter(node=info[vmid]["node"], vmid=vmid).get("ostype", "other")
+
+        by_ostype = defaultdict(list)
+        for vmid, result, exception in run_in_parallel(ostype, info.keys(), concurrency=self._concurrency):
+            if exception is not None:
+                raise ProxmoxException(f"Failed to get config of template {vmid}: {exception}")
+            by_ostype[result].append(vmid)
+        with self._lock:
+            # Index is dropped if listing was refreshed meanwhile
+            if self._fetched_at == fetched_at:
+                self._by_ostype = dict(by_ostype)
+        return dict(by_ostype)
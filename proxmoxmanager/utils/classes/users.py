@@ -1,20 +1,62 @@
 from ..api import APIWrapper
-from typing import Tuple, Dict, Any
+from ..parallel import run_in_parallel
+from typing import Tuple, Dict, Any, List, Optional, Set
+from collections import Counter, defaultdict
+import time
+
+DEFAULT_REALM = "pve"
 
 
 class ProxmoxUser:
-    def __init__(self, api: APIWrapper, userid: str):
+    def __init__(self, api: APIWrapper, userid: str, info: Dict[str, Any] = None):
         self._api = api
-        self._userid = userid
-        self._fulluserid = userid + "@pve"
+        # Users without realm are considered to be in default @pve realm
+        if "@" in userid:
+            name, self._realm = userid.rsplit("@", 1)
+        else:
+            name, self._realm = userid, DEFAULT_REALM
+        self._fulluserid = name + "@" + self._realm
+        self._userid = name if self._realm == DEFAULT_REALM else self._fulluserid
+        self._info = info
 
     @property
     def id(self) -> str:
         """
-        :return: Unique ID of user (get-only)
+        :return: Unique ID of user, without realm for users in @pve realm (get-only)
         """
         return self._userid
 
+    @property
+    def fullid(self) -> str:
+        """
+        :return: Unique ID of user including realm, e.g. "username@pve" (get-only)
+        """
+        return self._fulluserid
+
+    @property
+    def realm(self) -> str:
+        """
+        :return: Realm of user, e.g. "pve", "pam" or "ldap" (get-only)
+        """
+        return self._realm
+
+    def enabled(self) -> bool:
+        """
+        Whether user account is enabled (uses info from user listing if availible)
+        :return: True/False
+        """
+        info = self._info if self._info is not None else self.get_config()
+        return str(info.get("enable", 1)) == "1"
+
+    def expired(self) -> bool:
+        """
+        Whether user account is expired (uses info from user listing if availible)
+        :return: True/False
+        """
+        info = self._info if self._info is not None else self.get_config()
+        expire = int(info.get("expire", 0) or 0)
+        return expire != 0 and expire < time.time()
+
     def get_config(self) -> Dict[str, Any]:
         """
         Get detailed config
@@ -41,6 +83,37 @@ class ProxmoxUser:
             raise ValueError(f"Password has to be at least 5 characters long")
         self._api.change_user_password(userid=self._fulluserid, old_password=old_password, new_password=new_password)
 
+    def list_tokens(self) -> List[Dict[str, Any]]:
+        """
+        Get list of API tokens of this user
+        :return: List of tokens' info in JSON-like format
+        """
+        return self._api.list_user_tokens(userid=self._fulluserid)
+
+    def create_token(self, name: str, privsep: bool = True, expire: int = None, comment: str = None) -> Dict[str, Any]:
+        """
+        Create new API token for this user
+        :param name: Token ID (unique for this user)
+        :param privsep: Whether token has separate permissions instead of user's ones (optional, default=True)
+        :param expire: Expiration date as Unix timestamp (optional)
+        :param comment: Comment (optional)
+        :return: Token info in JSON-like format, including its secret value which can't be retrieved later
+        """
+        kwargs = {"userid": self._fulluserid, "tokenid": name, "privsep": '1' if privsep else '0'}
+        if expire is not None:
+            kwargs["expire"] = str(expire)
+        if comment is not None:
+            kwargs["comment"] = comment
+        return self._api.create_user_token(**kwargs)
+
+    def revoke_token(self, name: str) -> None:
+        """
+        Revoke (delete) API token of this user
+        :param name: Token ID
+        :return: None
+        """
+        self._api.delete_user_token(userid=self._fulluserid, tokenid=name)
+
     def delete(self) -> None:
         """
         Delete this user
@@ -59,9 +132,28 @@ class ProxmoxUser:
 
 
 class ProxmoxUserDict:
-    def __init__(self, api: APIWrapper):
+    def __init__(self, api: APIWrapper, realm: Optional[str] = DEFAULT_REALM, ttl: float = None,
+                 with_groups: bool = False):
+        """
+        :param api: APIWrapper object
+        :param realm: Only include users from this realm, None for all realms (optional, default="pve")
+        :param ttl: Number of seconds for which user listing is cached, None to fetch it on every access
+                    (optional)
+        :param with_groups: Whether to fetch full user info including groups (optional, default=False)
+        """
         self._api = api
+        self._realm = realm
+        self._ttl = ttl
+        self._with_groups = with_groups
+        self._fetched_at: Optional[float] = None
         self._users: Dict[str, ProxmoxUser] = {}
+        self._by_realm: Dict[str, Set[str]] = {}
+        self._by_group: Dict[str, Set[str]] = {}
+        self._disabled: Set[str] = set()
+        # Full IDs of users from all realms, so that existing users are found whatever realm dict is limited to
+        self._all_userids: Set[str] = set()
+        # Expiration time of users that expire, whether they are expired depends on time of filtering
+        self._expire_at: Dict[str, int] = {}
 
     def keys(self):
         self._get_users()
@@ -84,12 +176,97 @@ class ProxmoxUserDict:
         :return: ProxmoxUser object for newly created user
         """
         self._get_users()
-        if user in self._users.keys():
-            raise ValueError(f"User {user} already exists")
+        user = ProxmoxUser(self._api, user)
+        if user.fullid in self._all_userids:
+            raise ValueError(f"User {user.fullid} already exists")
         if len(password) < 5:
             raise ValueError(f"Password has to be at least 5 characters long")
-        self._api.create_user(userid=user + "@pve", password=password, **kwargs)
-        return ProxmoxUser(self._api, user)
+        self._api.create_user(userid=user.fullid, password=password, **kwargs)
+        self._fetched_at = None
+        return user
+
+    def create_many(self, specs: List[Dict[str, Any]], concurrency: int = 8) -> Dict[str, Dict[str, Any]]:
+        """
+        Create many users in parallel, checking for existing users only once
+        :param specs: List of dicts with keys "user", "password" and optionally "permissions" (list of tuples
+                      (path, role)), "token" (name of API token to generate, token shares user's permissions) and
+                      other arguments passed to Proxmox API (comment, firstname, lastname, email...)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :return: Dict where keys are user IDs and values are results in JSON-like format
+                 ({"status": "ok"/"partial"/"error", "error": ..., "token": ...}), users given more than once are
+                 not created and get an error
+        """
+        self._get_users()
+        taken = set(self._all_userids)
+        self._fetched_at = None
+        # User IDs are compared in full form, so "foo" and "foo@pve" are the same user
+        specs = [(ProxmoxUser(self._api, spec["user"]).fullid, spec) for spec in specs]
+        counts = Counter(userid for userid, _ in specs)
+        results = {}
+        valid_specs = []
+        for userid, spec in specs:
+            user = self._key(userid)
+            if user in results:
+                continue
+            if counts[userid] > 1:
+                # It's not known which of the specs is meant, so none of them is used
+                results[user] = {"status": "error", "error": f"User {user} is given {counts[userid]} times",
+                                 "token": None}
+            elif userid in taken:
+                results[user] = {"status": "error", "error": f"User {user} already exists", "token": None}
+            elif len(spec.get("password", "")) < 5:
+                results[user] = {"status": "error", "error": "Password has to be at least 5 characters long",
+                                 "token": None}
+            else:
+                valid_specs.append((userid, spec))
+
+        def create(item):
+            userid, spec = item
+            kwargs = {key: value for key, value in spec.items() if
+                      key not in ("user", "password", "permissions", "token")}
+            self._api.create_user(userid=userid, password=spec["password"], **kwargs)
+            result = {"status": "ok", "error": None, "token": None}
+            # User exists from now on, so further errors are only reported
+            try:
+                for path, role in spec.get("permissions", []):
+                    self._api.update_access_control_list(path=path, roles=role, users=userid, delete="0",
+                                                         propagate="0")
+                if spec.get("token"):
+                    result["token"] = self._api.create_user_token(userid=userid, tokenid=spec["token"], privsep="0")
+            except Exception as e:
+                result.update(status="partial", error=str(e))
+            return result
+
+        for (userid, _), result, exception in run_in_parallel(create, valid_specs, concurrency=concurrency):
+            if exception is not None:
+                result = {"status": "error", "error": str(exception), "token": None}
+            results[self._key(userid)] = result
+        return results
+
+    def create_tokens(self, users: List[str], name: str, privsep: bool = True, expire: int = None,
+                      comment: str = None, concurrency: int = 8) -> Dict[str, Dict[str, Any]]:
+        """
+        Create API token with the same name for many users in parallel
+        :param users: List of user IDs
+        :param name: Token ID
+        :param privsep: Whether tokens have separate permissions instead of users' ones (optional, default=True)
+        :param expire: Expiration date as Unix timestamp (optional)
+        :param comment: Comment (optional)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :return: Dict where keys are user IDs and values are results in JSON-like format
+                 ({"status": "ok"/"error", "error": ..., "token": ...})
+        """
+        results = {}
+        outcomes = run_in_parallel(lambda user: ProxmoxUser(self._api, user).create_token(name, privsep=privsep,
+                                                                                          expire=expire,
+                                                                                          comment=comment),
+                                   users, concurrency=concurrency)
+        for user, token, exception in outcomes:
+            if exception is not None:
+                results[user] = {"status": "error", "error": str(exception), "token": None}
+            else:
+                results[user] = {"status": "ok", "error": None, "token": token}
+        return results
 
     def remove(self, user: str) -> None:
         """
@@ -98,7 +275,43 @@ class ProxmoxUserDict:
         :return: None
         """
         self._get_users()
-        self._users[user].delete()
+        self._users[self._key(user)].delete()
+        self._fetched_at = None
+
+    def filter(self, realm: str = None, group: str = None, enabled: bool = None,
+               expired: bool = None) -> List[ProxmoxUser]:
+        """
+        Find users using indexes of realms, groups, disabled users and expiration times built from a single user
+        listing
+        :param realm: Only users from this realm (optional)
+        :param group: Only users from this group, requires with_groups=True (optional)
+        :param enabled: Only enabled/disabled users (optional)
+        :param expired: Only expired/not expired users (optional)
+        :return: List of ProxmoxUser objects
+        """
+        self._get_users()
+        if group is not None and not self._with_groups:
+            raise ValueError("User groups are only availible if ProxmoxUserDict is created with with_groups=True")
+        keys = set(self._users.keys())
+        if realm is not None:
+            keys &= self._by_realm.get(realm, set())
+        if group is not None:
+            keys &= self._by_group.get(group, set())
+        if enabled is not None:
+            keys = keys - self._disabled if enabled else keys & self._disabled
+        if expired is not None:
+            now = time.time()
+            expired_keys = {key for key, expire in self._expire_at.items() if expire < now}
+            keys = keys & expired_keys if expired else keys - expired_keys
+        return sorted((self._users[key] for key in keys), key=lambda user: user.id)
+
+    def refresh(self) -> None:
+        """
+        Fetch user listing again even if cached one is not expired yet
+        :return: None
+        """
+        self._fetched_at = None
+        self._get_users()
 
     def __len__(self):
         self._get_users()
@@ -106,7 +319,11 @@ class ProxmoxUserDict:
 
     def __getitem__(self, key: str) -> ProxmoxUser:
         self._get_users()
-        return self._users[key]
+        return self._users[self._key(key)]
+
+    def __contains__(self, key: str) -> bool:
+        self._get_users()
+        return self._key(key) in self._users
 
     def __iter__(self):
         self._get_users()
@@ -117,8 +334,42 @@ class ProxmoxUserDict:
         return f"<{self.__class__.__name__}: {repr(self._users)}>"
 
     def _get_users(self):
-        resp = self._api.list_users()
-        # Only users in @pve realm will be returned
-        userid_list = [el["userid"][:el["userid"].rindex("@")] for el in resp if el["userid"].split("@")[-1] == "pve"]
-        users = [ProxmoxUser(self._api, userid) for userid in userid_list]
+        if self._ttl is not None and self._fetched_at is not None and \
+                time.monotonic() - self._fetched_at < self._ttl:
+            return
+        resp = self._api.list_users(full="1") if self._with_groups else self._api.list_users()
+        users = [ProxmoxUser(self._api, el["userid"], el) for el in resp]
+        all_userids = {user.fullid for user in users}
+        if self._realm is not None:
+            users = [user for user in users if user.realm == self._realm]
+        by_realm = defaultdict(set)
+        by_group = defaultdict(set)
+        disabled = set()
+        expire_at = {}
+        for user in users:
+            by_realm[user.realm].add(user.id)
+            if not user.enabled():
+                disabled.add(user.id)
+            expire = int(user._info.get("expire", 0) or 0)
+            if expire:
+                expire_at[user.id] = expire
+            groups = user._info.get("groups", [])
+            if isinstance(groups, str):
+                groups = groups.split(",")
+            for group in groups:
+                if group:
+                    by_group[group].add(user.id)
         self._users: Dict[str, ProxmoxUser] = {user.id: user for user in users}
+        self._by_realm = dict(by_realm)
+        self._by_group = dict(by_group)
+        self._disabled = disabled
+        self._expire_at = expire_at
+        self._all_userids = all_userids
+        self._fetched_at = time.monotonic()
+
+    @staticmethod
+    def _key(userid: str) -> str:
+        # Users from @pve realm are stored without realm
+        if userid.endswith("@" + DEFAULT_REALM):
+            return userid[:-len(DEFAULT_REALM) - 1]
+        return userid
@@ -1,7 +1,15 @@
 from ..api import APIWrapper
 from .nodes import ProxmoxNode, ProxmoxNodeDict
+from .storages import ProxmoxStorage
 from .users import ProxmoxUser
-from typing import Dict, List, Tuple, Any, Union
+from .tasks import run_bulk_action
+from .snapshots import check_snapshot_name, CURRENT_SNAPSHOT
+from .backups import backup_kwargs
+from .agent import agent_command, run_agent_command, write_agent_file, read_agent_file, WRITE_CHUNK_SIZE, \
+    READ_CHUNK_SIZE
+from ..parallel import iter_in_parallel
+from .configs import ProxmoxVMConfig, is_config_conflict
+from typing import Dict, List, Tuple, Any, Union, Optional, Iterable, Iterator, BinaryIO, Callable
 
 
 class ProxmoxVM:
@@ -39,6 +47,49 @@ class ProxmoxVM:
         """
         return self._api.get_vm_config(node=self._node, vmid=self._vmid)
 
+    def get_parsed_config(self) -> ProxmoxVMConfig:
+        """
+        Get detailed config as a parsed object
+        :return: ProxmoxVMConfig object
+        """
+        return ProxmoxVMConfig(self.get_config())
+
+    def set_config(self, values: Dict[str, Any], current: ProxmoxVMConfig = None) -> None:
+        """
+        Update config, sending only changed keys together with digest of current config
+        :param values: Dict of new values (dicts are packed, None means key should be deleted)
+        :param current: Current config, fetched if not given (optional)
+        :return: None
+        """
+        if current is None:
+            current = self.get_parsed_config()
+        kwargs = current.update_kwargs(values)
+        if not kwargs:
+            return
+        self._api.update_vm_config(node=self._node, vmid=self._vmid, **kwargs)
+
+    def update_config(self, values: Dict[str, Any], current: ProxmoxVMConfig = None,
+                      retries: int = 3) -> Optional[str]:
+        """
+        Update config asynchronously, re-reading config and retrying if it was modified concurrently
+        :param values: Dict of new values (dicts are packed, None means key should be deleted)
+        :param current: Current config, fetched if not given (optional)
+        :param retries: How many times to retry on digest mismatch (optional, default=3)
+        :return: ID of task or None if nothing had to be changed
+        """
+        for attempt in range(retries + 1):
+            if current is None:
+                current = self.get_parsed_config()
+            kwargs = current.update_kwargs(values)
+            if not kwargs:
+                return None
+            try:
+                return self._api.update_vm_config_async(node=self._node, vmid=self._vmid, **kwargs)
+            except Exception as e:
+                if attempt == retries or not is_config_conflict(e):
+                    raise
+                current = None
+
     def running(self) -> bool:
         """
         Whether VM is currently running
@@ -56,13 +107,15 @@ class ProxmoxVM:
         return "template" in config.keys() and config["template"] == 1
 
     def clone(self, newid: Union[str, int], newnode: Union[str, ProxmoxNode] = None, name: str = None,
-              full: bool = True) -> str:
+              full: bool = True, storage: Union[str, ProxmoxStorage] = None) -> str:
         """
         Clone virtual machine
         :param newid: ID of new VM (integer number 100-999999999)
         :param newnode: New node ID or ProxmoxNode object (optional)
         :param name: Name of new VM (optional)
         :param full: Whether to make storage unlinked (note that linked might not be supported) (optional, default=True)
+        :param storage: Target storage ID or ProxmoxStorage object for full clone, e.g. chosen with
+                        ProxmoxStorageDict.choose_by_most_free_space (optional)
         :return: ID of cloning task
         """
         try:
@@ -79,14 +132,45 @@ class ProxmoxVM:
             kwargs["target"] = newnode
         if name is not None:
             kwargs["name"] = name
+        if storage is not None:
+            if isinstance(storage, ProxmoxStorage):
+                storage = storage.id
+            kwargs["storage"] = storage
         return self._api.clone_vm(**kwargs)
 
-    def delete(self) -> str:
+    def migrate(self, target: Union[str, ProxmoxNode], online: bool = None, bwlimit: int = None,
+                with_local_disks: bool = False) -> str:
+        """
+        Migrate virtual machine to other node
+        :param target: Target node ID or ProxmoxNode object
+        :param online: Whether to migrate running VM without stopping it (optional, default=whether VM is running)
+        :param bwlimit: Bandwidth limit in KiB/s (optional)
+        :param with_local_disks: Whether to migrate local disks too (optional, default=False)
+        :return: ID of migration task
+        """
+        if isinstance(target, ProxmoxNode):
+            target = target.id
+        if online is None:
+            online = self.running()
+        kwargs = {"target": target, "node": self._node, "vmid": self._vmid, "online": '1' if online else '0'}
+        if bwlimit is not None:
+            kwargs["bwlimit"] = str(bwlimit)
+        if with_local_disks:
+            kwargs["with-local-disks"] = '1'
+        return self._api.migrate_vm(**kwargs)
+
+    def delete(self, purge: bool = False) -> str:
         """
         Delete this VM
+        :param purge: Whether to also remove it from backup jobs, HA and replication and destroy unreferenced disks
+                      (optional, default=False)
         :return: ID of deleting task
         """
-        return self._api.delete_vm(node=self._node, vmid=self._vmid)
+        kwargs = {"node": self._node, "vmid": self._vmid}
+        if purge:
+            kwargs["purge"] = '1'
+            kwargs["destroy-unreferenced-disks"] = '1'
+        return self._api.delete_vm(**kwargs)
 
     def start(self, timeout: int = None) -> str:
         """
@@ -158,6 +242,120 @@ class ProxmoxVM:
         kwargs = {"node": self._node, "vmid": self._vmid}
         return self._api.resume_vm(**kwargs)
 
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """
+        Get list of snapshots of this VM
+        :return: List of snapshots' info in JSON-like format (name, description, snaptime, parent...)
+        """
+        snapshots = self._api.list_vm_snapshots(node=self._node, vmid=self._vmid)
+        return [el for el in snapshots if el.get("name") != CURRENT_SNAPSHOT]
+
+    def snapshot(self, name: str, description: str = None, vmstate: bool = False) -> str:
+        """
+        Create snapshot of this VM
+        :param name: Snapshot name (2-40 letters, digits, "-" and "_" starting with a letter)
+        :param description: Description of snapshot (optional)
+        :param vmstate: Whether to save RAM of running VM too (optional, default=False)
+        :return: ID of task
+        """
+        kwargs = {"snapname": check_snapshot_name(name), "node": self._node, "vmid": self._vmid}
+        if description is not None:
+            kwargs["description"] = description
+        if vmstate:
+            kwargs["vmstate"] = '1'
+        return self._api.create_vm_snapshot(**kwargs)
+
+    def rollback(self, name: str, start: bool = False) -> str:
+        """
+        Roll this VM back to snapshot
+        :param name: Snapshot name
+        :param start: Whether to start VM after rollback (optional, default=False)
+        :return: ID of task
+        """
+        kwargs = {"snapname": name, "node": self._node, "vmid": self._vmid}
+        if start:
+            kwargs["start"] = '1'
+        return self._api.rollback_vm_snapshot(**kwargs)
+
+    def delete_snapshot(self, name: str, force: bool = False) -> str:
+        """
+        Delete snapshot of this VM
+        :param name: Snapshot name
+        :param force: Whether to remove snapshot from config even if removing disk snapshots fails
+                      (optional, default=False)
+        :return: ID of task
+        """
+        kwargs = {"snapname": name, "node": self._node, "vmid": self._vmid}
+        if force:
+            kwargs["force"] = '1'
+        return self._api.delete_vm_snapshot(**kwargs)
+
+    def backup(self, storage: str = None, mode: str = "snapshot", compress: str = "zstd", notes: str = None) -> str:
+        """
+        Back up this VM with vzdump
+        :param storage: Target storage (optional, default=storage from node's vzdump.conf)
+        :param mode: "snapshot", "suspend" or "stop" (optional, default="snapshot")
+        :param compress: Compression algorithm ("0", "gzip", "lzo" or "zstd") (optional, default="zstd")
+        :param notes: Template of backup notes, e.g. "{{guestname}}" (optional)
+        :return: ID of task
+        """
+        return self._api.create_backup(node=self._node, vmid=self._vmid,
+                                       **backup_kwargs(storage=storage, mode=mode, compress=compress, notes=notes))
+
+    def agent_exec(self, command: Union[str, List[str]], input_data: str = None) -> int:
+        """
+        Start command in this VM with QEMU guest agent without waiting for it
+        :param command: Command as list of program and arguments or string that is split like in shell
+        :param input_data: Data passed to standard input of command (optional)
+        :return: PID of command in guest
+        """
+        kwargs = {"input-data": input_data} if input_data is not None else {}
+        return self._api.agent_exec(node=self._node, vmid=self._vmid, command=agent_command(command), **kwargs)["pid"]
+
+    def agent_exec_status(self, pid: Union[str, int]) -> Dict[str, Any]:
+        """
+        Get status of command started with agent_exec
+        :param pid: PID of command in guest
+        :return: Status in JSON-like format ("exited", "exitcode", "out-data", "err-data"...)
+        """
+        return self._api.get_agent_exec_status(node=self._node, vmid=self._vmid, pid=str(pid))
+
+    def agent_run(self, command: Union[str, List[str]], input_data: str = None,
+                  timeout: float = None) -> Dict[str, Any]:
+        """
+        Run command in this VM with QEMU guest agent and wait for it to exit
+        :param command: Command as list of program and arguments or string that is split like in shell
+        :param input_data: Data passed to standard input of command (optional)
+        :param timeout: Number of seconds to wait (optional)
+        :return: Status in JSON-like format ("exitcode", "out-data", "err-data"...)
+        """
+        return run_agent_command(self._api, self._node, self._vmid, command, input_data=input_data, timeout=timeout)
+
+    def file_read(self, path: str, chunk_size: int = READ_CHUNK_SIZE, timeout: float = None) -> Iterator[bytes]:
+        """
+        Read file in this VM with QEMU guest agent chunk by chunk, first 16 MiB are read with file-read, rest of bigger
+        files is read piece by piece so that it is never kept in memory at once (requires POSIX shell with dd and
+        base64 in guest)
+        :param path: Path of file in guest
+        :param chunk_size: Number of bytes read by one request (optional, default=1 MiB)
+        :param timeout: Number of seconds to wait for each chunk (optional)
+        :return: Generator of chunks of file
+        """
+        return read_agent_file(self._api, self._node, self._vmid, path, chunk_size=chunk_size, timeout=timeout)
+
+    def file_write(self, path: str, data: Union[str, bytes, BinaryIO, Iterable[bytes]],
+                   chunk_size: int = WRITE_CHUNK_SIZE, timeout: float = None) -> int:
+        """
+        Write file in this VM with QEMU guest agent chunk by chunk, file-like objects and iterables are streamed
+        (files bigger than one chunk require POSIX shell with base64 in guest)
+        :param path: Path of file in guest
+        :param data: String, bytes, binary file-like object or iterable of bytes
+        :param chunk_size: Number of bytes sent by one request, at most 45 KiB (optional, default=45 KiB)
+        :param timeout: Number of seconds to wait for each chunk (optional)
+        :return: Number of bytes written
+        """
+        return write_agent_file(self._api, self._node, self._vmid, path, data, chunk_size=chunk_size, timeout=timeout)
+
     def view_permissions(self) -> List[Tuple[ProxmoxUser, str]]:
         """
         Get a list of users with permissions for this VM and their roles
@@ -165,8 +363,8 @@ class ProxmoxVM:
         """
         path = "/vms/" + self._vmid
         resp = self._api.get_access_control_list()
-        return [(ProxmoxUser(self._api, el["ugid"].split("@")[0]), el["roleid"]) for el in resp if
-                el["path"] and el["type"] == "user" and el["ugid"].split("@")[1] == "pve" and el["path"] == path]
+        return [(ProxmoxUser(self._api, el["ugid"]), el["roleid"]) for el in resp if
+                el["path"] and el["type"] == "user" and el["path"] == path]
 
     def add_permission(self, user: Union[str, ProxmoxUser], role: str) -> None:
         """
@@ -176,9 +374,9 @@ class ProxmoxVM:
         :return: None
         """
         path = "/vms/" + self._vmid
-        if isinstance(user, ProxmoxUser):
-            user = user.id
-        self._api.update_access_control_list(path=path, roles=role, users=user + "@pve", delete="0", propagate="0")
+        if not isinstance(user, ProxmoxUser):
+            user = ProxmoxUser(self._api, user)
+        self._api.update_access_control_list(path=path, roles=role, users=user.fullid, delete="0", propagate="0")
 
     def remove_permission(self, user: Union[str, ProxmoxUser], role: str) -> None:
         """
@@ -188,9 +386,9 @@ class ProxmoxVM:
         :return: None
         """
         path = "/vms/" + self._vmid
-        if isinstance(user, ProxmoxUser):
-            user = user.id
-        self._api.update_access_control_list(path=path, roles=role, users=user + "@pve", delete="1", propagate="0")
+        if not isinstance(user, ProxmoxUser):
+            user = ProxmoxUser(self._api, user)
+        self._api.update_access_control_list(path=path, roles=role, users=user.fullid, delete="1", propagate="0")
 
     def remove_all_permissions(self) -> None:
         """
@@ -237,6 +435,137 @@ class ProxmoxVMDict:
         self._get_vms()
         self._vms[vmid].delete()
 
+    def remove_many(self, vmids: List[Union[str, int]], stop_first: bool = True, purge: bool = True,
+                    concurrency: int = 8, per_node: int = None,
+                    timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Remove many VMs in parallel using a single inventory request
+        :param vmids: List of VM IDs
+        :param stop_first: Whether to stop running VMs before removing them (optional, default=True)
+        :param purge: Whether to also remove them from backup jobs, HA and replication and destroy unreferenced
+                      disks (optional, default=True)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional)
+        :param timeout: Number of seconds to wait for each stage of tasks (optional)
+        :return: Dict where keys are VM IDs and values are results in JSON-like format
+        """
+        targets, resources, results = self._find_many(vmids)
+
+        if stop_first:
+            running = {vmid: target for vmid, target in targets.items() if
+                       resources[vmid].get("status") == "running"}
+            for vmid, result in run_bulk_action(self._api, running, lambda target: target.stop(),
+                                                concurrency=concurrency, per_node=per_node, timeout=timeout).items():
+                if result["status"] != "ok":
+                    result["error"] = f"Failed to stop: {result['error'] or result['status']}"
+                    results[vmid] = result
+                    del targets[vmid]
+
+        results.update(run_bulk_action(self._api, targets, lambda target: target.delete(purge=purge),
+                                       concurrency=concurrency, per_node=per_node, timeout=timeout))
+        return results
+
+    def snapshot_many(self, vmids: List[Union[str, int]], name: str, description: str = None, vmstate: bool = False,
+                      concurrency: int = 8, per_node: int = 2, wait: bool = True,
+                      timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshot many VMs in parallel using a single inventory request
+        :param vmids: List of VM IDs
+        :param name: Snapshot name (2-40 letters, digits, "-" and "_" starting with a letter)
+        :param description: Description of snapshots (optional)
+        :param vmstate: Whether to save RAM of running VMs too (optional, default=False)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional, default=2)
+        :param wait: Whether to wait for snapshot tasks to finish (optional, default=True)
+        :param timeout: Number of seconds to wait for tasks (optional)
+        :return: Dict where keys are VM IDs and values are results in JSON-like format
+        """
+        check_snapshot_name(name)
+        targets, _, results = self._find_many(vmids)
+        results.update(run_bulk_action(self._api, targets,
+                                       lambda target: target.snapshot(name, description=description, vmstate=vmstate),
+                                       concurrency=concurrency, per_node=per_node, wait=wait, timeout=timeout))
+        return results
+
+    def rollback_many(self, vmids: List[Union[str, int]], name: str, start: bool = False, concurrency: int = 8,
+                      per_node: int = 2, wait: bool = True, timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Roll many VMs back to snapshot with the same name in parallel using a single inventory request
+        :param vmids: List of VM IDs
+        :param name: Snapshot name
+        :param start: Whether to start VMs after rollback (optional, default=False)
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional, default=2)
+        :param wait: Whether to wait for rollback tasks to finish (optional, default=True)
+        :param timeout: Number of seconds to wait for tasks (optional)
+        :return: Dict where keys are VM IDs and values are results in JSON-like format
+        """
+        targets, _, results = self._find_many(vmids)
+        results.update(run_bulk_action(self._api, targets, lambda target: target.rollback(name, start=start),
+                                       concurrency=concurrency, per_node=per_node, wait=wait, timeout=timeout))
+        return results
+
+    def agent_exec_many(self, vmids: List[Union[str, int]], command: Union[str, List[str]], input_data: str = None,
+                        concurrency: int = 16, per_node: int = 4, timeout: float = None,
+                        progress: Callable[[str, Dict[str, Any], int, int], None] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run command in many VMs with QEMU guest agent in parallel using a single inventory request
+        :param vmids: List of VM IDs
+        :param command: Command as list of program and arguments or string that is split like in shell
+        :param input_data: Data passed to standard input of command (optional)
+        :param concurrency: Maximum number of simultaneous commands (optional, default=16)
+        :param per_node: Maximum number of simultaneous commands per node (optional, default=4)
+        :param timeout: Number of seconds to wait for each command (optional)
+        :param progress: Function called as each command finishes with VM ID, its result, number of finished
+                         commands and total number of commands (optional)
+        :return: Dict where keys are VM IDs and values are results in JSON-like format
+                 ({"node": ..., "status": "ok"/"error", "exitcode": ..., "out": ..., "err": ..., "error": ...})
+        """
+        targets, _, not_found = self._find_many(vmids)
+        results = {vmid: {"node": None, "status": "error", "exitcode": None, "out": None, "err": None,
+                          "error": result["error"]} for vmid, result in not_found.items()}
+        outcomes = iter_in_parallel(lambda vmid: targets[vmid].agent_run(command, input_data=input_data,
+                                                                         timeout=timeout),
+                                    targets.keys(), concurrency=concurrency,
+                                    group_key=lambda vmid: targets[vmid].node.id, group_limit=per_node)
+        for vmid, status, exception in outcomes:
+            result = {"node": targets[vmid].node.id, "status": "ok", "exitcode": None, "out": None, "err": None,
+                      "error": None}
+            if exception is not None:
+                result.update(status="error", error=str(exception))
+            else:
+                result.update(exitcode=status.get("exitcode"), out=status.get("out-data", ""),
+                              err=status.get("err-data", ""))
+                if str(result["exitcode"]) != "0":
+                    result.update(status="error", error=f"Command exited with code {result['exitcode']}")
+            results[vmid] = result
+            if progress is not None:
+                progress(vmid, result, len(results) - len(not_found), len(targets))
+        return results
+
+    def apply_configs(self, changes: Dict[Union[str, int], Dict[str, Any]], concurrency: int = 8,
+                      per_node: int = 4, retries: int = 3, wait: bool = True,
+                      timeout: float = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Update configs of many VMs in parallel, retrying on digest mismatch
+        :param changes: Dict where keys are VM IDs and values are dicts of new config values
+        :param concurrency: Maximum number of simultaneous API calls (optional, default=8)
+        :param per_node: Maximum number of simultaneous API calls per node (optional, default=4)
+        :param retries: How many times to retry on digest mismatch (optional, default=3)
+        :param wait: Whether to wait for update tasks to finish (optional, default=True)
+        :param timeout: Number of seconds to wait for tasks (optional)
+        :return: Dict where keys are VM IDs and values are results in JSON-like format
+        """
+        changes = {str(vmid): values for vmid, values in changes.items()}
+        self._get_vms()
+        targets = {vmid: self._vms[vmid] for vmid in changes if vmid in self._vms}
+        results = {vmid: {"node": None, "task": None, "status": "error", "error": f"VM {vmid} not found"}
+                   for vmid in changes if vmid not in targets}
+        results.update(run_bulk_action(self._api, targets,
+                                       lambda target: target.update_config(changes[target.id], retries=retries),
+                                       concurrency=concurrency, per_node=per_node, wait=wait, timeout=timeout))
+        return results
+
     def __len__(self):
         self._get_vms()
         return len(self._vms)
@@ -260,3 +589,14 @@ class ProxmoxVMDict:
             resp = self._api.list_vms(node)
             vms += [ProxmoxVM(self._api, str(vm["vmid"]), node) for vm in resp]
         self._vms = {vm.id: vm for vm in vms}
+
+    def _find_many(self, vmids: List[Union[str, int]]) \
+            -> Tuple[Dict[str, ProxmoxVM], Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        # One inventory request instead of listing every node, IDs that are not found are reported as errors
+        vmids = [str(vmid) for vmid in vmids]
+        resources = {str(el["vmid"]): el for el in self._api.list_resources(type="vm") if el.get("type") == "qemu"}
+        results = {vmid: {"node": None, "task": None, "status": "error", "error": f"VM {vmid} not found"}
+                   for vmid in vmids if vmid not in resources}
+        targets = {vmid: ProxmoxVM(self._api, vmid, resources[vmid]["node"]) for vmid in vmids
+                   if vmid in resources}
+        return targets, resources, results
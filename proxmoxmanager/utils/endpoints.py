@@ -0,0 +1,263 @@
+from .parallel import run_in_parallel
+from .transports import Transport
+from threading import Lock, Event, Thread
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import time
+
+
+class Endpoint:
+    """
+    One API endpoint (pveproxy of a cluster node) with passively tracked latency and health
+    """
+
+    # Weight of the newest sample in exponentially weighted moving average of latency
+    LATENCY_WEIGHT = 0.3
+
+    def __init__(self, host: str, api: Any = None, **api_kwargs):
+        """
+        :param host: Host with optional port
+        :param api: ProxmoxAPI object (optional, default=created from api_kwargs on first use)
+        :param api_kwargs: Arguments passed to ProxmoxAPI (user, token_name, token_value, verify_ssl)
+        """
+        self.host = host
+        self._api = api
+        self._api_kwargs = api_kwargs
+        self._api_lock = Lock()
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.down_until = 0.0
+        self.node: Optional[str] = None
+
+    @property
+    def api(self) -> Any:
+        # proxmoxer and requests are only imported and session is only created when endpoint is first used
+        if self._api is None:
+            with self._api_lock:
+                if self._api is None:
+                    from proxmoxer import ProxmoxAPI
+                    self._api = ProxmoxAPI(host=self.host, **self._api_kwargs)
+        return self._api
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def record_success(self, latency: float) -> None:
+        self.failures = 0
+        self.down_until = 0.0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = self.LATENCY_WEIGHT * latency + (1 - self.LATENCY_WEIGHT) * self.latency
+
+    def record_failure(self, cooldown: float) -> None:
+        self.failures += 1
+        # Endpoints that keep failing are skipped for longer
+        self.down_until = time.monotonic() + cooldown * min(self.failures, 10)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self.host}>"
+
+
+def _nothing_sent(error: Exception) -> bool:
+    """
+    :param error: Exception raised by requests
+    :return: Whether request failed while connecting, before anything was sent (refused connection, DNS error,
+             connect timeout)
+    """
+    from requests.exceptions import ConnectTimeout
+    from urllib3.exceptions import ConnectTimeoutError, MaxRetryError
+    if isinstance(error, ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    # NewConnectionError and NameResolutionError are subclasses of ConnectTimeoutError
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class EndpointPool(Transport):
+    """
+    Set of interchangeable endpoints of one cluster. Requests are sent to the healthiest endpoint with the lowest
+    latency and are repeated on the next one if connection fails. Requests other than GET are only repeated if
+    nothing was sent yet, so that they are never executed twice.
+    """
+
+    def __init__(self, hosts: Sequence[str], user: str, token_name: str, token_value: str, cooldown: float = 30,
+                 route_node_calls: bool = False):
+        """
+        :param hosts: Hosts with optional ports
+        :param user: User that owns API token
+        :param token_name: Name of API token
+        :param token_value: Secret value of API token
+        :param cooldown: Number of seconds for which failed endpoint is not used (optional, default=30)
+        :param route_node_calls: Whether to send node-scoped calls straight to endpoint on that node
+                                 (optional, default=False)
+        """
+        if not hosts:
+            raise ValueError("At least one host is required")
+        self._endpoints = [Endpoint(host, user=user, token_name=token_name, token_value=token_value,
+                                    verify_ssl=False) for host in hosts]
+        self._cooldown = cooldown
+        self._route_node_calls = route_node_calls
+        self._nodes_discovered = False
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        return list(self._endpoints)
+
+    def request(self, method: str, path: Tuple[str, ...], data: Dict[str, Any]) -> Any:
+        """
+        Send request to the best endpoint, failing over to other endpoints on connection errors
+        :param method: HTTP method
+        :param path: Parts of API path, e.g. ("nodes", "node1", "qemu")
+        :param data: Query parameters or request body
+        :return: Response data
+        """
+        from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+        last_error = None
+        for endpoint in self._ordered(path):
+            resource = endpoint.api
+            for part in path:
+                resource = resource(part)
+            start = time.monotonic()
+            try:
+                result = getattr(resource, method.lower())(**data)
+            except RequestsConnectionError as e:
+                # Connection might have been lost after request was sent, so writes are only repeated if it wasn't
+                if method.upper() != "GET" and not _nothing_sent(e):
+                    with self._lock:
+                        endpoint.record_failure(self._cooldown)
+                    raise
+                last_error = e
+            except Timeout as e:
+                # Request might have been executed already, so only reads are repeated after timeout
+                if method.upper() != "GET":
+                    with self._lock:
+                        endpoint.record_failure(self._cooldown)
+                    raise
+                last_error = e
+            else:
+                with self._lock:
+                    endpoint.record_success(time.monotonic() - start)
+                return result
+            with self._lock:
+                endpoint.record_failure(self._cooldown)
+        raise last_error
+
+    def probe(self) -> Dict[str, bool]:
+        """
+        Check health and latency of all endpoints concurrently
+        :return: Dict where keys are hosts and values are whether endpoint answered
+        """
+        def check(endpoint):
+            start = time.monotonic()
+            endpoint.api.version.get()
+            return time.monotonic() - start
+
+        result = {}
+        for endpoint, latency, exception in run_in_parallel(check, self._endpoints,
+                                                            concurrency=len(self._endpoints)):
+            with self._lock:
+                if exception is None:
+                    endpoint.record_success(latency)
+                else:
+                    endpoint.record_failure(self._cooldown)
+            result[endpoint.host] = exception is None
+        return result
+
+    def discover_nodes(self) -> Dict[str, str]:
+        """
+        Find out which node each endpoint is running on
+        :return: Dict where keys are hosts and values are node IDs
+        """
+        def local_node(endpoint):
+            for el in endpoint.api.cluster.status.get():
+                if el.get("type") == "node" and el.get("local"):
+                    return el["name"]
+            return None
+
+        for endpoint, node, exception in run_in_parallel(local_node, self._endpoints,
+                                                         concurrency=len(self._endpoints)):
+            if exception is None:
+                endpoint.node = node
+        self._nodes_discovered = True
+        return {endpoint.host: endpoint.node for endpoint in self._endpoints if endpoint.node is not None}
+
+    def start_health_checks(self, interval: float = 30) -> None:
+        """
+        Start probing endpoints in a background thread
+        :param interval: Number of seconds between probes (optional, default=30)
+        :return: None
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.probe()
+
+        self._thread = Thread(target=loop, name="proxmoxmanager-health-checks", daemon=True)
+        self._thread.start()
+
+    def stop_health_checks(self) -> None:
+        """
+        Stop probing endpoints in background
+        :return: None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _ordered(self, path: Tuple[str, ...]) -> List[Endpoint]:
+        with self._lock:
+            healthy = sorted((el for el in self._endpoints if el.healthy),
+                             key=lambda el: el.latency if el.latency is not None else 0.0)
+            # Endpoints that are down are still tried as a last resort
+            down = sorted((el for el in self._endpoints if not el.healthy), key=lambda el: el.down_until)
+        if self._route_node_calls and len(path) > 1 and path[0] == "nodes" and len(self._endpoints) > 1:
+            if not self._nodes_discovered:
+                self.discover_nodes()
+            owner = [el for el in healthy if el.node == path[1]]
+            healthy = owner + [el for el in healthy if el.node != path[1]]
+        return healthy + down
+
+
+class RoutedResource:
+    """
+    Drop-in replacement for proxmoxer resource that builds API path and sends request through a transport
+    """
+
+    def __init__(self, transport: Transport, path: Tuple[str, ...] = ()):
+        self._transport = transport
+        self._path = path
+
+    def __getattr__(self, item: str) -> 'RoutedResource':
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return RoutedResource(self._transport, self._path + (item,))
+
+    def __call__(self, resource_id: Any = None) -> 'RoutedResource':
+        if resource_id in (None, ""):
+            return self
+        return RoutedResource(self._transport, self._path + tuple(str(resource_id).split("/")))
+
+    def get(self, **params) -> Any:
+        return self._transport.request("GET", self._path, params)
+
+    def post(self, **data) -> Any:
+        return self._transport.request("POST", self._path, data)
+
+    def put(self, **data) -> Any:
+        return self._transport.request("PUT", self._path, data)
+
+    def delete(self, **params) -> Any:
+        return self._transport.request("DELETE", self._path, params)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: /{'/'.join(self._path)}>"
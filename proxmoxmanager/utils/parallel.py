@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import BoundedSemaphore
+from typing import Any, Callable, Iterable, Iterator, List, Tuple, Optional, Dict
+from collections import defaultdict
+
+
+def iter_in_parallel(func: Callable[[Any], Any],
+                     items: Iterable[Any],
+                     concurrency: int = 8,
+                     group_key: Callable[[Any], Any] = None,
+                     group_limit: int = None) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Call function for every item in a thread pool and yield results as soon as they are ready
+    :param func: Function that takes one item
+    :param items: Items to process
+    :param concurrency: Maximum number of simultaneous calls (optional, default=8)
+    :param group_key: Function that returns group of item, e.g. node (optional)
+    :param group_limit: Maximum number of simultaneous calls within one group (optional)
+    :return: Generator of tuples (item, [result or None], [exception or None])
+    """
+    if concurrency < 1:
+        raise ValueError("Concurrency has to be at least 1")
+    items = list(items)
+    if not items:
+        return
+
+    semaphores: Dict[Any, BoundedSemaphore] = {}
+    if group_key is not None:
+        # Interleave groups so that workers are spread between them instead of queueing on one group
+        groups = defaultdict(list)
+        for item in items:
+            groups[group_key(item)].append(item)
+        items = [item for batch in _round_robin(list(groups.values())) for item in batch]
+        if group_limit is not None:
+            semaphores = {key: BoundedSemaphore(group_limit) for key in groups}
+
+    def call(item):
+        semaphore = semaphores.get(group_key(item)) if semaphores else None
+        if semaphore is None:
+            return func(item)
+        with semaphore:
+            return func(item)
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        futures = {executor.submit(call, item): item for item in items}
+        for future in as_completed(futures):
+            exception = future.exception()
+            yield futures[future], None if exception else future.result(), exception
+
+
+def run_in_parallel(func: Callable[[Any], Any],
+                    items: Iterable[Any],
+                    concurrency: int = 8,
+                    group_key: Callable[[Any], Any] = None,
+                    group_limit: int = None) -> List[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Call function for every item in a thread pool and wait for all of the results
+    :param func: Function that takes one item
+    :param items: Items to process
+    :param concurrency: Maximum number of simultaneous calls (optional, default=8)
+    :param group_key: Function that returns group of item, e.g. node (optional)
+    :param group_limit: Maximum number of simultaneous calls within one group (optional)
+    :return: List of tuples (item, [result or None], [exception or None]) in order of completion
+    """
+    return list(iter_in_parallel(func, items, concurrency=concurrency, group_key=group_key, group_limit=group_limit))
+
+
+def _round_robin(groups: List[List[Any]]) -> Iterator[List[Any]]:
+    index = 0
+    while any(index < len(group) for group in groups):
+        yield [group[index] for group in groups if index < len(group)]
+        index += 1
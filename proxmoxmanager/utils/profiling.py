@@ -0,0 +1,147 @@
+from .transports import Transport
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, List, Tuple
+import json
+import os
+import time
+import traceback
+
+# Frames from these files are internals of request execution and are not interesting as call sites
+_INTERNAL_FILES = tuple(os.path.join(os.path.dirname(__file__), name) for name in
+                        ("api.py", "endpoints.py", "profiling.py", "transports.py"))
+_API_FILE = _INTERNAL_FILES[0]
+# Path segments that follow these ones are IDs and are replaced with placeholders in request patterns
+_ID_SEGMENTS = {"nodes": "{node}", "qemu": "{vmid}", "lxc": "{vmid}", "tasks": "{upid}", "users": "{userid}",
+                "storage": "{storage}", "snapshot": "{snapname}", "token": "{tokenid}"}
+
+
+class RequestProfiler(Transport):
+    """
+    Transport that passes requests to another transport and records every request with APIWrapper method name,
+    node, duration and caller stack. Used to find repeated requests (N+1 patterns) and to limit request count
+    in tests.
+    """
+
+    def __init__(self, inner: Transport, stack_depth: int = 8):
+        """
+        :param inner: Transport that executes requests
+        :param stack_depth: Number of caller frames saved for each request (optional, default=8)
+        """
+        self._inner = inner
+        self._stack_depth = stack_depth
+        self._lock = Lock()
+        self.requests: List[Dict[str, Any]] = []
+
+    @property
+    def request_count(self) -> int:
+        return len(self.requests)
+
+    def request(self, method: str, path: Tuple[str, ...], data: Dict[str, Any]) -> Any:
+        call, stack = self._caller()
+        record = {"method": method, "path": "/".join(path), "call": call,
+                  "node": path[1] if len(path) > 1 and path[0] == "nodes" else None,
+                  "duration": 0.0, "stack": stack, "error": None, "data": dict(data)}
+        start = time.monotonic()
+        try:
+            return self._inner.request(method, path, data)
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            record["duration"] = time.monotonic() - start
+            with self._lock:
+                self.requests.append(record)
+
+    def count(self, call: str = None) -> int:
+        """
+        Get number of recorded requests
+        :param call: Only count requests made by this APIWrapper method, e.g. "get_node_status" (optional)
+        :return: Number of requests
+        """
+        return sum(1 for el in self.requests if call is None or el["call"] == call)
+
+    def total_duration(self) -> float:
+        """
+        :return: Sum of durations of all requests in seconds
+        """
+        return sum(el["duration"] for el in self.requests)
+
+    def n_plus_one(self, threshold: int = 3) -> List[Dict[str, Any]]:
+        """
+        Find requests of the same kind that were made many times from the same place in code
+        :param threshold: Minimum number of repeats to be reported (optional, default=3)
+        :return: List of patterns in JSON-like format ({"call": ..., "pattern": ..., "site": ..., "count": ...}),
+                 most frequent first
+        """
+        counter = Counter((el["call"], self._pattern(el["path"]), el["stack"][0] if el["stack"] else None)
+                          for el in self.requests)
+        return [{"call": call, "pattern": pattern, "site": site, "count": count}
+                for (call, pattern, site), count in counter.most_common() if count >= threshold]
+
+    def duplicates(self) -> Dict[str, int]:
+        """
+        Find identical requests that were made more than once (results could have been reused)
+        :return: Dict where keys are requests ("METHOD path params") and values are numbers of repeats
+        """
+        counter = Counter(f"{el['method']} /{el['path']} {json.dumps(el['data'], sort_keys=True, default=str)}"
+                          for el in self.requests)
+        return {request: count for request, count in counter.most_common() if count > 1}
+
+    def report(self, threshold: int = 3) -> str:
+        """
+        Get human-readable summary of recorded requests
+        :param threshold: Minimum number of repeats to be reported as N+1 pattern (optional, default=3)
+        :return: Multi-line string
+        """
+        lines = [f"{self.request_count} requests in {self.total_duration():.3f}s"]
+        for call, count in Counter(el["call"] for el in self.requests).most_common():
+            lines.append(f"  {call}: {count}")
+        patterns = self.n_plus_one(threshold)
+        if patterns:
+            lines.append("Repeated requests (possible N+1):")
+            for el in patterns:
+                lines.append(f"  {el['count']}x {el['call']} /{el['pattern']} at {el['site']}")
+        return "\n".join(lines)
+
+    def assert_max_requests(self, n: int, call: str = None) -> None:
+        """
+        Check that not more than n requests were made
+        :param n: Maximum number of requests
+        :param call: Only count requests made by this APIWrapper method (optional)
+        :return: None
+        """
+        count = self.count(call)
+        if count > n:
+            raise AssertionError(f"Expected at most {n} {'requests' if call is None else call + ' calls'}, "
+                                 f"got {count}\n{self.report()}")
+
+    def reset(self) -> None:
+        """
+        Forget recorded requests
+        :return: None
+        """
+        with self._lock:
+            self.requests.clear()
+
+    def _caller(self) -> Tuple[str, List[str]]:
+        call = None
+        stack = []
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            if frame.filename == _API_FILE and call is None and frame.name != "__init__":
+                call = frame.name
+            if frame.filename.startswith(_INTERNAL_FILES):
+                continue
+            stack.append(f"{frame.filename}:{frame.lineno} {frame.name}")
+            if len(stack) >= self._stack_depth:
+                break
+        return call or "unknown", stack
+
+    @staticmethod
+    def _pattern(path: str) -> str:
+        parts = path.split("/")
+        for i in range(1, len(parts)):
+            placeholder = _ID_SEGMENTS.get(parts[i - 1])
+            if placeholder is not None:
+                parts[i] = placeholder
+        return "/".join(parts)
@@ -0,0 +1,258 @@
+from .endpoints import RoutedResource
+from .transports import Transport
+from threading import Lock, Event, Thread
+from typing import Any, Dict, Tuple, Optional, Sequence, Union
+import hashlib
+import time
+
+DEFAULT_PORT = 8006
+
+
+class UserSession(Transport):
+    """
+    Password-authenticated session of one user. Requests are sent with user's ticket through connection pool shared
+    by all sessions of SessionManager.
+    """
+
+    def __init__(self, manager: 'SessionManager', userid: str, ticket: str, csrf_token: str):
+        """
+        :param manager: SessionManager object that owns connection pool
+        :param userid: Full user ID (e.g. "username@pve")
+        :param ticket: Authentication ticket
+        :param csrf_token: CSRF prevention token
+        """
+        self._manager = manager
+        self.userid = userid
+        # Ticket and CSRF token are replaced together on renewal
+        self._tokens = (ticket, csrf_token)
+        self.created = time.monotonic()
+
+    @property
+    def api(self) -> RoutedResource:
+        """
+        :return: Resource that builds API paths like proxmoxer does, e.g. session.api.access.password.put(...)
+        """
+        return RoutedResource(self)
+
+    def get_tokens(self) -> Tuple[str, str]:
+        """
+        :return: Tuple consisting of the authentication ticket and CSRF token
+        """
+        return self._tokens
+
+    def renew(self) -> None:
+        """
+        Get new ticket, current ticket is used as a password
+        :return: None
+        """
+        self._tokens = self._manager._authenticate(self.userid, self._tokens[0])
+        self.created = time.monotonic()
+
+    def request(self, method: str, path: Tuple[str, ...], data: Dict[str, Any]) -> Any:
+        method = method.upper()
+        ticket, csrf_token = self._tokens
+        headers = {"CSRFPreventionToken": csrf_token} if method != "GET" else {}
+        kwargs = {"params": data} if method in ("GET", "DELETE") else {"data": data}
+        return self._manager._send(method, "/".join(path), headers=headers, cookies={"PVEAuthCookie": ticket},
+                                   **kwargs)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self.userid}>"
+
+
+class SessionManager:
+    """
+    Cache of password-authenticated sessions of users that share one connection pool.
+    Proxmox VE tickets are valid for 2 hours, so sessions are renewed in the background before they expire.
+    Tickets are requested through the same pool, so neither logins nor renewals open new connections.
+    Tickets are valid on every node of a cluster, so if several hosts are given, logins and requests fail over to the
+    next host on connection errors like in EndpointPool.
+    """
+
+    # Tickets expire after 2 hours, cached sessions are dropped a bit earlier
+    TICKET_LIFETIME = 7200
+
+    def __init__(self, host: Union[str, Sequence[str]], renew_after: float = 3600, expiry_margin: float = 300,
+                 verify_ssl: bool = False, pool_maxsize: int = 32, auto_renew: bool = True, timeout: float = 5):
+        """
+        :param host: Proxmox host with optional port or list of hosts of the same cluster to fail over between
+        :param renew_after: Age of ticket in seconds after which it is renewed (optional, default=3600)
+        :param expiry_margin: Sessions that are closer to expiry than this number of seconds are not reused
+                              (optional, default=300)
+        :param verify_ssl: Whether to verify SSL certificate (optional, default=False)
+        :param pool_maxsize: Maximum number of connections kept in the pool (optional, default=32)
+        :param auto_renew: Whether to start background renewal once first session is cached (optional, default=True)
+        :param timeout: Number of seconds to wait for response (optional, default=5)
+        """
+        hosts = [host] if isinstance(host, str) else list(host)
+        if not hosts:
+            raise ValueError("At least one host is required")
+        self._base_urls = [self._base_url(host) for host in hosts]
+        # Host that answered last is tried first
+        self._current = 0
+        self._renew_after = renew_after
+        self._expiry_margin = expiry_margin
+        self._verify_ssl = verify_ssl
+        self._auto_renew = auto_renew
+        self._pool_maxsize = pool_maxsize
+        self._timeout = timeout
+        # Connection pool is created with the first session
+        self._http = None
+        self._sessions: Dict[Tuple[str, str], UserSession] = {}
+        # One lock per user and password, so that concurrent callers authenticate only once
+        self._key_locks: Dict[Tuple[str, str], Lock] = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def get(self, userid: str, password: str) -> UserSession:
+        """
+        Get cached session of user or authenticate if there is no valid one
+        :param userid: Full user ID (e.g. "username@pve")
+        :param password: Password of user
+        :return: UserSession object
+        """
+        key = self._key(userid, password)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, Lock())
+        with key_lock:
+            with self._lock:
+                session = self._sessions.get(key)
+            if session is not None and self._valid(session.created):
+                return session
+            session = UserSession(self, userid, *self._authenticate(userid, password))
+            with self._lock:
+                self._sessions[key] = session
+        if self._auto_renew:
+            self.start_renewal()
+        return session
+
+    def invalidate(self, userid: str, password: str = None) -> None:
+        """
+        Forget cached session(s) of user
+        :param userid: Full user ID (e.g. "username@pve")
+        :param password: Only forget session for this password (optional)
+        :return: None
+        """
+        with self._lock:
+            for key in list(self._sessions.keys()):
+                if key[0] == userid and (password is None or key == self._key(userid, password)):
+                    del self._sessions[key]
+
+    def renew(self) -> None:
+        """
+        Renew tickets that are older than renew_after and drop expired sessions
+        :return: None
+        """
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for key, session in sessions:
+            if not self._valid(session.created):
+                self._drop(key)
+            elif time.monotonic() - session.created >= self._renew_after:
+                try:
+                    session.renew()
+                except Exception:
+                    self._drop(key)
+
+    def start_renewal(self, interval: float = 300) -> None:
+        """
+        Start renewing tickets in a background thread
+        :param interval: Number of seconds between checks (optional, default=300)
+        :return: None
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.renew()
+
+        self._thread = Thread(target=loop, name="proxmoxmanager-session-renewal", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop background renewal, forget all sessions and close pooled connections
+        :return: None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._sessions.clear()
+            self._key_locks.clear()
+            http, self._http = self._http, None
+        if http is not None:
+            http.close()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _authenticate(self, userid: str, password: str) -> Tuple[str, str]:
+        from proxmoxer.core import AuthenticationError, ResourceException
+        try:
+            data = self._send("POST", "access/ticket", data={"username": userid, "password": password})
+        except ResourceException as e:
+            raise AuthenticationError(f"Couldn't authenticate user {userid}: {e}") from None
+        return data["ticket"], data["CSRFPreventionToken"]
+
+    def _send(self, method: str, path: str, **kwargs) -> Any:
+        # requests is only imported and connection pool is only created when first session is needed
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+        from proxmoxer.core import ResourceException
+        with self._lock:
+            if self._http is None:
+                self._http = Session()
+                self._http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_maxsize))
+            http = self._http
+        response = self._request(http, method, path, **kwargs)
+        if response.status_code >= 400:
+            raise ResourceException(response.status_code, response.reason, response.text)
+        return response.json().get("data")
+
+    def _request(self, http: Any, method: str, path: str, **kwargs) -> Any:
+        from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+        from .endpoints import _nothing_sent
+        # Reads and logins can be repeated safely, other requests only if nothing was sent yet
+        repeatable = method == "GET" or path == "access/ticket"
+        with self._lock:
+            current = self._current
+        last_error = None
+        for i in list(range(current, len(self._base_urls))) + list(range(current)):
+            try:
+                response = http.request(method, f"{self._base_urls[i]}/{path}", verify=self._verify_ssl,
+                                        timeout=self._timeout, **kwargs)
+            except RequestsConnectionError as e:
+                if not repeatable and not _nothing_sent(e):
+                    raise
+                last_error = e
+            except Timeout as e:
+                if not repeatable:
+                    raise
+                last_error = e
+            else:
+                with self._lock:
+                    self._current = i
+                return response
+        raise last_error
+
+    @staticmethod
+    def _base_url(host: str) -> str:
+        port = "" if ":" in host.rsplit("]", 1)[-1] else f":{DEFAULT_PORT}"
+        return f"https://{host}{port}/api2/json"
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def _valid(self, created: float) -> bool:
+        return time.monotonic() - created < self.TICKET_LIFETIME - self._expiry_margin
+
+    @staticmethod
+    def _key(userid: str, password: str) -> Tuple[str, str]:
+        # Passwords are never kept, only their hashes are used to tell sessions apart
+        return userid, hashlib.sha256(password.encode("utf-8")).hexdigest()
@@ -0,0 +1,173 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Tuple, Union
+import gzip
+import json
+import time
+
+# Keys whose values are not written to recordings: passwords in requests, tickets in responses
+REDACTED_KEYS = frozenset({"password", "new_password", "oldpassword", "ticket", "CSRFPreventionToken"})
+REDACTED = "***"
+
+
+def redact(value: Any, keys: Iterable[str] = REDACTED_KEYS) -> Any:
+    """
+    Replace secrets in request data or response
+    :param value: JSON-like data
+    :param keys: Keys whose values are replaced (optional, default=REDACTED_KEYS)
+    :return: Copy of data with secrets replaced by REDACTED
+    """
+    if isinstance(value, dict):
+        # Secret of new API token is returned as "value" next to "full-tokenid"
+        secret = set(keys) | ({"value"} if "full-tokenid" in value else set())
+        return {key: REDACTED if key in secret else redact(item, keys) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item, keys) for item in value]
+    return value
+
+
+class Transport(ABC):
+    """
+    Interface of objects that execute API requests for APIWrapper (EndpointPool is the default one)
+    """
+
+    @abstractmethod
+    def request(self, method: str, path: Tuple[str, ...], data: Dict[str, Any]) -> Any:
+        """
+        Execute API request
+        :param method: HTTP method
+        :param path: Parts of API path, e.g. ("nodes", "node1", "qemu")
+        :param data: Query parameters or request body
+        :return: Response data
+        """
+
+
+class RecordingTransport(Transport):
+    """
+    Transport that passes requests to another transport and records responses with their timing. Passwords, tickets
+    and token secrets are redacted, so records can be saved safely.
+    """
+
+    def __init__(self, inner: Transport, filename: str = None, redact_keys: Iterable[str] = REDACTED_KEYS):
+        """
+        :param inner: Transport that executes requests (e.g. EndpointPool)
+        :param filename: File to which records are saved on close() (optional)
+        :param redact_keys: Keys whose values are not recorded (optional, default=REDACTED_KEYS)
+        """
+        self._inner = inner
+        self._filename = filename
+        self._redact_keys = frozenset(redact_keys)
+        self._records: List[Dict[str, Any]] = []
+        self._lock = Lock()
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        return list(self._records)
+
+    def request(self, method: str, path: Tuple[str, ...], data: Dict[str, Any]) -> Any:
+        from proxmoxer.core import ResourceException
+        record = {"m": method, "p": "/".join(path), "d": redact(dict(data), self._redact_keys)}
+        start = time.monotonic()
+        try:
+            result = self._inner.request(method, path, data)
+        except ResourceException as e:
+            record.update(t=round(time.monotonic() - start, 6),
+                          e={"s": e.status_code, "m": e.status_message, "c": e.content})
+            self._append(record)
+            raise
+        record.update(t=round(time.monotonic() - start, 6), r=redact(result, self._redact_keys))
+        self._append(record)
+        return result
+
+    def save(self, filename: str = None) -> None:
+        """
+        Save records to gzip-compressed file with one JSON record per line
+        :param filename: File name (optional, default=file name given on creation)
+        :return: None
+        """
+        filename = filename or self._filename
+        if filename is None:
+            raise ValueError("File name is required")
+        with self._lock:
+            records = list(self._records)
+        with gzip.open(filename, "wt", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        """
+        Save records if file name was given on creation
+        :return: None
+        """
+        if self._filename is not None:
+            self.save()
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ReplayTransport(Transport):
+    """
+    Transport that serves recorded responses without any network access. Responses to the same request are
+    returned in recorded order, the last one is repeated if request is made more times than it was recorded.
+    Redacted values are ignored when requests are matched.
+    """
+
+    def __init__(self, records: Union[str, List[Dict[str, Any]]], latency: bool = False, speed: float = 1.0,
+                 redact_keys: Iterable[str] = REDACTED_KEYS):
+        """
+        :param records: File saved by RecordingTransport or list of records
+        :param latency: Whether to sleep for recorded duration of each request (optional, default=False)
+        :param speed: How many times faster than recorded latency is replayed (optional, default=1.0)
+        :param redact_keys: Keys that were redacted when recording (optional, default=REDACTED_KEYS)
+        """
+        self._redact_keys = frozenset(redact_keys)
+        if isinstance(records, str):
+            with gzip.open(records, "rt", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        self._responses: Dict[Tuple[str, str, str], deque] = defaultdict(deque)
+        for record in records:
+            self._responses[self._key(record["m"], record["p"], record.get("d", {}))].append(record)
+        self._latency = latency
+        self._speed = speed
+        self._lock = Lock()
+        self.requests: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    @property
+    def request_count(self) -> int:
+        return len(self.requests)
+
+    def reset(self) -> None:
+        """
+        Forget requests made so far (recorded responses are kept)
+        :return: None
+        """
+        with self._lock:
+            self.requests.clear()
+
+    def request(self, method: str, path: Tuple[str, ...], data: Dict[str, Any]) -> Any:
+        key = self._key(method, "/".join(path), data)
+        with self._lock:
+            self.requests.append((method, "/".join(path), dict(data)))
+            queue = self._responses.get(key)
+            if not queue:
+                raise KeyError(f"No recorded response for {method} /{'/'.join(path)} {data}")
+            record = queue.popleft() if len(queue) > 1 else queue[0]
+        if self._latency and record.get("t"):
+            time.sleep(record["t"] / self._speed)
+        if "e" in record:
+            from proxmoxer.core import ResourceException
+            raise ResourceException(record["e"]["s"], record["e"]["m"], record["e"]["c"])
+        return record.get("r")
+
+    def _key(self, method: str, path: str, data: Dict[str, Any]) -> Tuple[str, str, str]:
+        return method.upper(), path.strip("/"), json.dumps(redact(data, self._redact_keys), sort_keys=True,
+                                                           default=str)
@@ -1,4 +1,5 @@
 from setuptools import setup, find_packages
+import re
 
 long_description_filename = "README.md"
 try:
@@ -9,12 +10,16 @@ except FileNotFoundError:
 except Exception:
     long_description = f"Failed to read {long_description_filename} because of unexpected error"
 
+# Version is only defined in package itself
+with open("proxmoxmanager/__init__.py", "r", encoding="utf-8") as f:
+    version = re.search(r'^__version__ = "([^"]+)"', f.read(), re.MULTILINE).group(1)
+
 setup(
     # Project name (e. g. pip install proxmoxmanager)
     name="proxmoxmanager",
 
     # Current version
-    version="1.0.4",
+    version=version,
 
     # Short description
     description="Smart Proxmox VE API wrapper for managing resources automatically",
@@ -43,6 +48,18 @@ setup(
         "requests"
     ],
 
+    # Optional dependencies (e.g. pip install proxmoxmanager[numpy])
+    extras_require={
+        "numpy": ["numpy"]
+    },
+
+    # Command-line scripts
+    entry_points={
+        "console_scripts": [
+            "proxmoxmanager=proxmoxmanager.cli:main"
+        ]
+    },
+
     # Metadata
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -0,0 +1,113 @@
+from proxmoxmanager.utils.classes.vms import ProxmoxVM, ProxmoxVMDict
+from proxmoxmanager.utils.classes.agent import iter_chunks
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+from proxmoxmanager.utils.api import APIWrapper
+import base64
+import io
+import unittest
+from unittest.mock import patch
+
+
+class TestAgent(unittest.TestCase):
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+    vm = ProxmoxVM(api, "100", "node1")
+
+    def setUp(self):
+        self.patcher = patch("proxmoxmanager.utils.classes.agent.time.sleep")
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_agent_exec(self):
+        with patch.object(APIWrapper, "agent_exec", return_value={"pid": 42}) as target_method:
+            self.assertEqual(42, self.vm.agent_exec("uname -a"))
+            target_method.assert_called_once_with(node="node1", vmid="100", command=["uname", "-a"])
+        with patch.object(APIWrapper, "get_agent_exec_status", return_value={"exited": 0}) as target_method:
+            self.assertEqual({"exited": 0}, self.vm.agent_exec_status(42))
+            target_method.assert_called_once_with(node="node1", vmid="100", pid="42")
+
+    def test_agent_run(self):
+        statuses = [{"exited": 0}, {"exited": 0}, {"exited": 1, "exitcode": 0, "out-data": "ok\n"}]
+        with patch.object(APIWrapper, "agent_exec", return_value={"pid": 42}) as target_method1, \
+                patch.object(APIWrapper, "get_agent_exec_status", side_effect=statuses) as target_method2:
+            self.assertEqual(statuses[2], self.vm.agent_run(["cat"], input_data="ok\n"))
+            target_method1.assert_called_once_with(node="node1", vmid="100", command=["cat"], **{"input-data": "ok\n"})
+            self.assertEqual(3, target_method2.call_count)
+        with patch.object(APIWrapper, "agent_exec", return_value={"pid": 42}), \
+                patch.object(APIWrapper, "get_agent_exec_status", return_value={"exited": 0}):
+            self.assertRaises(ProxmoxException, self.vm.agent_run, "sleep 100", timeout=0)
+
+    def test_iter_chunks(self):
+        self.assertEqual([b"abc", b"def", b"g"], list(iter_chunks("abcdefg", 3)))
+        self.assertEqual([b"abc", b"def", b"g"], list(iter_chunks(io.BytesIO(b"abcdefg"), 3)))
+        self.assertEqual([b"abc", b"def", b"g"], list(iter_chunks(iter([b"ab", b"cdef", b"g"]), 3)))
+        self.assertEqual([], list(iter_chunks(b"", 3)))
+
+    def test_file_write(self):
+        exec_status = {"exited": 1, "exitcode": 0}
+        with patch.object(APIWrapper, "agent_file_write") as target_method1, \
+                patch.object(APIWrapper, "agent_exec", return_value={"pid": 42}) as target_method2, \
+                patch.object(APIWrapper, "get_agent_exec_status", return_value=exec_status):
+            self.assertEqual(7, self.vm.file_write("/tmp/foo", io.BytesIO(b"abcdefg"), chunk_size=3))
+            target_method1.assert_called_once_with(node="node1", vmid="100", file="/tmp/foo",
+                                                   content=base64.b64encode(b"abc").decode(), encode="0")
+            self.assertEqual([base64.b64encode(b"def").decode(), base64.b64encode(b"g").decode()],
+                             [call.kwargs["input-data"] for call in target_method2.call_args_list])
+            self.assertEqual(["sh", "-c", 'base64 -d >> "$1"', "sh", "/tmp/foo"],
+                             target_method2.call_args.kwargs["command"])
+        self.assertRaises(ValueError, self.vm.file_write, "/tmp/foo", b"", chunk_size=1024 * 1024)
+
+    def test_file_read(self):
+        with patch.object(APIWrapper, "agent_file_read",
+                          return_value={"content": "abcd\xff", "bytes-read": 5}) as target_method1, \
+                patch.object(APIWrapper, "agent_exec") as target_method2:
+            self.assertEqual([b"abc", b"d\xff"], list(self.vm.file_read("/tmp/foo", chunk_size=3)))
+            target_method1.assert_called_once_with(node="node1", vmid="100", file="/tmp/foo")
+            target_method2.assert_not_called()
+
+    def test_file_read_truncated(self):
+        # Rest of file is read by exec, starting in the middle of the second chunk
+        statuses = [{"exited": 1, "exitcode": 0, "out-data": base64.encodebytes(b"def").decode()},
+                    {"exited": 1, "exitcode": 0, "out-data": base64.encodebytes(b"g").decode()}]
+        with patch.object(APIWrapper, "agent_file_read",
+                          return_value={"content": "abcde", "bytes-read": 5, "truncated": 1}), \
+                patch.object(APIWrapper, "agent_exec", return_value={"pid": 42}) as target_method, \
+                patch.object(APIWrapper, "get_agent_exec_status", side_effect=statuses):
+            self.assertEqual(b"abcdefg", b"".join(self.vm.file_read("/tmp/foo", chunk_size=3)))
+            self.assertEqual([["/tmp/foo", "3", "1"], ["/tmp/foo", "3", "2"]],
+                             [call.kwargs["command"][-3:] for call in target_method.call_args_list])
+        with patch.object(APIWrapper, "agent_file_read", return_value={"content": "abc", "truncated": 1}), \
+                patch.object(APIWrapper, "agent_exec", return_value={"pid": 42}), \
+                patch.object(APIWrapper, "get_agent_exec_status",
+                             return_value={"exited": 1, "exitcode": 1, "err-data": "Can't read /tmp/foo\n"}):
+            self.assertRaises(ProxmoxException, list, self.vm.file_read("/tmp/foo"))
+
+    def test_agent_exec_many(self):
+        resources = [{"type": "qemu", "vmid": 100, "node": "node1"}, {"type": "qemu", "vmid": 101, "node": "node2"},
+                     {"type": "qemu", "vmid": 102, "node": "node2"}]
+        statuses = {"100": {"exited": 1, "exitcode": 0, "out-data": "1.2.3\n"},
+                    "101": {"exited": 1, "exitcode": 1, "err-data": "not found\n"}}
+
+        def agent_exec(node, vmid, command):
+            if vmid == "102":
+                raise Exception("QEMU guest agent is not running")
+            return {"pid": vmid}
+
+        progress = []
+        with patch.object(APIWrapper, "list_resources", return_value=resources), \
+                patch.object(APIWrapper, "agent_exec", side_effect=agent_exec), \
+                patch.object(APIWrapper, "get_agent_exec_status", side_effect=lambda node, vmid, pid: statuses[pid]):
+            results = ProxmoxVMDict(self.api).agent_exec_many(
+                [100, 101, 102, 103], "dpkg-query -W openssl", progress=lambda *args: progress.append(args[2:]))
+        self.assertEqual({"node": "node1", "status": "ok", "exitcode": 0, "out": "1.2.3\n", "err": "",
+                          "error": None}, results["100"])
+        self.assertEqual(("error", 1, "not found\n"), (results["101"]["status"], results["101"]["exitcode"],
+                                                       results["101"]["err"]))
+        self.assertEqual("QEMU guest agent is not running", results["102"]["error"])
+        self.assertEqual("error", results["103"]["status"])
+        self.assertEqual([(1, 3), (2, 3), (3, 3)], progress)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+from proxmoxmanager.utils.classes.backups import BackupScheduler, backup_kwargs
+from proxmoxmanager.utils.classes.vms import ProxmoxVM
+from proxmoxmanager.utils.api import APIWrapper
+import unittest
+from unittest.mock import patch
+
+
+class TestBackupScheduler(unittest.TestCase):
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+    resources = [{"type": "qemu", "vmid": 100, "node": "node1", "maxdisk": 100},
+                 {"type": "qemu", "vmid": 101, "node": "node1", "maxdisk": 60},
+                 {"type": "lxc", "vmid": 102, "node": "node1", "maxdisk": 50},
+                 {"type": "qemu", "vmid": 103, "node": "node1", "maxdisk": 10},
+                 {"type": "qemu", "vmid": 104, "node": "node2", "maxdisk": 500},
+                 {"type": "storage", "id": "storage/node1/local", "node": "node1"}]
+
+    def upid(self, node, number):
+        return f"UPID:{node}:0000123{number}:00005678:6123ABCD:vzdump::root@pam:"
+
+    def test_backup_kwargs(self):
+        self.assertEqual({"mode": "stop", "compress": "zstd", "storage": "pbs", "notes-template": "{{guestname}}"},
+                         backup_kwargs(storage="pbs", mode="stop", notes="{{guestname}}"))
+        self.assertRaises(ValueError, backup_kwargs, mode="foo")
+
+    def test_vm_backup(self):
+        with patch.object(APIWrapper, "create_backup", return_value="TASKID") as target_method:
+            self.assertEqual("TASKID", ProxmoxVM(self.api, "100", "node1").backup(storage="pbs"))
+            target_method.assert_called_once_with(node="node1", vmid="100", mode="snapshot", compress="zstd",
+                                                  storage="pbs")
+
+    def test_plan(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources) as target_method:
+            jobs = BackupScheduler(self.api, storage="pbs", batch_size=2).plan()
+            target_method.assert_called_once_with(type="vm")
+        # Batches of node1 have similar sizes and the largest job is started first
+        self.assertEqual([{"node": "node2", "storage": "pbs", "vmids": ["104"], "size": 500},
+                          {"node": "node1", "storage": "pbs", "vmids": ["100", "103"], "size": 110},
+                          {"node": "node1", "storage": "pbs", "vmids": ["101", "102"], "size": 110}], jobs)
+
+    def test_plan_per_node_storage(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources):
+            jobs = BackupScheduler(self.api, storage={"node1": "nfs"}).plan(["100", 104])
+        self.assertEqual([("node2", None, ["104"]), ("node1", "nfs", ["100"])],
+                         [(job["node"], job["storage"], job["vmids"]) for job in jobs])
+
+    def test_run(self):
+        started = []
+        finished = []
+
+        def create_backup(node, vmid, **kwargs):
+            started.append(vmid)
+            return self.upid(node, len(started))
+
+        def get_task_status(node, upid):
+            return {"status": "stopped", "exitstatus": "OK" if upid != self.upid("node1", 3) else "job errors"}
+
+        logs = [{"n": 1, "t": "INFO: Starting Backup of VM 101 (qemu)"},
+                {"n": 2, "t": "ERROR: Backup of VM 102 failed - no space left on device"}]
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources), \
+                patch.object(APIWrapper, "create_backup", side_effect=create_backup), \
+                patch.object(APIWrapper, "list_tasks", return_value=[]), \
+                patch.object(APIWrapper, "get_task_status", side_effect=get_task_status), \
+                patch.object(APIWrapper, "get_task_logs", return_value=logs):
+            scheduler = BackupScheduler(self.api, storage="pbs", max_per_storage=1, batch_size=2, interval=0)
+            results = scheduler.run([100, 101, 102, 103, 104, 999],
+                                    progress=lambda job, done, total: finished.append((done, total)))
+        # Only one task writes to storage at a time, so jobs are started one by one
+        self.assertEqual(["104", "100,103", "101,102"], started)
+        self.assertEqual([(1, 3), (2, 3), (3, 3)], finished)
+        self.assertEqual("ok", results["104"]["status"])
+        self.assertEqual("ok", results["101"]["status"])
+        self.assertEqual({"node": "node1", "task": self.upid("node1", 3), "status": "error",
+                          "error": "no space left on device"}, results["102"])
+        self.assertEqual("Guest 999 not found", results["999"]["error"])
+
+    def test_run_timeout(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources), \
+                patch.object(APIWrapper, "create_backup", return_value=self.upid("node2", 1)), \
+                patch.object(APIWrapper, "list_tasks", return_value=[{"upid": self.upid("node2", 1)}]):
+            results = BackupScheduler(self.api, storage="pbs", max_per_storage=1, interval=0).run(timeout=0)
+        self.assertEqual("running", results["104"]["status"])
+        self.assertEqual("Backup was not started before timeout", results["100"]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
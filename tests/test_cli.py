@@ -0,0 +1,123 @@
+from proxmoxmanager import __version__
+from proxmoxmanager.cli import main, parse_ids, select_guests
+from proxmoxmanager.main import ProxmoxManager
+from proxmoxmanager.utils.api import APIWrapper
+from io import StringIO
+import contextlib
+import json
+import unittest
+from unittest.mock import patch
+
+
+class TestCLI(unittest.TestCase):
+    proxmox_manager = ProxmoxManager("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+    resources = [
+        {"id": "qemu/100", "type": "qemu", "vmid": 100, "node": "node1", "name": "web-1", "status": "running"},
+        {"id": "qemu/101", "type": "qemu", "vmid": 101, "node": "node2", "name": "web-2", "status": "stopped"},
+        {"id": "lxc/102", "type": "lxc", "vmid": 102, "node": "node1", "name": "db-1", "status": "stopped"},
+        {"id": "qemu/900", "type": "qemu", "vmid": 900, "node": "node1", "name": "tpl", "status": "stopped",
+         "template": 1},
+    ]
+
+    def run_cli(self, *argv):
+        out = StringIO()
+        code = main(list(argv), manager=self.proxmox_manager, out=out)
+        return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_parse_ids(self):
+        self.assertEqual(["100", "105", "106", "107", "110"], parse_ids(["100", "105-107,110", "100"]))
+        self.assertRaises(ValueError, parse_ids, ["10a"])
+        self.assertRaises(ValueError, parse_ids, ["110-100"])
+
+    def test_select_guests(self):
+        self.assertEqual([100, 101], [el["vmid"] for el in select_guests(self.resources, name="web-*")])
+        self.assertEqual([102], [el["vmid"] for el in select_guests(self.resources, node="node1",
+                                                                     status="stopped")])
+        self.assertEqual([900], [el["vmid"] for el in select_guests(self.resources, ids=["900"], templates=True)])
+        self.assertEqual([], select_guests(self.resources, ids=["900"]))
+
+    def test_inventory(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources) as target_method:
+            code, lines = self.run_cli("inventory", "--type", "qemu")
+            target_method.assert_called_once_with(type="vm")
+        self.assertEqual(0, code)
+        self.assertEqual(["qemu/100", "qemu/101"], [el["id"] for el in lines])
+
+    def test_start(self):
+        upid = "UPID:node2:00001234:00005678:6123ABCD:qmstart:101:root@pam:"
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources), \
+                patch.object(APIWrapper, "start_vm", return_value=upid) as target_method, \
+                patch.object(APIWrapper, "list_tasks", return_value=[]), \
+                patch.object(APIWrapper, "get_task_status", return_value={"status": "stopped", "exitstatus": "OK"}):
+            code, lines = self.run_cli("start", "100-101", "--parallel", "2")
+            target_method.assert_called_once_with(node="node2", vmid="101")
+        self.assertEqual(0, code)
+        results = {el["id"]: el for el in lines}
+        self.assertEqual("unchanged", results["100"]["status"])
+        self.assertEqual({"id": "101", "type": "qemu", "node": "node2", "task": upid, "status": "ok",
+                          "error": None}, results["101"])
+
+    def test_stop_error(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources), \
+                patch.object(APIWrapper, "stop_vm", side_effect=Exception("foo")):
+            code, lines = self.run_cli("stop", "--name", "web-1", "--no-wait")
+        self.assertEqual(1, code)
+        self.assertEqual([("100", "error", "foo")], [(el["id"], el["status"], el["error"]) for el in lines])
+
+    def test_action_requires_selection(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources), \
+                patch.object(APIWrapper, "delete_vm") as target_method, \
+                contextlib.redirect_stderr(StringIO()):
+            self.assertRaises(SystemExit, self.run_cli, "delete")
+            target_method.assert_not_called()
+
+    def test_clone(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources), \
+                patch.object(APIWrapper, "clone_vm", return_value=True) as target_method:
+            code, lines = self.run_cli("clone", "900", "--newid", "200-201", "--name-prefix", "web-")
+        self.assertEqual(0, code)
+        self.assertEqual(["200", "201"], sorted(el["id"] for el in lines))
+        target_method.assert_any_call(newid="201", node="node1", vmid="900", full="1", name="web-201")
+
+    def test_clone_auto_storage(self):
+        storages = [{"type": "storage", "storage": "local-lvm", "node": "node1", "content": "images", "shared": 0,
+                     "disk": 0, "maxdisk": 100},
+                    {"type": "storage", "storage": "ceph", "node": "node1", "content": "images", "shared": 1,
+                     "disk": 0, "maxdisk": 1000}]
+        with patch.object(APIWrapper, "list_resources",
+                          side_effect=lambda type: self.resources if type == "vm" else storages) as target_method1, \
+                patch.object(APIWrapper, "clone_vm", return_value=True) as target_method2:
+            self.run_cli("clone", "900", "--newid", "200-203", "--storage", "auto")
+            # Storage is chosen once for all clones
+            self.assertEqual(2, target_method1.call_count)
+        self.assertEqual({"ceph"}, {call.kwargs["storage"] for call in target_method2.call_args_list})
+
+    def test_permission(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.resources), \
+                patch.object(APIWrapper, "update_access_control_list") as target_method:
+            code, lines = self.run_cli("permission", "add", "102", "--user", "alice", "--role", "PVEVMUser")
+            target_method.assert_called_once_with(path="/vms/102", roles="PVEVMUser", users="alice@pve", delete="0",
+                                                  propagate="0")
+        self.assertEqual(0, code)
+        self.assertEqual("ok", lines[0]["status"])
+
+    def test_user_delete(self):
+        with patch.object(APIWrapper, "list_users") as target_method1, \
+                patch.object(APIWrapper, "delete_user") as target_method2:
+            code, lines = self.run_cli("user", "delete", "alice", "bob@ldap")
+            target_method1.assert_not_called()
+            self.assertEqual(["alice@pve", "bob@ldap"],
+                             sorted(call.kwargs["userid"] for call in target_method2.call_args_list))
+        self.assertEqual(0, code)
+        self.assertEqual(["ok", "ok"], [el["status"] for el in lines])
+
+    def test_version(self):
+        out = StringIO()
+        with contextlib.redirect_stdout(out), self.assertRaises(SystemExit) as context:
+            main(["--version"], manager=self.proxmox_manager)
+        self.assertEqual(0, context.exception.code)
+        self.assertEqual(__version__, out.getvalue().strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
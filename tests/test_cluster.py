@@ -0,0 +1,100 @@
+from proxmoxmanager.main import ProxmoxManager
+from proxmoxmanager.utils.classes.cluster import ProxmoxClusterSnapshot
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+from proxmoxmanager.utils.api import APIWrapper
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+RESOURCES = [
+    {"type": "node", "node": "node1", "status": "online", "mem": 4, "maxmem": 16},
+    {"type": "node", "node": "node2", "status": "offline"},
+    {"type": "qemu", "vmid": 100, "node": "node1", "status": "running"},
+    {"type": "lxc", "vmid": 101, "node": "node1", "status": "stopped"},
+    {"type": "qemu", "vmid": 9000, "node": "node2", "status": "stopped", "template": 1},
+    {"type": "storage", "storage": "ceph", "node": "node1", "shared": 1, "disk": 10, "maxdisk": 100},
+    {"type": "storage", "storage": "ceph", "node": "node2", "shared": 1, "disk": 10, "maxdisk": 100},
+    {"type": "storage", "storage": "local", "node": "node1", "shared": 0, "disk": 1, "maxdisk": 10},
+]
+USERS = [{"userid": "alice@pve", "groups": "admins,devs"}, {"userid": "bob@pam"}]
+ACL = [{"path": "/", "type": "group", "ugid": "admins", "roleid": "Administrator", "propagate": 1},
+       {"path": "/vms/100", "type": "user", "ugid": "bob@pam", "roleid": "PVEVMUser", "propagate": 0}]
+ROLES = [{"roleid": "PVEVMUser", "privs": "VM.Console,VM.Audit,VM.PowerMgmt"}]
+
+
+class TestProxmoxClusterSnapshot(unittest.TestCase):
+    proxmox_manager = ProxmoxManager("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+
+    def take(self):
+        with patch.object(APIWrapper, "list_resources", return_value=RESOURCES) as target_method1, \
+                patch.object(APIWrapper, "list_users", return_value=USERS) as target_method2, \
+                patch.object(APIWrapper, "get_access_control_list", return_value=ACL) as target_method3, \
+                patch.object(APIWrapper, "list_roles", return_value=ROLES) as target_method4:
+            snapshot = self.proxmox_manager.snapshot()
+            target_method1.assert_called_once_with()
+            target_method2.assert_called_once_with(full="1")
+            target_method3.assert_called_once_with()
+            target_method4.assert_called_once_with()
+        return snapshot
+
+    def test_take(self):
+        snapshot = self.take()
+        self.assertEqual(["node1", "node2"], sorted(snapshot.nodes.keys()))
+        self.assertEqual(["100", "9000"], list(snapshot.vms.keys()))
+        self.assertEqual(["101"], list(snapshot.containers.keys()))
+        self.assertEqual(["100", "101"], [str(el["vmid"]) for el in snapshot.guests_on("node1")])
+        self.assertEqual({"ceph", "node1/local"}, set(snapshot.storages.keys()))
+        self.assertEqual(("VM.Audit", "VM.Console", "VM.PowerMgmt"), snapshot.roles["PVEVMUser"])
+        self.assertEqual(["admins", "devs"], snapshot.groups_of("alice@pve"))
+        self.assertEqual(["Administrator"], [el["roleid"] for el in snapshot.acl_for("alice@pve")])
+        self.assertEqual(["PVEVMUser"], [el["roleid"] for el in snapshot.acl_for("bob@pam")])
+
+    def test_read_only(self):
+        snapshot = self.take()
+        with self.assertRaises(TypeError):
+            snapshot.nodes["node1"]["mem"] = 0
+        with self.assertRaises(TypeError):
+            snapshot.guests["100"]["status"] = "stopped"
+        with self.assertRaises(TypeError):
+            snapshot.users["alice@pve"]["groups"] = ""
+        with self.assertRaises(TypeError):
+            snapshot.nodes["node3"] = {}
+        with self.assertRaises(AttributeError):
+            snapshot.roles["PVEVMUser"].append("Sys.Modify")
+        # Changing copies of items doesn't change snapshot
+        node = dict(snapshot.nodes["node1"])
+        node["mem"] = 0
+        snapshot.acl_for("alice@pve").clear()
+        self.assertEqual(self.take().to_dict()["resources"], snapshot.to_dict()["resources"])
+        self.assertEqual(["Administrator"], [el["roleid"] for el in snapshot.acl_for("alice@pve")])
+        self.assertEqual(self.take().summary()["mem"], snapshot.summary()["mem"])
+
+    def test_summary(self):
+        summary = self.take().summary()
+        self.assertEqual((2, 1, 2, 1, 1, 1, 2), (summary["nodes"], summary["nodes_online"], summary["vms"],
+                                                 summary["containers"], summary["running"], summary["templates"],
+                                                 summary["users"]))
+        self.assertEqual((4, 16, 11, 110), (summary["mem"], summary["maxmem"], summary["storage_used"],
+                                            summary["storage_total"]))
+
+    def test_take_error(self):
+        with patch.object(APIWrapper, "list_resources", return_value=RESOURCES), \
+                patch.object(APIWrapper, "list_users", side_effect=Exception("foo")), \
+                patch.object(APIWrapper, "get_access_control_list", return_value=ACL), \
+                patch.object(APIWrapper, "list_roles", return_value=ROLES):
+            self.assertRaises(ProxmoxException, self.proxmox_manager.snapshot)
+
+    def test_save_load(self):
+        snapshot = self.take()
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("cluster.json", "cluster.json.gz"):
+                filename = os.path.join(directory, name)
+                snapshot.save(filename)
+                loaded = ProxmoxClusterSnapshot.load(filename)
+                self.assertEqual(snapshot.to_dict(), loaded.to_dict())
+                self.assertEqual(snapshot.summary(), loaded.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+from proxmoxmanager.utils.classes.configs import ProxmoxConfig, ProxmoxVMConfig, ProxmoxContainerConfig, \
+    is_config_conflict
+from proxmoxer.core import ResourceException
+import unittest
+
+
+class TestProxmoxVMConfig(unittest.TestCase):
+    RAW_CONFIG = {"cores": 2, "memory": 2048, "digest": "abc",
+                  "net0": "virtio=AA:BB:CC:DD:EE:FF,bridge=vmbr0,firewall=1",
+                  "scsi0": "local-lvm:vm-100-disk-0,size=32G", "agent": "1"}
+
+    def setUp(self):
+        self.config = ProxmoxVMConfig(self.RAW_CONFIG)
+
+    def test_digest(self):
+        self.assertEqual("abc", self.config.digest)
+
+    def test_parsed(self):
+        self.assertEqual({"virtio": "AA:BB:CC:DD:EE:FF", "bridge": "vmbr0", "firewall": "1"},
+                         self.config.parsed("net0"))
+        self.assertEqual({"enabled": "1"}, self.config.parsed("agent"))
+
+    def test_disks(self):
+        self.assertEqual({"scsi0": {"file": "local-lvm:vm-100-disk-0", "size": "32G"}}, self.config.disks)
+
+    def test_networks(self):
+        self.assertEqual(["net0"], list(self.config.networks.keys()))
+
+    def test_diff(self):
+        other = dict(self.RAW_CONFIG, memory="4096", digest="def", cpu="host")
+        del other["agent"]
+        self.assertEqual({"memory": (2048, "4096"), "cpu": (None, "host"), "agent": ("1", None)},
+                         self.config.diff(other))
+
+    def test_diff_equal(self):
+        self.assertEqual({}, self.config.diff(ProxmoxVMConfig(dict(self.RAW_CONFIG, cores="2"))))
+        self.assertEqual(self.config, ProxmoxVMConfig(self.RAW_CONFIG))
+
+    def test_diff_packed(self):
+        # Order of properties in comma-packed values doesn't matter
+        other = dict(self.RAW_CONFIG, net0="bridge=vmbr0,firewall=1,virtio=AA:BB:CC:DD:EE:FF",
+                     scsi0="size=32G,file=local-lvm:vm-100-disk-0")
+        self.assertEqual({}, self.config.diff(other))
+        self.assertEqual({}, self.config.changes({"net0": {"bridge": "vmbr0", "firewall": "1",
+                                                           "virtio": "AA:BB:CC:DD:EE:FF"}}))
+        self.assertEqual({"net0": "bridge=vmbr0,virtio=AA:BB:CC:DD:EE:FF"},
+                         self.config.changes({"net0": "bridge=vmbr0,virtio=AA:BB:CC:DD:EE:FF"}))
+        # Values of other keys are still compared as strings
+        self.assertEqual({"description": ("a,b", "b,a")},
+                         ProxmoxVMConfig({"description": "a,b"}).diff({"description": "b,a"}))
+
+    def test_eq(self):
+        self.assertEqual(self.config, dict(self.RAW_CONFIG))
+        self.assertNotEqual(self.config, "foo")
+        self.assertNotEqual(self.config, None)
+        self.assertRaises(TypeError, hash, self.config)
+
+    def test_changes(self):
+        values = {"cores": "2", "memory": 4096, "agent": None, "balloon": None,
+                  "net0": {"virtio": "AA:BB:CC:DD:EE:FF", "bridge": "vmbr1"}}
+        self.assertEqual({"memory": 4096, "agent": None, "net0": "virtio=AA:BB:CC:DD:EE:FF,bridge=vmbr1"},
+                         self.config.changes(values))
+
+    def test_pack_value(self):
+        self.assertEqual("local-lvm:vm-100-disk-0,size=32G",
+                         ProxmoxConfig.pack_value({"size": "32G", "file": "local-lvm:vm-100-disk-0"}, "file"))
+
+
+class TestProxmoxContainerConfig(unittest.TestCase):
+    RAW_CONFIG = {"hostname": "foo", "rootfs": "local-lvm:vm-100-disk-0,size=8G",
+                  "mp0": "local-lvm:vm-100-disk-1,mp=/data,size=16G", "features": "nesting=1"}
+
+    def setUp(self):
+        self.config = ProxmoxContainerConfig(self.RAW_CONFIG)
+
+    def test_mount_points(self):
+        self.assertEqual({"mp0": {"volume": "local-lvm:vm-100-disk-1", "mp": "/data", "size": "16G"}},
+                         self.config.mount_points)
+
+    def test_disks(self):
+        self.assertEqual(["rootfs", "mp0"], list(self.config.disks.keys()))
+
+    def test_is_packed(self):
+        self.assertTrue(self.config.is_packed("features"))
+        self.assertFalse(self.config.is_packed("hostname"))
+
+
+class TestIsConfigConflict(unittest.TestCase):
+    MESSAGE = "detected modified configuration - file changed by other user? Try again."
+
+    def test_conflict(self):
+        self.assertTrue(is_config_conflict(ResourceException(500, "Internal Server Error", self.MESSAGE)))
+
+    def test_not_conflict(self):
+        # Other errors mentioning digest or modified configuration are not retried
+        self.assertFalse(is_config_conflict(ResourceException(400, "Parameter verification failed",
+                                                              "digest: value does not match the regex pattern")))
+        self.assertFalse(is_config_conflict(ResourceException(500, "Internal Server Error",
+                                                              "can't apply modified configuration while VM is locked")))
+        # Same message with another status code or without one
+        self.assertFalse(is_config_conflict(ResourceException(400, "Bad Request", self.MESSAGE)))
+        self.assertFalse(is_config_conflict(Exception(self.MESSAGE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
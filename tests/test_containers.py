@@ -1,4 +1,5 @@
 from proxmoxmanager.utils.classes.containers import ProxmoxContainer, ProxmoxContainerDict
+from proxmoxmanager.utils.classes.tasks import ProxmoxTask
 from proxmoxmanager.utils.api import APIWrapper
 import unittest
 from unittest.mock import patch
@@ -28,6 +29,21 @@ class TestProxmoxContainer(unittest.TestCase):
             self.assertEqual(return_value, self.container.get_config())
             target_method.assert_called_once_with(vmid=self.VMID, node=self.NODE_NAME)
 
+    def test_set_config(self):
+        return_value = {"cores": 2, "memory": 1024, "digest": "abc"}
+        with patch.object(APIWrapper, "get_container_config", return_value=return_value) as target_method1, \
+                patch.object(APIWrapper, "update_container_config") as target_method2:
+            self.container.set_config({"cores": "2", "memory": 2048, "description": None, "swap": None})
+            target_method1.assert_called_once_with(vmid=self.VMID, node=self.NODE_NAME)
+            target_method2.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID, memory=2048, digest="abc")
+
+    def test_set_config_no_changes(self):
+        return_value = {"cores": 2, "memory": 1024, "digest": "abc"}
+        with patch.object(APIWrapper, "get_container_config", return_value=return_value), \
+                patch.object(APIWrapper, "update_container_config") as target_method:
+            self.container.set_config({"cores": 2})
+            target_method.assert_not_called()
+
     def test_running_true(self):
         return_value = {"status": "running", "maxdisk": 1000000, "maxmem": 100000}
         with patch.object(APIWrapper, "get_container_status", return_value=return_value) as target_method:
@@ -70,6 +86,13 @@ class TestProxmoxContainer(unittest.TestCase):
         self.assertRaises(ValueError, self.container.clone, newid=1_000_000_000)
         self.assertRaises(ValueError, self.container.clone, newid="1000000000")
 
+    def test_migrate(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "migrate_container", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.container.migrate("other_node_name", restart=False, bwlimit=1024))
+            target_method.assert_called_once_with(target="other_node_name", node=self.NODE_NAME, vmid=self.VMID,
+                                                  restart="0", bwlimit="1024")
+
     def test_delete(self):
         return_value = "TASKID"
         with patch.object(APIWrapper, "delete_container", return_value=return_value) as target_method:
@@ -112,6 +135,52 @@ class TestProxmoxContainer(unittest.TestCase):
             self.assertEqual(self.container.resume(), return_value)
             target_method.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID)
 
+    def test_list_snapshots(self):
+        return_value = [{"name": "before-upgrade", "snaptime": 1650000000},
+                        {"name": "current", "parent": "before-upgrade"}]
+        with patch.object(APIWrapper, "list_container_snapshots", return_value=return_value) as target_method:
+            self.assertEqual([{"name": "before-upgrade", "snaptime": 1650000000}], self.container.list_snapshots())
+            target_method.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID)
+
+    def test_snapshot(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "create_container_snapshot", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.container.snapshot("before-upgrade", description="foo"))
+            target_method.assert_called_once_with(snapname="before-upgrade", node=self.NODE_NAME, vmid=self.VMID,
+                                                  description="foo")
+
+    def test_snapshot_invalid_name(self):
+        for name in ("1st", "current", "with space", "x"):
+            self.assertRaises(ValueError, self.container.snapshot, name)
+
+    def test_rollback(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "rollback_container_snapshot", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.container.rollback("before-upgrade", start=True))
+            target_method.assert_called_once_with(snapname="before-upgrade", node=self.NODE_NAME, vmid=self.VMID,
+                                                  start="1")
+
+    def test_delete_snapshot(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "delete_container_snapshot", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.container.delete_snapshot("before-upgrade"))
+            target_method.assert_called_once_with(snapname="before-upgrade", node=self.NODE_NAME, vmid=self.VMID)
+
+    def test_apply_config(self):
+        pending = [{"key": "cores", "value": 1, "pending": 2}, {"key": "memory", "value": 1024},
+                   {"key": "mp0", "value": "local:1/vm-100-disk-1.raw,mp=/data", "delete": 1},
+                   {"key": "swap", "value": 512, "pending": 1024}]
+        with patch.object(APIWrapper, "get_container_config", return_value={"cores": 1, "digest": "abc"}), \
+                patch.object(APIWrapper, "update_container_config") as target_method1, \
+                patch.object(APIWrapper, "get_container_pending", return_value=pending) as target_method2:
+            self.assertEqual({"changed": True, "restart_required": ["cores", "mp0"]},
+                             self.container.apply_config({"cores": 2, "memory": 1024, "mp0": None}))
+            target_method1.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID, cores=2, memory=1024,
+                                                   digest="abc")
+            target_method2.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID)
+            self.assertEqual({"changed": False, "restart_required": []}, self.container.apply_config({"cores": 1}))
+            target_method2.assert_called_once()
+
     def test_view_permissions(self):
         return_value = [{"ugid": "foo@pve", "roleid": "Role1", "path": "/vms/100", "type": "user"},
                         {"ugid": "bar@pve", "roleid": "Role2", "path": "/vms/100", "type": "user"}]
@@ -126,7 +195,7 @@ class TestProxmoxContainer(unittest.TestCase):
 
     def test_view_permissions_other_data(self):
         return_value = [{"ugid": "foo@pve", "roleid": "Role", "path": "/vms/101", "type": "user"},
-                        {"ugid": "root@pam", "roleid": "Role", "path": "/vms/100", "type": "user"},
+                        {"ugid": "root@pam", "roleid": "Role", "path": "/vms/101", "type": "user"},
                         {"ugid": "token1", "roleid": "Role", "path": "/vms/100", "type": "token"},
                         {"ugid": "foo@pve", "roleid": "Role", "path": "/vms", "type": "user"},
                         {"ugid": "foo@pve", "roleid": "Role", "path": "/nodes/100", "type": "user"}]
@@ -134,6 +203,15 @@ class TestProxmoxContainer(unittest.TestCase):
             self.assertEqual([], self.container.view_permissions())
             target_method.assert_called_once_with()
 
+    def test_view_permissions_other_realms(self):
+        return_value = [{"ugid": "root@pam", "roleid": "Role1", "path": "/vms/100", "type": "user"},
+                        {"ugid": "foo@ldap", "roleid": "Role2", "path": "/vms/100", "type": "user"}]
+        with patch.object(APIWrapper, "get_access_control_list", return_value=return_value) as target_method:
+            perm = self.container.view_permissions()
+            self.assertEqual(["root@pam", "foo@ldap"], [user.fullid for user, role in perm])
+            self.assertEqual(["Role1", "Role2"], [role for user, role in perm])
+            target_method.assert_called_once_with()
+
     def test_add_permission(self):
         with patch.object(APIWrapper, "update_access_control_list") as target_method:
             self.container.add_permission(user="foo", role="Role")
@@ -155,8 +233,81 @@ class TestProxmoxContainer(unittest.TestCase):
             target_method1.assert_called_once_with()
             self.assertEqual(2, target_method2.call_count)
 
+    def test_remove_all_permissions_other_realms(self):
+        return_value = [{"ugid": "foo@ad", "roleid": "Role1", "path": "/vms/100", "type": "user"}]
+        with patch.object(APIWrapper, "get_access_control_list", return_value=return_value), \
+                patch.object(APIWrapper, "update_access_control_list") as target_method:
+            self.container.remove_all_permissions()
+            target_method.assert_called_once_with(path="/vms/" + self.VMID, roles="Role1", users="foo@ad", delete="1",
+                                                  propagate="0")
+
+
+class TestProxmoxContainerDict(unittest.TestCase):
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+    RESOURCES = [{"type": "lxc", "vmid": 100, "node": "node1", "status": "running"},
+                 {"type": "lxc", "vmid": 101, "node": "node1", "status": "running"},
+                 {"type": "lxc", "vmid": 102, "node": "node2", "status": "running"},
+                 {"type": "lxc", "vmid": 103, "node": "node2", "status": "stopped"}]
+
+    @staticmethod
+    def pending(node, vmid):
+        if vmid == "101":
+            return [{"key": "cores", "value": 1, "pending": 2}]
+        return [{"key": "memory", "value": 1024}]
+
+    UPID = "UPID:node1:00001234:00005678:6123ABCD:vzreboot:101:root@pam:"
+
+    def test_push_configs(self):
+        changes = {100: {"memory": 1024}, 101: {"cores": 2}, 102: {"cores": 1}, 103: {"memory": 1024},
+                   104: {"memory": 1024}}
+        progress = []
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES), \
+                patch.object(APIWrapper, "get_container_config", return_value={"memory": 512, "cores": 1}), \
+                patch.object(APIWrapper, "update_container_config") as target_method1, \
+                patch.object(APIWrapper, "get_container_pending", side_effect=self.pending) as target_method2, \
+                patch.object(APIWrapper, "reboot_container", return_value=self.UPID) as target_method3, \
+                patch.object(ProxmoxTask, "wait", return_value="OK"):
+            results = ProxmoxContainerDict(self.api).push_configs(
+                changes, restart=True, progress=lambda vmid, result, done, total: progress.append((done, total)))
+            self.assertEqual(3, target_method1.call_count)
+            # Pending changes are only checked for running containers that were changed
+            self.assertEqual(2, target_method2.call_count)
+            target_method3.assert_called_once_with(node="node1", vmid="101")
+        self.assertEqual({"node": "node1", "status": "ok", "restart_required": [], "restarted": True,
+                          "task": self.UPID, "error": None}, results["101"])
+        self.assertEqual(("ok", False), (results["100"]["status"], results["100"]["restarted"]))
+        self.assertEqual("unchanged", results["102"]["status"])
+        self.assertEqual("ok", results["103"]["status"])
+        self.assertEqual("error", results["104"]["status"])
+        self.assertEqual([(1, 4), (2, 4), (3, 4), (4, 4)], progress)
+
+    def test_push_configs_without_restart(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES), \
+                patch.object(APIWrapper, "get_container_config", return_value={"cores": 1}), \
+                patch.object(APIWrapper, "update_container_config"), \
+                patch.object(APIWrapper, "get_container_pending", side_effect=self.pending), \
+                patch.object(APIWrapper, "reboot_container") as target_method:
+            results = ProxmoxContainerDict(self.api).push_configs({101: {"cores": 2}})
+            target_method.assert_not_called()
+        self.assertEqual(["cores"], results["101"]["restart_required"])
+
+    def test_push_configs_stop_on_error(self):
+        def update(node, vmid, **kwargs):
+            if vmid == "100":
+                raise Exception("foo")
 
-# TODO: test ProxmoxContainerDict
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES), \
+                patch.object(APIWrapper, "get_container_config", return_value={"cores": 1}), \
+                patch.object(APIWrapper, "update_container_config", side_effect=update) as target_method1, \
+                patch.object(APIWrapper, "get_container_pending", side_effect=self.pending), \
+                patch.object(APIWrapper, "reboot_container") as target_method2:
+            results = ProxmoxContainerDict(self.api).push_configs({vmid: {"cores": 2} for vmid in range(100, 104)},
+                                                                  restart=True)
+            self.assertEqual(2, target_method1.call_count)
+            target_method2.assert_not_called()
+        self.assertEqual(["error", "ok", "skipped", "skipped"], [results[str(vmid)]["status"]
+                                                                 for vmid in range(100, 104)])
+        self.assertEqual(["cores"], results["101"]["restart_required"])
 
 
 if __name__ == "__main__":
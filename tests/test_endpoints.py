@@ -0,0 +1,145 @@
+from proxmoxmanager.utils.endpoints import EndpointPool, RoutedResource
+from proxmoxmanager.utils.api import APIWrapper
+from requests.exceptions import ConnectionError as RequestsConnectionError, ConnectTimeout, ReadTimeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+import unittest
+from unittest.mock import patch, MagicMock
+
+
+class FakeProxmoxAPI:
+    """
+    Imitates chained proxmoxer resource and records requests
+    """
+    def __init__(self, host, node=None, error=None, **kwargs):
+        self.host = host
+        self.node = node
+        self.error = error
+        self.requests = []
+        self.path = ()
+
+    def __call__(self, part):
+        resource = FakeProxmoxAPI.__new__(FakeProxmoxAPI)
+        resource.__dict__.update(self.__dict__)
+        resource.path = self.path + (part,)
+        return resource
+
+    def __getattr__(self, item):
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return self(item)
+
+    def _request(self, method, **data):
+        if self.error is not None:
+            raise self.error
+        self.requests.append((method, self.path, data))
+        if self.path == ("cluster", "status"):
+            return [{"type": "node", "name": self.node, "local": 1}]
+        return self.host
+
+    def get(self, **params):
+        return self._request("GET", **params)
+
+    def post(self, **data):
+        return self._request("POST", **data)
+
+    def delete(self, **params):
+        return self._request("DELETE", **params)
+
+
+def refused():
+    return RequestsConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "Connection refused")))
+
+
+class TestEndpointPool(unittest.TestCase):
+    def setUp(self):
+        self.apis = {}
+
+        def create_api(host, **kwargs):
+            self.apis[host] = FakeProxmoxAPI(host, node=host.split(".")[0])
+            return self.apis[host]
+
+        self.patcher = patch("proxmoxer.ProxmoxAPI", side_effect=create_api)
+        self.patcher.start()
+        self.pool = EndpointPool(["node1.example.com", "node2.example.com"], "root@pam", "TOKEN_NAME",
+                                 "SECRET_VALUE")
+        for endpoint in self.pool.endpoints:
+            endpoint.api
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_api_created_lazily(self):
+        pool = EndpointPool(["node3.example.com"], "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        self.assertNotIn("node3.example.com", self.apis)
+        pool.request("GET", ("nodes",), {})
+        self.assertIn("node3.example.com", self.apis)
+
+    def test_request(self):
+        self.assertEqual("node1.example.com", self.pool.request("GET", ("nodes",), {"foo": "bar"}))
+        self.assertIsNotNone(self.pool.endpoints[0].latency)
+
+    def test_failover(self):
+        self.apis["node1.example.com"].error = refused()
+        self.assertEqual("node2.example.com", self.pool.request("POST", ("nodes",), {}))
+        self.assertFalse(self.pool.endpoints[0].healthy)
+        # Failed endpoint is not tried first anymore
+        self.apis["node1.example.com"].error = None
+        self.assertEqual("node2.example.com", self.pool.request("GET", ("nodes",), {}))
+
+    def test_failover_connect_timeout(self):
+        self.apis["node1.example.com"].error = ConnectTimeout("timeout")
+        self.assertEqual("node2.example.com", self.pool.request("DELETE", ("nodes",), {}))
+
+    def test_dropped_connection_not_repeated_for_writes(self):
+        self.apis["node1.example.com"].error = RequestsConnectionError(
+            ProtocolError("Connection aborted.", ConnectionResetError()))
+        self.assertRaises(RequestsConnectionError, self.pool.request, "POST", ("nodes",), {})
+        self.assertEqual([], self.apis["node2.example.com"].requests)
+        self.assertFalse(self.pool.endpoints[0].healthy)
+        # Reads are still repeated
+        self.assertEqual("node2.example.com", self.pool.request("GET", ("nodes",), {}))
+
+    def test_all_failed(self):
+        for api in self.apis.values():
+            api.error = refused()
+        self.assertRaises(RequestsConnectionError, self.pool.request, "GET", ("nodes",), {})
+
+    def test_timeout_not_repeated_for_writes(self):
+        self.apis["node1.example.com"].error = ReadTimeout("timeout")
+        self.assertRaises(ReadTimeout, self.pool.request, "POST", ("nodes",), {})
+        self.assertEqual("node2.example.com", self.pool.request("GET", ("nodes",), {}))
+
+    def test_lowest_latency_first(self):
+        self.pool.endpoints[0].latency = 0.5
+        self.pool.endpoints[1].latency = 0.1
+        self.assertEqual("node2.example.com", self.pool.request("GET", ("nodes",), {}))
+
+    def test_probe(self):
+        self.apis["node2.example.com"].error = RequestsConnectionError("refused")
+        self.assertEqual({"node1.example.com": True, "node2.example.com": False}, self.pool.probe())
+        self.assertFalse(self.pool.endpoints[1].healthy)
+
+    def test_route_node_calls(self):
+        self.pool._route_node_calls = True
+        self.assertEqual("node2.example.com", self.pool.request("GET", ("nodes", "node2", "qemu"), {}))
+        self.assertEqual("node1.example.com", self.pool.request("GET", ("nodes", "node1", "qemu"), {}))
+        self.assertEqual({"node1.example.com": "node1", "node2.example.com": "node2"},
+                         {el.host: el.node for el in self.pool.endpoints})
+
+
+class TestRoutedResource(unittest.TestCase):
+    def test_path(self):
+        pool = MagicMock()
+        RoutedResource(pool).nodes("node1").qemu(100).config.put(cores=2)
+        pool.request.assert_called_once_with("PUT", ("nodes", "node1", "qemu", "100", "config"), {"cores": 2})
+
+    def test_api_wrapper(self):
+        api = APIWrapper(["node1.example.com", "node2.example.com"], "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        self.assertEqual("node1.example.com", api.host)
+        with patch.object(EndpointPool, "request", return_value=[]) as target_method:
+            api.list_vms(node="node1")
+            target_method.assert_called_once_with("GET", ("nodes", "node1", "qemu"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+from proxmoxmanager.federation import FederatedProxmoxManager, FederationError
+from proxmoxmanager.main import ProxmoxManager
+from proxmoxmanager.utils.api import APIWrapper
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+import unittest
+from unittest.mock import patch
+
+
+class TestFederatedProxmoxManager(unittest.TestCase):
+    RESOURCES = {
+        "example1.com:8006": [{"id": "node/node1", "type": "node", "node": "node1", "status": "online",
+                               "mem": 100, "maxmem": 1000},
+                              {"id": "qemu/100", "type": "qemu", "vmid": 100, "node": "node1"}],
+        "example2.com:8006": [{"id": "node/node1", "type": "node", "node": "node1", "status": "online",
+                               "mem": 100, "maxmem": 2000},
+                              {"id": "lxc/101", "type": "lxc", "vmid": 101, "node": "node1"}]
+    }
+
+    def setUp(self):
+        self.federation = FederatedProxmoxManager({
+            "cluster1": ProxmoxManager("example1.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE"),
+            "cluster2": {"host": "example2.com:8006", "user": "root@pam", "token_name": "TOKEN_NAME",
+                         "token_value": "SECRET_VALUE"},
+            "cluster3": ProxmoxManager("example3.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")})
+        resources = self.RESOURCES
+
+        def list_resources(api, type=None):
+            if api.host not in resources:
+                raise Exception("Connection refused")
+            return [el for el in resources[api.host] if type is None or
+                    el["type"] == type or (type == "vm" and el["type"] in ("qemu", "lxc"))]
+
+        self.patcher = patch.object(APIWrapper, "list_resources", autospec=True, side_effect=list_resources)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_bad_cluster_name(self):
+        self.assertRaises(ValueError, FederatedProxmoxManager, {"foo/bar": {}})
+        self.assertRaises(ValueError, FederatedProxmoxManager, {})
+
+    def test_inventory(self):
+        inventory = self.federation.inventory()
+        self.assertEqual(["cluster1/100", "cluster2/101"], sorted(inventory.keys()))
+        self.assertEqual("cluster2", inventory["cluster2/101"]["cluster"])
+        self.assertEqual(["cluster3"], list(inventory.errors.keys()))
+
+    def test_inventory_strict(self):
+        with self.assertRaises(FederationError) as context:
+            self.federation.inventory(strict=True)
+        self.assertEqual(["cluster3"], list(context.exception.errors.keys()))
+        self.assertEqual(["cluster1", "cluster2"], sorted(context.exception.results.keys()))
+
+    def test_map_errors_not_shared(self):
+        # Errors are returned with results of each call, so concurrent calls don't overwrite each other's errors
+        failed = self.federation.map(lambda manager: manager._api.list_resources())
+        succeeded = self.federation.map(lambda manager: manager._api.list_resources(), clusters=["cluster1"])
+        self.assertEqual(["cluster3"], list(failed.errors.keys()))
+        self.assertEqual({}, succeeded.errors)
+
+    def test_latency(self):
+        self.federation.nodes()
+        latency = self.federation.latency
+        self.assertEqual(1, latency["cluster1"]["calls"])
+        self.assertEqual(0, latency["cluster1"]["errors"])
+        self.assertEqual(1, latency["cluster3"]["errors"])
+
+    def test_guest(self):
+        guest = self.federation.guest("cluster2/101")
+        self.assertEqual("ProxmoxContainer", guest.__class__.__name__)
+        self.assertEqual("node1", guest.node.id)
+        self.assertRaises(KeyError, self.federation.guest, "cluster4/101")
+
+    def test_choose_by_most_free_ram(self):
+        cluster, node = self.federation.choose_by_most_free_ram()
+        self.assertEqual("cluster2", cluster)
+        self.assertEqual("node1", node.id)
+
+    def test_smallest_free_vmid(self):
+        self.assertRaises(ProxmoxException, self.federation.smallest_free_vmid)
+        del self.federation._managers["cluster3"]
+        self.assertEqual("102", self.federation.smallest_free_vmid())
+
+    def test_next_free_vmids(self):
+        with patch.object(APIWrapper, "get_next_vmid", return_value=200):
+            self.assertEqual({"cluster1": "200", "cluster2": "200", "cluster3": "200"},
+                             self.federation.next_free_vmids())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import subprocess
+import sys
+import unittest
+
+
+def run_python(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout.strip()
+
+
+def imported_modules(*args: str) -> set:
+    """
+    Names of modules imported by interpreter according to -X importtime, timings are ignored so result is stable
+    """
+    stderr = subprocess.run([sys.executable, "-X", "importtime", *args], check=True, capture_output=True,
+                            text=True).stderr
+    return {line.rsplit("|", 1)[1].strip() for line in stderr.splitlines()
+            if line.startswith("import time:") and line.count("|") == 2} - {"package"}
+
+
+class TestImports(unittest.TestCase):
+    def test_package_import_is_lightweight(self):
+        loaded = run_python("import sys, proxmoxmanager; "
+                            "print(sorted(m for m in ('proxmoxer', 'requests', 'proxmoxmanager.main') "
+                            "if m in sys.modules))")
+        self.assertEqual("[]", loaded)
+
+    def test_construction_does_not_connect(self):
+        loaded = run_python("import sys, proxmoxmanager; "
+                            "proxmoxmanager.ProxmoxManager('example.com:8006', 'root@pam', 'NAME', 'VALUE'); "
+                            "print('proxmoxer' in sys.modules)")
+        self.assertEqual("False", loaded)
+
+    def test_lazy_attributes(self):
+        import proxmoxmanager
+        import proxmoxmanager.utils
+        from proxmoxmanager.main import ProxmoxManager
+        from proxmoxmanager.utils.classes import ProxmoxVM
+        self.assertIs(ProxmoxManager, proxmoxmanager.ProxmoxManager)
+        self.assertIs(ProxmoxVM, proxmoxmanager.utils.ProxmoxVM)
+        self.assertIn("ProxmoxManager", dir(proxmoxmanager))
+        self.assertRaises(AttributeError, getattr, proxmoxmanager, "NoSuchClass")
+
+    def test_version(self):
+        import proxmoxmanager
+        self.assertRegex(proxmoxmanager.__version__, r"^\d+\.\d+\.\d+$")
+
+    def test_import_benchmark(self):
+        baseline = imported_modules("-c", "pass")
+        self.assertEqual({"proxmoxmanager"}, imported_modules("-c", "import proxmoxmanager") - baseline)
+        cli = imported_modules("-m", "proxmoxmanager.cli", "--version") - baseline
+        self.assertEqual(set(), {m for m in cli if m.startswith(("proxmoxmanager.", "proxmoxer", "requests"))})
+
+    def test_manager_import_benchmark(self):
+        loaded = imported_modules("-c", "import proxmoxmanager.main")
+        for module in ("proxmoxer", "requests", "numpy", "proxmoxmanager.utils.classes.planner",
+                       "proxmoxmanager.utils.classes.permissions", "proxmoxmanager.utils.classes.cluster"):
+            self.assertNotIn(module, loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+from proxmoxmanager.utils.classes.nodes import ProxmoxNodeDict
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+from proxmoxmanager.utils.api import APIWrapper
+import importlib.util
+import unittest
+from unittest.mock import patch
+
+GB = 1024 ** 3
+RESOURCES = [
+    {"type": "node", "node": "node1", "status": "online", "cpu": 0.5, "maxcpu": 8, "mem": 10 * GB,
+     "maxmem": 32 * GB, "disk": 10 * GB, "maxdisk": 100 * GB},
+    {"type": "node", "node": "node2", "status": "online", "cpu": 0.1, "maxcpu": 8, "mem": 4 * GB,
+     "maxmem": 16 * GB, "disk": 90 * GB, "maxdisk": 100 * GB},
+    {"type": "node", "node": "node3", "status": "offline", "maxmem": 64 * GB},
+    {"type": "qemu", "vmid": 100, "node": "node1"},
+    {"type": "qemu", "vmid": 101, "node": "node1"},
+    {"type": "lxc", "vmid": 102, "node": "node2"},
+]
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class TestProxmoxNodeTable(unittest.TestCase):
+    def setUp(self):
+        api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        with patch.object(APIWrapper, "list_resources", return_value=RESOURCES) as target_method:
+            self.table = ProxmoxNodeDict(api).get_table()
+            target_method.assert_called_once_with()
+
+    def test_columns(self):
+        self.assertEqual(["node1", "node2", "node3"], self.table.ids)
+        self.assertEqual([2, 1, 0], self.table.guests.tolist())
+        self.assertEqual([True, True, False], self.table.online.tolist())
+        self.assertEqual([22 * GB, 12 * GB, 64 * GB], self.table.free_mem.tolist())
+
+    def test_choose(self):
+        self.assertEqual("node1", self.table.choose())
+        self.assertEqual("node3", self.table.choose(online_only=False))
+        self.assertEqual("node2", self.table.choose("most_free_ram_fraction"))
+        self.assertEqual("node2", self.table.choose("least_cpu"))
+        self.assertEqual("node1", self.table.choose("most_free_disk"))
+        self.assertEqual("node2", self.table.choose(nodes=["node2", "foo"]))
+        self.assertRaises(ProxmoxException, self.table.choose, min_free_mem=100 * GB)
+        self.assertRaises(ValueError, self.table.choose, "foo")
+
+    def test_top_k(self):
+        self.assertEqual(["node3", "node1"], self.table.top_k(2, online_only=False))
+        self.assertEqual(["node2", "node1"], self.table.top_k(5, "fewest_guests"))
+        self.assertEqual(["node1"], self.table.top_k(5, min_free_disk=50 * GB))
+        self.assertEqual(["node2"], self.table.top_k(5, max_guests=1, policy=lambda table: table.cpu))
+        self.assertEqual([], self.table.top_k(0))
+
+    def test_place(self):
+        simulation = self.table.copy()
+        guests = [{"vmid": 200, "maxmem": 8 * GB}, {"vmid": 201, "maxmem": 16 * GB}, {"vmid": 202, "maxmem": 4 * GB}]
+        self.assertEqual({"201": "node1", "200": "node2", "202": "node1"}, simulation.place(guests))
+        self.assertEqual([30 * GB, 12 * GB], simulation.mem.tolist()[:2])
+        self.assertEqual([4, 2, 0], simulation.guests.tolist())
+        # Original table is not changed
+        self.assertEqual([2, 1, 0], self.table.guests.tolist())
+        self.assertRaises(ProxmoxException, simulation.place, [{"vmid": 203, "maxmem": 10 * GB}])
+        self.assertEqual({"node1": 4, "node2": 2, "node3": 0},
+                         {node: info["guests"] for node, info in simulation.to_dict().items()})
+
+    def test_reserve(self):
+        simulation = self.table.copy()
+        # Node can be overcommitted
+        simulation.reserve("node2", maxmem=20 * GB, maxdisk=GB)
+        self.assertEqual(-8 * GB, int(simulation.free_mem[1]))
+        self.assertEqual(91 * GB, int(simulation.disk[1]))
+        self.assertEqual([2, 2, 0], simulation.guests.tolist())
+        self.assertRaises(KeyError, simulation.reserve, "node4")
+
+
+if __name__ == "__main__":
+    unittest.main()
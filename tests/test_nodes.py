@@ -1,4 +1,6 @@
 from proxmoxmanager.utils.classes.nodes import ProxmoxNode, ProxmoxNodeDict
+from proxmoxmanager.utils.classes.tasks import ProxmoxTask
+from proxmoxmanager.utils.classes.errors import ProxmoxException
 from proxmoxmanager.utils.api import APIWrapper
 import unittest
 from unittest.mock import patch
@@ -29,6 +31,55 @@ class TestProxmoxNode(unittest.TestCase):
             self.assertEqual(return_value, self.node.get_status_report())
             target_method.assert_called_once_with(node=self.NODE_NAME)
 
+    RESOURCES = [{"type": "node", "node": "node_name", "status": "online", "mem": 100, "maxmem": 1000},
+                 {"type": "node", "node": "node1", "status": "online", "mem": 100, "maxmem": 1000},
+                 {"type": "node", "node": "node2", "status": "online", "mem": 400, "maxmem": 1000},
+                 {"type": "node", "node": "node3", "status": "offline"},
+                 {"type": "qemu", "node": "node_name", "vmid": 100, "maxmem": 500, "status": "running"},
+                 {"type": "lxc", "node": "node_name", "vmid": 101, "maxmem": 300, "status": "stopped"},
+                 {"type": "qemu", "node": "node1", "vmid": 102, "maxmem": 300, "status": "running"}]
+
+    def test_plan_drain_most_free_ram(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES) as target_method:
+            self.assertEqual({"100": "node1", "101": "node2"}, self.node.plan_drain())
+            target_method.assert_called_once_with()
+
+    def test_plan_drain_fewest_guests(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES):
+            self.assertEqual({"100": "node2", "101": "node1"}, self.node.plan_drain(target_policy="fewest_guests"))
+
+    def test_plan_drain_targets(self):
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES):
+            self.assertEqual({"100": "node2", "101": "node2"}, self.node.plan_drain(targets=["node2"]))
+            self.assertRaises(ProxmoxException, self.node.plan_drain, targets=["node3"])
+
+    def test_plan_drain_without_numpy(self):
+        with patch("proxmoxmanager.utils.classes.nodes._import_numpy", side_effect=ImportError), \
+                patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES):
+            self.assertEqual({"100": "node1", "101": "node2"}, self.node.plan_drain())
+            self.assertEqual({"100": "node2", "101": "node1"}, self.node.plan_drain(target_policy="fewest_guests"))
+            self.assertEqual({"100": "node2", "101": "node2"}, self.node.plan_drain(targets=["node2"]))
+            self.assertRaises(ValueError, self.node.plan_drain, target_policy="foo")
+
+    def test_drain(self):
+        upids = {"100": "UPID:node_name:1:1:1:qmigrate:100:root@pam:",
+                 "101": "UPID:node_name:2:2:2:vzmigrate:101:root@pam:"}
+        progress = []
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES), \
+                patch.object(APIWrapper, "migrate_vm", return_value=upids["100"]) as target_method1, \
+                patch.object(APIWrapper, "migrate_container", return_value=upids["101"]) as target_method2, \
+                patch.object(ProxmoxTask, "wait", side_effect=["OK", "migration aborted"]):
+            result = self.node.drain(max_parallel=1, bwlimit=1000,
+                                     progress=lambda vmid, res, done, total: progress.append((vmid, done, total)))
+            target_method1.assert_called_once_with(target="node1", node=self.NODE_NAME, vmid="100", online="1",
+                                                   bwlimit="1000")
+            target_method2.assert_called_once_with(target="node2", node=self.NODE_NAME, vmid="101", restart="0",
+                                                   bwlimit="1000")
+        self.assertEqual({"type": "qemu", "target": "node1", "task": upids["100"], "status": "ok", "error": None},
+                         result["100"])
+        self.assertEqual("error", result["101"]["status"])
+        self.assertEqual([("100", 1, 2), ("101", 2, 2)], progress)
+
     def test_repr(self):
         self.assertEqual(f"<ProxmoxNode: {self.NODE_NAME}>", repr(self.node))
 
@@ -53,7 +104,44 @@ class TestProxmoxNodeList(unittest.TestCase):
         self.assertEqual({"node1": ProxmoxNode(self.api, "node1"), "node2": ProxmoxNode(self.api, "node2")},
                          node_dict._nodes)
 
-    # TODO: write more tests
+    RESOURCES = [{"type": "node", "node": "node1", "status": "online", "mem": 600, "maxmem": 1000},
+                 {"type": "node", "node": "node2", "status": "online", "mem": 1000, "maxmem": 4000},
+                 {"type": "node", "node": "node3", "status": "offline"}]
+
+    def test_get_memory_info(self):
+        nodes = [ProxmoxNode(self.api, "node1"), ProxmoxNode(self.api, "node2"), ProxmoxNode(self.api, "node3")]
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES) as target_method1, \
+                patch.object(APIWrapper, "get_node_status",
+                             return_value={"memory": {"free": 100, "total": 400}}) as target_method2:
+            self.assertEqual([(nodes[0], 400.0, 0.4), (nodes[1], 3000.0, 0.75), (nodes[2], 100.0, 0.25)],
+                             ProxmoxNodeDict.get_memory_info(nodes))
+            target_method1.assert_called_once_with(type="node")
+            # Only node without memory in cluster resources is asked directly
+            target_method2.assert_called_once_with(node="node3")
+
+    def test_choose_by_most_free_ram(self):
+        node_dict = ProxmoxNodeDict(api=self.api)
+        with patch.object(APIWrapper, "list_resources", return_value=self.RESOURCES) as target_method:
+            self.assertEqual("node2", node_dict.choose_by_most_free_ram().id)
+            self.assertEqual("node2", node_dict.choose_by_most_free_ram(absolute=False).id)
+            node1 = ProxmoxNode(self.api, "node1")
+            self.assertIs(node1, node_dict.choose_by_most_free_ram(nodes=[node1]))
+            self.assertRaises(ProxmoxException, node_dict.choose_by_most_free_ram,
+                              nodes=[ProxmoxNode(self.api, "node3")])
+            target_method.assert_called_with(type="node")
+        self.mock_list_nodes.assert_not_called()
+
+    def test_choose_by_most_free_ram_without_numpy(self):
+        node_dict = ProxmoxNodeDict(api=self.api)
+        statuses = {"node1": {"memory": {"free": 400, "total": 1000}},
+                    "node2": {"memory": {"free": 300, "total": 400}}}
+        with patch("proxmoxmanager.utils.classes.nodes._import_numpy", side_effect=ImportError), \
+                patch.object(APIWrapper, "get_node_status", side_effect=lambda node: statuses[node]):
+            self.assertEqual("node1", node_dict.choose_by_most_free_ram(nodes=[ProxmoxNode(self.api, "node1"),
+                                                                               ProxmoxNode(self.api, "node2")]).id)
+            self.assertEqual("node2", node_dict.choose_by_most_free_ram(absolute=False,
+                                                                        nodes=[ProxmoxNode(self.api, "node1"),
+                                                                               ProxmoxNode(self.api, "node2")]).id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+from proxmoxmanager.utils.parallel import run_in_parallel, iter_in_parallel
+from threading import Lock
+import unittest
+import time
+
+
+class TestParallel(unittest.TestCase):
+    def test_run_in_parallel(self):
+        results = run_in_parallel(lambda x: x * 2, [1, 2, 3], concurrency=2)
+        self.assertEqual([(1, 2, None), (2, 4, None), (3, 6, None)], sorted(results))
+
+    def test_run_in_parallel_exception(self):
+        def func(x):
+            if x == 2:
+                raise ValueError("foo")
+            return x
+
+        results = {item: (result, exception) for item, result, exception in run_in_parallel(func, [1, 2, 3])}
+        self.assertEqual((1, None), results[1])
+        self.assertIsNone(results[2][0])
+        self.assertIsInstance(results[2][1], ValueError)
+
+    def test_run_in_parallel_empty(self):
+        self.assertEqual([], run_in_parallel(lambda x: x, []))
+
+    def test_run_in_parallel_bad_concurrency(self):
+        self.assertRaises(ValueError, run_in_parallel, lambda x: x, [1], concurrency=0)
+
+    def test_group_limit(self):
+        lock = Lock()
+        running = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0}
+
+        def func(item):
+            with lock:
+                running[item[0]] += 1
+                peak[item[0]] = max(peak[item[0]], running[item[0]])
+            time.sleep(0.01)
+            with lock:
+                running[item[0]] -= 1
+
+        items = [("a", i) for i in range(6)] + [("b", i) for i in range(6)]
+        run_in_parallel(func, items, concurrency=8, group_key=lambda item: item[0], group_limit=2)
+        self.assertLessEqual(peak["a"], 2)
+        self.assertLessEqual(peak["b"], 2)
+
+    def test_iter_in_parallel(self):
+        self.assertEqual(3, len(list(iter_in_parallel(lambda x: x, [1, 2, 3]))))
+
+
+if __name__ == "__main__":
+    unittest.main()
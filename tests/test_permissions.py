@@ -0,0 +1,92 @@
+from proxmoxmanager.main import ProxmoxManager
+from proxmoxmanager.utils.classes.cluster import ProxmoxClusterSnapshot
+from proxmoxmanager.utils.classes.permissions import ProxmoxPermissionMatrix
+from proxmoxmanager.utils.api import APIWrapper
+import unittest
+from unittest.mock import patch
+
+DATA = {
+    "version": 1,
+    "taken_at": 0,
+    "resources": [
+        {"type": "node", "node": "node1", "status": "online"},
+        {"type": "qemu", "vmid": 100, "node": "node1"},
+        {"type": "lxc", "vmid": 101, "node": "node1"},
+        {"type": "qemu", "vmid": 102, "node": "node1"},
+    ],
+    "users": [{"userid": "alice@pve", "groups": "devs"}, {"userid": "bob@pve", "groups": "auditors"},
+              {"userid": "carol@pve"}, {"userid": "root@pam"}],
+    "acl": [
+        {"path": "/", "type": "group", "ugid": "auditors", "roleid": "PVEAuditor", "propagate": 1},
+        {"path": "/vms", "type": "group", "ugid": "devs", "roleid": "PVEVMUser", "propagate": 1},
+        {"path": "/vms/101", "type": "user", "ugid": "alice@pve", "roleid": "NoAccess", "propagate": 1},
+        {"path": "/vms/102", "type": "user", "ugid": "bob@pve", "roleid": "PVEVMUser", "propagate": 0},
+    ],
+    "roles": [
+        {"roleid": "PVEVMUser", "privs": "VM.Audit,VM.Console,VM.PowerMgmt"},
+        {"roleid": "PVEAuditor", "privs": "VM.Audit,Sys.Audit"},
+        {"roleid": "NoAccess", "privs": ""},
+    ],
+}
+
+
+class TestProxmoxPermissionMatrix(unittest.TestCase):
+    matrix = ProxmoxPermissionMatrix(ProxmoxClusterSnapshot(DATA))
+
+    def test_properties(self):
+        self.assertEqual(["Sys.Audit", "VM.Audit", "VM.Console", "VM.PowerMgmt"], self.matrix.privilege_names)
+        self.assertEqual(["/", "/nodes/node1", "/vms", "/vms/100", "/vms/101", "/vms/102"], self.matrix.paths)
+        # Users without any ACL entries are left out
+        self.assertEqual(["alice@pve", "bob@pve", "root@pam"], self.matrix.users)
+
+    def test_privileges(self):
+        self.assertEqual({"VM.Audit", "VM.Console", "VM.PowerMgmt"}, self.matrix.privileges("alice@pve", "/vms/100"))
+        self.assertEqual(frozenset(), self.matrix.privileges("alice@pve", "/vms/101"))
+        self.assertEqual(frozenset(), self.matrix.privileges("alice@pve", "/nodes/node1"))
+        self.assertEqual({"VM.Audit", "VM.Console", "VM.PowerMgmt"}, self.matrix.privileges("bob@pve", "/vms/102"))
+        # Paths that were not evaluated beforehand
+        self.assertTrue(self.matrix.has_privilege("alice@pve", "/vms/999", "VM.PowerMgmt"))
+        self.assertFalse(self.matrix.has_privilege("bob@pve", "/vms/102/foo", "VM.PowerMgmt"))
+        self.assertFalse(self.matrix.has_privilege("carol@pve", "/vms/100", "VM.Audit"))
+        self.assertTrue(self.matrix.has_privilege("root@pam", "/vms/101", "VM.PowerMgmt"))
+
+    def test_queries(self):
+        self.assertEqual(["alice@pve", "bob@pve", "root@pam"], self.matrix.users_with("VM.Audit", "/vms/100"))
+        self.assertEqual(["alice@pve", "root@pam"], self.matrix.users_with("VM.PowerMgmt", "/vms/100"))
+        self.assertEqual(["/vms", "/vms/100", "/vms/102"], self.matrix.paths_of("alice@pve"))
+        self.assertEqual(["/vms/102"], self.matrix.paths_of("bob@pve", "VM.PowerMgmt"))
+        self.assertEqual([], self.matrix.paths_of("bob@pve", "Foo"))
+
+    def test_export(self):
+        rows = self.matrix.to_rows()
+        self.assertIn({"userid": "bob@pve", "path": "/vms/102", "privileges": ["VM.Audit", "VM.Console",
+                                                                               "VM.PowerMgmt"]}, rows)
+        self.assertEqual(len(rows), sum(len(row) for row in self.matrix.to_dict().values()))
+        self.assertEqual(["Sys.Audit", "VM.Audit"], self.matrix.to_dict()["bob@pve"]["/"])
+
+    def test_pool_privileges(self):
+        data = dict(DATA, resources=DATA["resources"] + [{"type": "qemu", "vmid": 103, "node": "node1",
+                                                          "pool": "lab"}],
+                    acl=DATA["acl"] + [{"path": "/pool/lab", "type": "user", "ugid": "carol@pve",
+                                        "roleid": "PVEVMUser", "propagate": 1}])
+        matrix = ProxmoxPermissionMatrix(ProxmoxClusterSnapshot(data))
+        # Role on pool applies to guest in it, but not to other guests
+        self.assertEqual(["/pool/lab", "/vms/103"], matrix.paths_of("carol@pve"))
+        self.assertIn("carol@pve", matrix.users_with("VM.PowerMgmt", "/vms/103"))
+        self.assertFalse(matrix.has_privilege("carol@pve", "/vms/100", "VM.Audit"))
+
+    def test_build(self):
+        proxmox_manager = ProxmoxManager("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        with patch.object(APIWrapper, "list_resources", return_value=DATA["resources"]), \
+                patch.object(APIWrapper, "list_users", return_value=DATA["users"]), \
+                patch.object(APIWrapper, "get_access_control_list", return_value=DATA["acl"]) as target_method1, \
+                patch.object(APIWrapper, "list_roles", return_value=DATA["roles"]) as target_method2:
+            matrix = proxmox_manager.permission_matrix(paths=["/vms/100", "/vms/101/"])
+            target_method1.assert_called_once_with()
+            target_method2.assert_called_once_with()
+        self.assertEqual(["/vms/100", "/vms/101"], matrix.paths)
+        self.assertEqual(["alice@pve", "root@pam"], matrix.users_with("VM.PowerMgmt", "/vms/100"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+from proxmoxmanager.main import ProxmoxManager
+from proxmoxmanager.utils.classes.cluster import ProxmoxClusterSnapshot
+from proxmoxmanager.utils.api import APIWrapper
+import importlib.util
+import unittest
+from unittest.mock import patch
+
+GB = 1024 ** 3
+RESOURCES = [
+    {"type": "node", "node": "node1", "status": "online", "cpu": 0.2, "maxcpu": 16, "mem": 20 * GB, "maxmem": 64 * GB},
+    {"type": "node", "node": "node2", "status": "online", "cpu": 0.2, "maxcpu": 16, "mem": 10 * GB, "maxmem": 64 * GB},
+    {"type": "node", "node": "node3", "status": "online", "cpu": 0.2, "maxcpu": 16, "mem": 10 * GB, "maxmem": 32 * GB},
+    {"type": "qemu", "vmid": 100, "node": "node1", "status": "running", "maxmem": 16 * GB, "maxcpu": 8},
+    {"type": "qemu", "vmid": 101, "node": "node1", "status": "running", "maxmem": 8 * GB, "maxcpu": 8},
+    {"type": "lxc", "vmid": 102, "node": "node2", "status": "running", "maxmem": 8 * GB, "maxcpu": 4},
+    {"type": "qemu", "vmid": 103, "node": "node3", "status": "stopped", "maxmem": 8 * GB, "maxcpu": 4},
+    {"type": "qemu", "vmid": 9000, "node": "node3", "status": "stopped", "maxmem": 8 * GB, "template": 1},
+]
+DATA = {"version": 1, "taken_at": 0, "resources": RESOURCES, "users": [], "acl": [], "roles": [],
+        "rrd": {"node2": [{"time": 0, "memused": 30 * GB, "cpu": 0.9}, {"time": 60, "memused": 12 * GB}]}}
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class TestCapacityPlanner(unittest.TestCase):
+    def setUp(self):
+        from proxmoxmanager.utils.classes.planner import CapacityPlanner
+        self.planner = CapacityPlanner(ProxmoxClusterSnapshot(DATA))
+
+    def test_current(self):
+        result = self.planner.plan(details=True)
+        self.assertEqual(3, result["nodes"])
+        self.assertEqual(160 * GB, result["mem_total"])
+        # Peak usage of node2 is taken from history
+        self.assertEqual(60 * GB, result["mem_used"])
+        self.assertEqual(0.9, result["details"]["node2"]["cpu"])
+        # Stopped guests and templates are not accounted for
+        self.assertEqual(32 * GB, result["mem_allocated"])
+        self.assertEqual(0.2, result["mem_overcommit"])
+        self.assertEqual(20 / 48, result["cpu_overcommit"])
+        # Failure of node1: 34 + 22 GB free on other nodes, 24 GB to restart
+        self.assertEqual({"node1": 32 * GB, "node2": 58 * GB, "node3": 78 * GB}, result["headroom"])
+        self.assertTrue(result["survives_failure"])
+
+    def test_new_guests(self):
+        result = self.planner.plan(new_guests=3, guest_size={"maxmem": 20 * GB})
+        self.assertEqual({"new-0": "node1", "new-1": "node2", "new-2": "node1"}, result["placement"])
+        self.assertEqual([], result["unplaced"])
+        self.assertEqual(92 * GB, result["mem_allocated"])
+        self.assertFalse(result["survives_failure"])
+        result = self.planner.plan(new_guests=[{"vmid": "big", "maxmem": 50 * GB}])
+        self.assertEqual(["big"], result["unplaced"])
+        # Scenarios don't affect each other
+        self.assertEqual(32 * GB, self.planner.plan()["mem_allocated"])
+
+    def test_nodes(self):
+        result = self.planner.plan(remove_nodes=["node1"], add_nodes=[{"node": "node4", "maxmem": 128 * GB,
+                                                                       "maxcpu": 32}])
+        self.assertEqual({"100": "node4", "101": "node4"}, result["placement"])
+        self.assertEqual(["node2", "node3", "node4"], sorted(result["headroom"].keys()))
+        self.assertEqual(224 * GB, result["mem_total"])
+        result = self.planner.plan(drain_nodes=["node2"])
+        self.assertEqual({"102": "node1"}, result["placement"])
+        self.assertEqual(2, result["nodes"])
+        # Drained node has nothing to lose, all free memory of other nodes is left
+        self.assertEqual(58 * GB, result["headroom"]["node2"])
+
+    def test_failure_domains(self):
+        from proxmoxmanager.utils.classes.planner import CapacityPlanner
+        planner = CapacityPlanner(ProxmoxClusterSnapshot(DATA), use_peak=False,
+                                  failure_domains={"rack1": ["node1", "node2"]})
+        result = planner.plan()
+        # Failure of rack1: 22 GB free on node3, 32 GB to restart
+        self.assertEqual({"rack1": -10 * GB, "node3": 98 * GB}, result["headroom"])
+        self.assertEqual(-10 * GB, result["min_headroom"])
+        self.assertEqual(3, len(planner.sweep([{}, {"new_guests": 1}, {"drain_nodes": ["node3"]}])))
+
+    def test_capacity_planner(self):
+        proxmox_manager = ProxmoxManager("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        with patch.object(APIWrapper, "list_resources", return_value=RESOURCES), \
+                patch.object(APIWrapper, "list_users", return_value=[]), \
+                patch.object(APIWrapper, "get_access_control_list", return_value=[]), \
+                patch.object(APIWrapper, "list_roles", return_value=[]), \
+                patch.object(APIWrapper, "get_node_rrd_data", return_value=[]) as target_method:
+            planner = proxmox_manager.capacity_planner()
+            self.assertEqual(3, target_method.call_count)
+            target_method.assert_called_with(node="node3", timeframe="week", cf="MAX")
+        self.assertEqual(40 * GB, planner.plan()["mem_used"])
+
+
+if __name__ == "__main__":
+    unittest.main()
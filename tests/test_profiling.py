@@ -0,0 +1,65 @@
+from proxmoxmanager.main import ProxmoxManager
+from proxmoxmanager.utils.transports import ReplayTransport
+from proxmoxmanager.utils.profiling import RequestProfiler
+import unittest
+
+
+class TestRequestProfiler(unittest.TestCase):
+    RECORDS = [{"m": "GET", "p": "nodes", "d": {},
+                "r": [{"node": "node1"}, {"node": "node2"}, {"node": "node3"}]},
+               {"m": "GET", "p": "nodes/node1/qemu", "d": {}, "r": [{"vmid": 100}]},
+               {"m": "GET", "p": "nodes/node2/qemu", "d": {}, "r": [{"vmid": 101}]},
+               {"m": "GET", "p": "nodes/node3/qemu", "d": {}, "r": []}]
+
+    def setUp(self):
+        self.transport = ReplayTransport(self.RECORDS)
+        self.manager = ProxmoxManager("example.com:8006", transport=self.transport)
+
+    def test_profile(self):
+        with self.manager.profile() as profiler:
+            self.manager.vms.keys()
+        self.assertEqual(4, profiler.request_count)
+        self.assertEqual(1, profiler.count("list_nodes"))
+        self.assertEqual(3, profiler.count("list_vms"))
+        self.assertEqual("node1", profiler.requests[1]["node"])
+        self.assertTrue(profiler.requests[1]["stack"][0].endswith("_get_vms"))
+        # Profiler is removed after with-block
+        self.manager.vms.keys()
+        self.assertEqual(4, profiler.request_count)
+
+    def test_n_plus_one(self):
+        with self.manager.profile() as profiler:
+            self.manager.vms.keys()
+        patterns = profiler.n_plus_one()
+        self.assertEqual(1, len(patterns))
+        self.assertEqual("list_vms", patterns[0]["call"])
+        self.assertEqual("nodes/{node}/qemu", patterns[0]["pattern"])
+        self.assertEqual(3, patterns[0]["count"])
+        self.assertIn("list_vms", profiler.report())
+
+    def test_duplicates(self):
+        with self.manager.profile() as profiler:
+            self.manager.nodes.keys()
+            self.manager.nodes.keys()
+        self.assertEqual({"GET /nodes {}": 2}, profiler.duplicates())
+
+    def test_assert_max_requests(self):
+        with self.manager.profile() as profiler:
+            self.manager.vms["100"]
+        profiler.assert_max_requests(4)
+        profiler.assert_max_requests(1, call="list_nodes")
+        self.assertRaises(AssertionError, profiler.assert_max_requests, 3)
+        self.assertRaises(AssertionError, profiler.assert_max_requests, 2, call="list_vms")
+
+    def test_error(self):
+        with self.manager.profile() as profiler:
+            self.assertRaises(KeyError, self.manager._api.list_roles)
+        self.assertIsNotNone(profiler.requests[0]["error"])
+
+    def test_pattern(self):
+        self.assertEqual("nodes/{node}/qemu/{vmid}/status/current",
+                         RequestProfiler._pattern("nodes/node1/qemu/100/status/current"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,14 +30,22 @@ class TestProxmoxManager(unittest.TestCase):
     def test_list_roles(self):
         return_value = [{"roleid": "Role1", "special": 1, "privs": "priv1, priv2"},
                         {"roleid": "Role2", "special": 1, "privs": "priv2, priv3"}]
-        with patch.object(APIWrapper, "list_roles", return_value=return_value) as target_method:
+        with patch.object(APIWrapper, "list_roles", return_value=return_value) as target_method, \
+                patch.object(APIWrapper, "get_access_control_list", return_value=[]), \
+                patch.object(APIWrapper, "list_users", return_value=[]), \
+                patch.object(APIWrapper, "list_resources", return_value=[]):
+            self.proxmox_manager.roles.invalidate()
             self.assertEqual(return_value, self.proxmox_manager.list_roles())
             target_method.assert_called_once_with()
 
     def test_list_role_names(self):
         return_value = [{"roleid": "Role1", "special": 1, "privs": "priv1, priv2"},
                         {"roleid": "Role2", "special": 1, "privs": "priv2, priv3"}]
-        with patch.object(APIWrapper, "list_roles", return_value=return_value) as target_method:
+        with patch.object(APIWrapper, "list_roles", return_value=return_value) as target_method, \
+                patch.object(APIWrapper, "get_access_control_list", return_value=[]), \
+                patch.object(APIWrapper, "list_users", return_value=[]), \
+                patch.object(APIWrapper, "list_resources", return_value=[]):
+            self.proxmox_manager.roles.invalidate()
             self.assertEqual(["Role1", "Role2"], self.proxmox_manager.list_role_names())
             target_method.assert_called_once_with()
 
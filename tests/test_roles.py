@@ -0,0 +1,126 @@
+from proxmoxmanager.utils.classes.roles import ProxmoxRoleCatalogue
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+from proxmoxmanager.utils.api import APIWrapper
+from proxmoxmanager.utils.transports import ReplayTransport
+from proxmoxmanager.main import ProxmoxManager
+import unittest
+from unittest.mock import patch
+
+ROLES = [
+    {"roleid": "Administrator", "privs": "VM.Audit,VM.Console,VM.PowerMgmt,VM.Allocate,Sys.Audit", "special": 1},
+    {"roleid": "PVEVMUser", "privs": "VM.Audit,VM.Console,VM.PowerMgmt", "special": 1},
+    {"roleid": "PVEAuditor", "privs": "VM.Audit,Sys.Audit", "special": 1},
+    {"roleid": "NoAccess", "privs": "", "special": 1},
+]
+ACL = [
+    {"path": "/", "type": "group", "ugid": "auditors", "roleid": "PVEAuditor", "propagate": 1},
+    {"path": "/vms", "type": "group", "ugid": "devs", "roleid": "PVEVMUser", "propagate": 1},
+    {"path": "/vms/100", "type": "user", "ugid": "alice@pve", "roleid": "Administrator", "propagate": 0},
+    {"path": "/vms/101", "type": "user", "ugid": "alice@pve", "roleid": "NoAccess", "propagate": 1},
+    {"path": "/vms/102/", "type": "group", "ugid": "auditors", "roleid": "PVEAuditor", "propagate": 1},
+    {"path": "/pool/lab", "type": "user", "ugid": "carol@pve", "roleid": "PVEVMUser", "propagate": 1},
+    {"path": "/pool/lab", "type": "user", "ugid": "bob@pve", "roleid": "NoAccess", "propagate": 1},
+]
+USERS = [{"userid": "alice@pve", "groups": "devs,auditors"}, {"userid": "bob@pve", "groups": ["auditors"]},
+         {"userid": "carol@pve"}]
+RESOURCES = [{"type": "qemu", "vmid": 103, "node": "node1", "pool": "lab"},
+             {"type": "qemu", "vmid": 104, "node": "node1"}]
+
+
+class TestProxmoxRoleCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        self.patchers = [patch.object(APIWrapper, "list_roles", return_value=ROLES),
+                         patch.object(APIWrapper, "get_access_control_list", return_value=ACL),
+                         patch.object(APIWrapper, "list_users", return_value=USERS),
+                         patch.object(APIWrapper, "list_resources", return_value=RESOURCES)]
+        self.target_methods = [patcher.start() for patcher in self.patchers]
+        self.roles = ProxmoxRoleCatalogue(self.api)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_privileges(self):
+        self.assertEqual(["Administrator", "NoAccess", "PVEAuditor", "PVEVMUser"], sorted(self.roles.keys()))
+        self.assertEqual({"VM.Audit", "Sys.Audit"}, self.roles["PVEAuditor"])
+        self.assertEqual(frozenset(), self.roles.privileges("NoAccess"))
+        self.assertEqual(["Administrator", "PVEVMUser"], self.roles.roles_with("VM.PowerMgmt"))
+        self.assertEqual([], self.roles.roles_with("Foo"))
+
+    def test_effective_privileges(self):
+        # Group entries on deeper path replace inherited ones
+        self.assertEqual({"Sys.Audit", "VM.Audit"}, self.roles.effective_privileges("alice@pve", "/nodes/node1"))
+        self.assertEqual({"VM.Audit", "VM.Console", "VM.PowerMgmt"},
+                         self.roles.effective_privileges("alice@pve", "/vms/200"))
+        # User entries take precedence over group entries
+        self.assertTrue(self.roles.has_privilege("alice@pve", "/vms/100", "VM.Allocate"))
+        self.assertEqual({"Administrator": False}, self.roles.effective_roles("alice@pve", "/vms/100"))
+        # Not propagated entries don't apply to subpaths
+        self.assertFalse(self.roles.has_privilege("alice@pve", "/vms/100/foo", "VM.Allocate"))
+        self.assertEqual(frozenset(), self.roles.effective_privileges("alice@pve", "/vms/101"))
+        self.assertEqual({"Sys.Audit", "VM.Audit"}, self.roles.effective_privileges("bob@pve", "/vms/102"))
+        self.assertEqual(frozenset(), self.roles.effective_privileges("carol@pve", "/"))
+        self.assertTrue(self.roles.has_privilege("root@pam", "/vms/101", "VM.Allocate"))
+
+    def test_pool_privileges(self):
+        # Roles on pool are added to roles on guest in that pool
+        self.assertEqual({"VM.Audit", "VM.Console", "VM.PowerMgmt"},
+                         self.roles.effective_privileges("carol@pve", "/vms/103"))
+        self.assertEqual({"PVEVMUser": True}, self.roles.effective_roles("carol@pve", "/vms/103"))
+        self.assertEqual(frozenset(), self.roles.effective_privileges("carol@pve", "/vms/104"))
+        # NoAccess on pool takes away privileges on its guests
+        self.assertEqual(frozenset(), self.roles.effective_privileges("bob@pve", "/vms/103"))
+        self.assertEqual({"Sys.Audit", "VM.Audit"}, self.roles.effective_privileges("bob@pve", "/vms/104"))
+
+    def test_cache(self):
+        for _ in range(3):
+            self.roles.effective_privileges("alice@pve", "/vms/100")
+            self.roles.roles_with("VM.Audit")
+        for target_method in self.target_methods:
+            target_method.assert_called_once()
+        self.target_methods[2].assert_called_once_with(full="1")
+        self.target_methods[3].assert_called_once_with(type="vm")
+        self.roles.refresh()
+        self.assertEqual(2, self.target_methods[0].call_count)
+
+    def test_error(self):
+        with patch.object(APIWrapper, "get_access_control_list", side_effect=Exception("foo")):
+            self.assertRaises(ProxmoxException, self.roles.effective_privileges, "alice@pve", "/")
+
+
+class TestListRoles(unittest.TestCase):
+    RECORDS = [{"m": "GET", "p": "access/roles", "d": {}, "r": ROLES},
+               {"m": "GET", "p": "access/acl", "d": {}, "r": ACL},
+               {"m": "GET", "p": "access/users", "d": {"full": "1"}, "r": USERS},
+               {"m": "GET", "p": "cluster/resources", "d": {"type": "vm"}, "r": RESOURCES},
+               {"m": "POST", "p": "access/roles", "d": {"roleid": "Operator", "privs": "VM.Console"}, "r": None},
+               {"m": "GET", "p": "access/roles", "d": {},
+                "r": ROLES + [{"roleid": "Operator", "privs": "VM.Console", "special": 0}]},
+               {"m": "DELETE", "p": "access/roles/Operator", "d": {}, "r": None},
+               {"m": "GET", "p": "access/roles", "d": {}, "r": ROLES}]
+
+    def setUp(self):
+        self.transport = ReplayTransport(self.RECORDS)
+        self.proxmox_manager = ProxmoxManager("example.com:8006", transport=self.transport)
+
+    def test_request_count(self):
+        for _ in range(5):
+            self.assertEqual(["Administrator", "NoAccess", "PVEAuditor", "PVEVMUser"],
+                             sorted(self.proxmox_manager.list_role_names()))
+            self.assertEqual(ROLES, self.proxmox_manager.list_roles())
+        # Roles, ACL, users and resources are fetched once
+        self.assertEqual(4, self.transport.request_count)
+
+    def test_create_delete_invalidate(self):
+        self.proxmox_manager.list_role_names()
+        self.proxmox_manager.create_role("Operator", privs="VM.Console")
+        self.assertIn("Operator", self.proxmox_manager.list_role_names())
+        self.assertEqual({"VM.Console"}, self.proxmox_manager.roles["Operator"])
+        self.proxmox_manager.delete_role("Operator")
+        self.assertNotIn("Operator", self.proxmox_manager.list_role_names())
+        self.assertEqual(4 + 5 + 5, self.transport.request_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
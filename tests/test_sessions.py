@@ -0,0 +1,147 @@
+from proxmoxmanager.utils.sessions import SessionManager
+from proxmoxmanager.utils.parallel import run_in_parallel
+from proxmoxer.core import AuthenticationError, ResourceException
+from requests.exceptions import ConnectionError as RequestsConnectionError, ReadTimeout
+import unittest
+from unittest.mock import patch, MagicMock
+
+
+class TestSessionManager(unittest.TestCase):
+    def setUp(self):
+        self.tickets = 0
+
+        def request(method, url, **kwargs):
+            response = MagicMock(status_code=200, reason="OK")
+            if url.endswith("/access/ticket"):
+                if kwargs["data"]["password"] == "wrong":
+                    response.status_code, response.reason = 401, "Unauthorized"
+                self.tickets += 1
+                response.json.return_value = {"data": {"ticket": f"ticket{self.tickets}",
+                                                       "CSRFPreventionToken": f"csrf{self.tickets}"}}
+            else:
+                response.json.return_value = {"data": None}
+            return response
+
+        self.patcher = patch("requests.Session")
+        self.http = self.patcher.start().return_value
+        self.http.request.side_effect = request
+        self.sessions = SessionManager("example.com", auto_renew=False)
+
+    def tearDown(self):
+        self.sessions.close()
+        self.patcher.stop()
+
+    def test_get_cached(self):
+        session = self.sessions.get("foo@pve", "12345")
+        self.assertIs(session, self.sessions.get("foo@pve", "12345"))
+        self.assertEqual(("ticket1", "csrf1"), session.get_tokens())
+        self.http.request.assert_called_once_with("POST", "https://example.com:8006/api2/json/access/ticket",
+                                                  verify=False, timeout=5,
+                                                  data={"username": "foo@pve", "password": "12345"})
+        self.http.mount.assert_called_once()
+
+    def test_get_concurrent(self):
+        results = [session for _, session, _ in run_in_parallel(lambda _: self.sessions.get("foo@pve", "12345"),
+                                                                range(8), concurrency=8)]
+        self.assertEqual(1, len({id(session) for session in results}))
+        self.assertEqual(1, self.http.request.call_count)
+
+    def test_get_wrong_password(self):
+        self.assertRaises(AuthenticationError, self.sessions.get, "foo@pve", "wrong")
+        self.assertEqual(0, len(self.sessions))
+
+    def test_get_other_password(self):
+        self.assertIsNot(self.sessions.get("foo@pve", "12345"), self.sessions.get("foo@pve", "54321"))
+        self.assertEqual(2, len(self.sessions))
+
+    def test_request(self):
+        session = self.sessions.get("foo@pve", "12345")
+        session.api.access.password.put(userid="foo@pve", password="54321")
+        self.http.request.assert_called_with("PUT", "https://example.com:8006/api2/json/access/password",
+                                             verify=False, timeout=5, headers={"CSRFPreventionToken": "csrf1"},
+                                             cookies={"PVEAuthCookie": "ticket1"},
+                                             data={"userid": "foo@pve", "password": "54321"})
+
+    def test_request_error(self):
+        session = self.sessions.get("foo@pve", "12345")
+        self.http.request.side_effect = lambda *args, **kwargs: MagicMock(status_code=403, reason="Forbidden")
+        self.assertRaises(ResourceException, session.api.access.users.get)
+
+    def test_invalidate(self):
+        self.sessions.get("foo@pve", "12345")
+        self.sessions.get("bar@pve", "12345")
+        self.sessions.invalidate("foo@pve")
+        self.assertEqual(1, len(self.sessions))
+
+    def test_expired(self):
+        session = self.sessions.get("foo@pve", "12345")
+        with patch("proxmoxmanager.utils.sessions.time.monotonic", return_value=10 ** 9):
+            self.assertIsNot(session, self.sessions.get("foo@pve", "12345"))
+
+    def test_renew(self):
+        session = self.sessions.get("foo@pve", "12345")
+        self.sessions._renew_after = 0
+        self.sessions.renew()
+        # Ticket is renewed through the same connection pool, old ticket is used as a password
+        self.http.request.assert_called_with("POST", "https://example.com:8006/api2/json/access/ticket",
+                                             verify=False, timeout=5,
+                                             data={"username": "foo@pve", "password": "ticket1"})
+        self.assertEqual(("ticket2", "csrf2"), session.get_tokens())
+        self.assertIs(session, self.sessions.get("foo@pve", "12345"))
+
+    def test_renew_failed(self):
+        self.sessions.get("foo@pve", "12345")
+        self.http.request.side_effect = Exception("foo")
+        self.sessions._renew_after = 0
+        self.sessions.renew()
+        self.assertEqual(0, len(self.sessions))
+
+
+class TestSessionManagerFailover(unittest.TestCase):
+    def setUp(self):
+        self.down = {"host1"}
+        self.urls = []
+
+        def request(method, url, **kwargs):
+            self.urls.append(url)
+            host = url.split("/")[2].split(":")[0]
+            if host in self.down:
+                raise RequestsConnectionError(f"Failed to connect to {host}")
+            response = MagicMock(status_code=200, reason="OK")
+            response.json.return_value = {"data": {"ticket": "ticket1", "CSRFPreventionToken": "csrf1"}}
+            return response
+
+        self.patcher = patch("requests.Session")
+        self.http = self.patcher.start().return_value
+        self.http.request.side_effect = request
+        self.sessions = SessionManager(["host1", "host2:8007"], auto_renew=False)
+
+    def tearDown(self):
+        self.sessions.close()
+        self.patcher.stop()
+
+    def test_first_host_down(self):
+        session = self.sessions.get("foo@pve", "12345")
+        self.assertEqual(("ticket1", "csrf1"), session.get_tokens())
+        self.assertEqual(["https://host1:8006/api2/json/access/ticket", "https://host2:8007/api2/json/access/ticket"],
+                         self.urls)
+        # Host that answered is used first from now on
+        session.api.access.users.get()
+        self.assertEqual("https://host2:8007/api2/json/access/users", self.urls[-1])
+        self.assertEqual(3, len(self.urls))
+
+    def test_all_hosts_down(self):
+        self.down = {"host1", "host2"}
+        self.assertRaises(RequestsConnectionError, self.sessions.get, "foo@pve", "12345")
+        self.assertEqual(2, len(self.urls))
+
+    def test_write_not_repeated(self):
+        session = self.sessions.get("foo@pve", "12345")
+        self.http.request.side_effect = ReadTimeout("Read timed out")
+        # Password might have been changed already, so request is not sent to other host
+        self.assertRaises(ReadTimeout, session.api.access.password.put, userid="foo@pve", password="54321")
+        self.assertEqual(3, self.http.request.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+from proxmoxmanager.utils.classes.storages import ProxmoxStorage, ProxmoxStorageDict
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+from proxmoxmanager.utils.api import APIWrapper
+import unittest
+from unittest.mock import patch
+
+GB = 1024 ** 3
+RESOURCES = [
+    {"id": "storage/node1/local", "type": "storage", "storage": "local", "node": "node1", "status": "available",
+     "content": "iso,vztmpl,backup", "shared": 0, "disk": 10 * GB, "maxdisk": 100 * GB},
+    {"id": "storage/node1/local-lvm", "type": "storage", "storage": "local-lvm", "node": "node1",
+     "status": "available", "content": "images,rootdir", "shared": 0, "disk": 50 * GB, "maxdisk": 200 * GB},
+    {"id": "storage/node2/local-lvm", "type": "storage", "storage": "local-lvm", "node": "node2",
+     "status": "available", "content": "images,rootdir", "shared": 0, "disk": 190 * GB, "maxdisk": 200 * GB},
+    {"id": "storage/node1/ceph", "type": "storage", "storage": "ceph", "node": "node1", "status": "available",
+     "content": "images", "shared": 1, "disk": 400 * GB, "maxdisk": 1000 * GB},
+    {"id": "storage/node2/ceph", "type": "storage", "storage": "ceph", "node": "node2", "status": "available",
+     "content": "images", "shared": 1, "disk": 400 * GB, "maxdisk": 1000 * GB},
+    {"id": "storage/node2/nfs", "type": "storage", "storage": "nfs", "node": "node2", "status": "unknown",
+     "content": "images", "shared": 1},
+]
+
+
+class TestProxmoxStorage(unittest.TestCase):
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+    storage = ProxmoxStorage(api, "local", ["node1"], RESOURCES[0])
+
+    def test_properties(self):
+        self.assertEqual("local", self.storage.id)
+        self.assertEqual("node1", self.storage.node.id)
+        self.assertFalse(self.storage.shared)
+        self.assertEqual(["iso", "vztmpl", "backup"], self.storage.content)
+        self.assertEqual(90 * GB, self.storage.free)
+        self.assertTrue(self.storage.supports("backup"))
+        self.assertFalse(self.storage.supports("images"))
+
+    def test_list_content(self):
+        return_value = [{"volid": "local:backup/vzdump-qemu-100.vma.zst", "size": GB}]
+        with patch.object(APIWrapper, "list_storage_content", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.storage.list_content(content="backup", vmid=100))
+            target_method.assert_called_once_with(node="node1", storage="local", content="backup", vmid="100")
+
+    def test_get_status_report(self):
+        with patch.object(APIWrapper, "get_storage_status", return_value={"avail": GB}) as target_method:
+            self.assertEqual({"avail": GB}, self.storage.get_status_report())
+            target_method.assert_called_once_with(node="node1", storage="local")
+
+
+class TestProxmoxStorageDict(unittest.TestCase):
+    def setUp(self):
+        self.api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        self.patcher = patch.object(APIWrapper, "list_resources", return_value=RESOURCES)
+        self.target_method = self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_keys(self):
+        storages = ProxmoxStorageDict(self.api)
+        self.assertEqual({"node1/local", "node1/local-lvm", "node2/local-lvm", "ceph"}, set(storages.keys()))
+        self.assertEqual(["node1", "node2"], storages["ceph"].nodes)
+        self.target_method.assert_called_with(type="storage")
+
+    def test_on_node(self):
+        storages = ProxmoxStorageDict(self.api)
+        self.assertEqual({"local-lvm", "ceph"}, set(storages.on_node("node2").keys()))
+        self.assertEqual(["ceph"], list(storages.shared().keys()))
+
+    def test_with_content(self):
+        storages = ProxmoxStorageDict(self.api, ttl=60)
+        self.assertEqual(["ceph", "local-lvm", "local-lvm"], [el.id for el in storages.with_content("images")])
+        self.assertEqual(["node1/local-lvm"], [f"{el.node.id}/{el.id}" for el in
+                                               storages.with_content("rootdir", min_free=100 * GB)])
+        self.assertEqual("ceph", storages.choose_by_most_free_space("images", node="node2").id)
+        self.assertEqual("local-lvm", storages.choose_by_most_free_space("rootdir", node="node1").id)
+        self.assertRaises(ProxmoxException, storages.choose_by_most_free_space, "rootdir", node="node2",
+                          min_free=100 * GB)
+        # Listing is cached
+        self.target_method.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
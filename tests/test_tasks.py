@@ -0,0 +1,153 @@
+from proxmoxmanager.utils.classes.tasks import ProxmoxTask, wait_for_tasks, follow_task_log, follow_task_logs, \
+    run_bulk_action
+from proxmoxmanager.utils.classes.vms import ProxmoxVM
+from proxmoxmanager.utils.api import APIWrapper
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+import unittest
+from unittest.mock import patch
+
+
+class TestProxmoxTask(unittest.TestCase):
+    UPID = "UPID:node_name:00001234:00005678:6123ABCD:qmclone:100:root@pam:"
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+    task = ProxmoxTask(api=api, upid=UPID)
+
+    def test_id(self):
+        self.assertEqual(self.UPID, self.task.id)
+
+    def test_node(self):
+        self.assertEqual("node_name", self.task.node)
+
+    def test_type(self):
+        self.assertEqual("qmclone", self.task.type)
+
+    def test_invalid_upid(self):
+        self.assertRaises(ValueError, ProxmoxTask, self.api, "foo")
+
+    def test_running(self):
+        return_value = {"status": "running", "upid": self.UPID}
+        with patch.object(APIWrapper, "get_task_status", return_value=return_value) as target_method:
+            self.assertTrue(self.task.running())
+            target_method.assert_called_once_with(node="node_name", upid=self.UPID)
+
+    def test_wait(self):
+        with patch.object(APIWrapper, "list_tasks", return_value=[]) as target_method1, \
+                patch.object(APIWrapper, "get_task_status",
+                             return_value={"status": "stopped", "exitstatus": "OK"}) as target_method2:
+            self.assertEqual("OK", self.task.wait())
+            target_method1.assert_called_once_with(node="node_name", source="active")
+            target_method2.assert_called_once_with(node="node_name", upid=self.UPID)
+
+
+class TestWaitForTasks(unittest.TestCase):
+    UPID1 = "UPID:node1:00001234:00005678:6123ABCD:qmclone:100:root@pam:"
+    UPID2 = "UPID:node1:00001235:00005678:6123ABCD:qmclone:101:root@pam:"
+    UPID3 = "UPID:node2:00001236:00005678:6123ABCD:qmclone:102:root@pam:"
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+
+    def test_wait_for_tasks(self):
+        active = {"node1": [[{"upid": self.UPID2}], []], "node2": [[]]}
+
+        def list_tasks(node, source):
+            return active[node].pop(0)
+
+        def get_task_status(node, upid):
+            return {"status": "stopped", "exitstatus": "OK" if upid != self.UPID3 else "error"}
+
+        with patch.object(APIWrapper, "list_tasks", side_effect=list_tasks) as target_method1, \
+                patch.object(APIWrapper, "get_task_status", side_effect=get_task_status) as target_method2:
+            result = wait_for_tasks(self.api, [self.UPID1, self.UPID2, self.UPID3], interval=0)
+            self.assertEqual({self.UPID1: "OK", self.UPID2: "OK", self.UPID3: "error"}, result)
+            self.assertEqual(3, target_method1.call_count)
+            self.assertEqual(3, target_method2.call_count)
+
+    def test_wait_for_tasks_timeout(self):
+        with patch.object(APIWrapper, "list_tasks", return_value=[{"upid": self.UPID1}]):
+            self.assertEqual({}, wait_for_tasks(self.api, [self.UPID1], timeout=0, interval=0))
+
+    def test_run_bulk_action(self):
+        targets = {"100": ProxmoxVM(self.api, "100", "node1"), "101": ProxmoxVM(self.api, "101", "node1"),
+                   "102": ProxmoxVM(self.api, "102", "node2"), "103": ProxmoxVM(self.api, "103", "node2")}
+        actions = {"100": self.UPID1, "101": None, "102": self.UPID3, "103": ValueError("foo")}
+
+        def action(target):
+            if isinstance(actions[target.id], Exception):
+                raise actions[target.id]
+            return actions[target.id]
+
+        with patch.object(APIWrapper, "list_tasks", return_value=[]), \
+                patch.object(APIWrapper, "get_task_status", return_value={"status": "stopped", "exitstatus": "OK"}):
+            result = run_bulk_action(self.api, targets, action, interval=0)
+        self.assertEqual({"node": "node1", "task": self.UPID1, "status": "ok", "error": None}, result["100"])
+        self.assertEqual("unchanged", result["101"]["status"])
+        self.assertEqual("ok", result["102"]["status"])
+        self.assertEqual({"node": "node2", "task": None, "status": "error", "error": "foo"}, result["103"])
+
+
+class TestFollowTaskLog(unittest.TestCase):
+    UPID1 = "UPID:node1:00001234:00005678:6123ABCD:vzdump:100:root@pam:"
+    UPID2 = "UPID:node2:00001235:00005678:6123ABCD:vzdump:101:root@pam:"
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+
+    @staticmethod
+    def fake_log(logs, running):
+        """
+        :param logs: Dict where keys are task IDs and values are lists of lines that appear one per status check
+        :param running: Dict where keys are task IDs and values are numbers of status checks until task finishes
+        """
+        written = {upid: [] for upid in logs}
+
+        def get_task_logs(node, upid, start, limit):
+            lines = written[upid][start:start + limit]
+            return [{"n": start + i + 1, "t": line} for i, line in enumerate(lines)] or [{"n": 0, "t": "no content"}]
+
+        def get_task_status(node, upid):
+            if logs[upid]:
+                written[upid].append(logs[upid].pop(0))
+            running[upid] -= 1
+            return {"status": "running" if running[upid] > 0 else "stopped"}
+
+        return get_task_logs, get_task_status
+
+    def test_follow_task_log(self):
+        get_task_logs, get_task_status = self.fake_log({self.UPID1: ["line1", "line2", "line3"]}, {self.UPID1: 3})
+        with patch.object(APIWrapper, "get_task_logs", side_effect=get_task_logs) as target_method1, \
+                patch.object(APIWrapper, "get_task_status", side_effect=get_task_status):
+            lines = list(ProxmoxTask(self.api, self.UPID1).follow_logs(min_interval=0, max_interval=0))
+            self.assertEqual(["line1", "line2", "line3"], lines)
+            # Only new lines are requested every time
+            self.assertEqual([0, 0, 1, 1, 2, 2], [call.kwargs["start"] for call in target_method1.call_args_list])
+
+    def test_follow_task_log_pages(self):
+        get_task_logs, get_task_status = self.fake_log({self.UPID1: []}, {self.UPID1: 1})
+        lines = [{"n": i + 1, "t": f"line{i + 1}"} for i in range(5)]
+        with patch.object(APIWrapper, "get_task_logs",
+                          side_effect=lambda node, upid, start, limit: lines[start:start + limit]) as target_method, \
+                patch.object(APIWrapper, "get_task_status", side_effect=get_task_status):
+            result = list(follow_task_log(self.api, self.UPID1, min_interval=0, limit=2))
+            self.assertEqual([f"line{i + 1}" for i in range(5)], result)
+            self.assertEqual([0, 2, 4, 5, 5], [call.kwargs["start"] for call in target_method.call_args_list])
+
+    def test_follow_task_log_timeout(self):
+        with patch.object(APIWrapper, "get_task_logs", return_value=[]), \
+                patch.object(APIWrapper, "get_task_status", return_value={"status": "running"}):
+            self.assertRaises(ProxmoxException, list, follow_task_log(self.api, self.UPID1, min_interval=0,
+                                                                      timeout=0))
+
+    def test_follow_task_logs(self):
+        get_task_logs, get_task_status = self.fake_log({self.UPID1: ["a1", "a2"], self.UPID2: ["b1"]},
+                                                       {self.UPID1: 3, self.UPID2: 2})
+        with patch.object(APIWrapper, "get_task_logs", side_effect=get_task_logs), \
+                patch.object(APIWrapper, "get_task_status", side_effect=get_task_status):
+            result = list(follow_task_logs(self.api, [self.UPID1, self.UPID2], min_interval=0, max_interval=0))
+        self.assertEqual(["a1", "a2"], [line for upid, line in result if upid == self.UPID1])
+        self.assertEqual(["b1"], [line for upid, line in result if upid == self.UPID2])
+
+    def test_follow_task_logs_error(self):
+        with patch.object(APIWrapper, "get_task_logs", side_effect=Exception("foo")):
+            self.assertRaises(ProxmoxException, list, follow_task_logs(self.api, [self.UPID1]))
+        self.assertRaises(ValueError, list, follow_task_logs(self.api, ["foo"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
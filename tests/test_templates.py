@@ -0,0 +1,64 @@
+from proxmoxmanager.utils.classes.templates import ProxmoxTemplateCatalogue
+from proxmoxmanager.utils.classes.vms import ProxmoxVM
+from proxmoxmanager.utils.classes.containers import ProxmoxContainer
+from proxmoxmanager.utils.classes.errors import ProxmoxException
+from proxmoxmanager.utils.api import APIWrapper
+import unittest
+from unittest.mock import patch
+
+RESOURCES = [
+    {"type": "qemu", "vmid": 100, "node": "node1", "name": "web-1", "template": 0},
+    {"type": "qemu", "vmid": 9000, "node": "node1", "name": "debian-12", "template": 1, "tags": "linux;base"},
+    {"type": "qemu", "vmid": 9001, "node": "node2", "name": "win-2022", "template": 1, "tags": "windows"},
+    {"type": "lxc", "vmid": 9002, "node": "node2", "name": "alpine", "template": 1, "tags": "linux"},
+    {"type": "qemu", "vmid": 9003, "node": "node2", "name": "debian-12", "template": 1},
+]
+
+
+class TestProxmoxTemplateCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        self.patcher = patch.object(APIWrapper, "list_resources", return_value=RESOURCES)
+        self.target_method = self.patcher.start()
+        self.templates = ProxmoxTemplateCatalogue(self.api)
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_keys(self):
+        self.assertEqual({"9000", "9001", "9002", "9003"}, set(self.templates.keys()))
+        self.assertIsInstance(self.templates["9002"], ProxmoxContainer)
+        self.assertEqual("node2", self.templates[9001].node.id)
+        self.assertNotIn("100", self.templates)
+
+    def test_find(self):
+        self.assertEqual(["9000", "9002"], [el.id for el in self.templates.find(tag="linux")])
+        self.assertEqual(["9000"], [el.id for el in self.templates.find(tag="linux", guest_type="qemu")])
+        self.assertEqual(["9000", "9003"], [el.id for el in self.templates.find(name="debian-12")])
+        self.assertEqual(["base", "linux", "windows"], self.templates.tags())
+        self.assertEqual(ProxmoxVM(self.api, "9001", "node2"), self.templates.get("win-2022"))
+        self.assertRaises(ProxmoxException, self.templates.get, "debian-12")
+        self.assertRaises(KeyError, self.templates.get, "foo")
+        # Every lookup is answered from one cached listing
+        self.target_method.assert_called_once_with(type="vm")
+
+    def test_find_ostype(self):
+        with patch.object(APIWrapper, "get_vm_config",
+                          side_effect=lambda node, vmid: {"ostype": "win11" if vmid == "9001" else "l26"}) \
+                as target_method1, \
+                patch.object(APIWrapper, "get_container_config", return_value={"ostype": "alpine"}) as target_method2:
+            self.assertEqual(["9000", "9003"], [el.id for el in self.templates.find(ostype="l26")])
+            self.assertEqual(["alpine", "l26", "win11"], self.templates.ostypes())
+            self.assertEqual(3, target_method1.call_count)
+            target_method2.assert_called_once_with(node="node2", vmid="9002")
+
+    def test_clone_from_template(self):
+        with patch.object(APIWrapper, "get_next_vmid", return_value=123), \
+                patch.object(APIWrapper, "clone_container", return_value="TASKID") as target_method:
+            self.assertEqual("TASKID", self.templates.clone_from_template("alpine", new_name="ct1", newnode="node1"))
+            target_method.assert_called_once_with(newid="123", node="node2", vmid="9002", full="1", target="node1",
+                                                  hostname="ct1")
+
+
+if __name__ == "__main__":
+    unittest.main()
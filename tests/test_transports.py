@@ -0,0 +1,100 @@
+from proxmoxmanager.utils.transports import Transport, RecordingTransport, ReplayTransport
+from proxmoxmanager.utils.classes.nodes import ProxmoxNodeDict
+from proxmoxmanager.utils.classes.vms import ProxmoxVMDict
+from proxmoxmanager.utils.api import APIWrapper
+from proxmoxer.core import ResourceException
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import tempfile
+
+
+class TestTransports(unittest.TestCase):
+    RECORDS = [{"m": "GET", "p": "nodes", "d": {}, "t": 0.01,
+                "r": [{"node": "node1", "status": "online"}, {"node": "node2", "status": "online"}]},
+               {"m": "GET", "p": "nodes/node1/qemu", "d": {}, "t": 0.01, "r": [{"vmid": 100}, {"vmid": 101}]},
+               {"m": "GET", "p": "nodes/node2/qemu", "d": {}, "t": 0.01, "r": [{"vmid": 102}]},
+               {"m": "GET", "p": "nodes/node1/status", "d": {}, "t": 0.01,
+                "r": {"memory": {"free": 100, "total": 1000}}},
+               {"m": "GET", "p": "nodes/node2/status", "d": {}, "t": 0.01,
+                "r": {"memory": {"free": 300, "total": 1000}}},
+               {"m": "GET", "p": "nodes/node3/status", "d": {}, "t": 0.01,
+                "e": {"s": 500, "m": "Internal Server Error", "c": "node offline"}},
+               {"m": "GET", "p": "cluster/resources", "d": {"type": "node"}, "t": 0.01,
+                "r": [{"type": "node", "node": "node1", "status": "online", "mem": 900, "maxmem": 1000},
+                      {"type": "node", "node": "node2", "status": "online", "mem": 700, "maxmem": 1000}]}]
+
+    def setUp(self):
+        self.transport = ReplayTransport(self.RECORDS)
+        self.api = APIWrapper("example.com:8006", transport=self.transport)
+
+    def test_record_and_replay(self):
+        inner = MagicMock()
+        inner.request.return_value = [{"node": "node1"}]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "records.jsonl.gz")
+            with RecordingTransport(inner, filename) as recorder:
+                APIWrapper("example.com:8006", transport=recorder).list_nodes()
+            self.assertEqual(1, len(recorder.records))
+            replay = ReplayTransport(filename)
+        self.assertEqual([{"node": "node1"}], APIWrapper("example.com:8006", transport=replay).list_nodes())
+        self.assertEqual(1, replay.request_count)
+
+    def test_record_redacts_secrets(self):
+        inner = MagicMock()
+        inner.request.return_value = {"full-tokenid": "foo@pve!api", "value": "secret"}
+        recorder = RecordingTransport(inner)
+        api = APIWrapper("example.com:8006", transport=recorder)
+        api.create_user(userid="foo@pve", password="12345", email="foo@example.com")
+        api.create_user_token(userid="foo@pve", tokenid="api")
+        self.assertEqual({"userid": "foo@pve", "password": "***", "email": "foo@example.com"},
+                         recorder.records[0]["d"])
+        self.assertEqual({"full-tokenid": "foo@pve!api", "value": "***"}, recorder.records[1]["r"])
+        self.assertNotIn("12345", str(recorder.records))
+        # Requests with any password match redacted records
+        replay = ReplayTransport(recorder.records)
+        APIWrapper("example.com:8006", transport=replay).create_user(userid="foo@pve", password="67890",
+                                                                    email="foo@example.com")
+        self.assertEqual(1, replay.request_count)
+
+    def test_transport_is_abstract(self):
+        self.assertRaises(TypeError, Transport)
+
+    def test_record_error(self):
+        inner = MagicMock()
+        inner.request.side_effect = ResourceException(500, "Internal Server Error", "foo")
+        recorder = RecordingTransport(inner)
+        self.assertRaises(ResourceException, APIWrapper("example.com:8006", transport=recorder).list_nodes)
+        self.assertEqual({"s": 500, "m": "Internal Server Error", "c": "foo"}, recorder.records[0]["e"])
+
+    def test_replay_error(self):
+        self.assertRaises(ResourceException, self.api.get_node_status, node="node3")
+
+    def test_replay_unknown_request(self):
+        self.assertRaises(KeyError, self.api.list_users)
+
+    def test_replay_same_request_in_order(self):
+        transport = ReplayTransport([{"m": "GET", "p": "version", "d": {}, "r": 1},
+                                     {"m": "GET", "p": "version", "d": {}, "r": 2}])
+        api = APIWrapper("example.com:8006", transport=transport)
+        self.assertEqual([1, 2, 2], [api.get_version(), api.get_version(), api.get_version()])
+
+    def test_get_vms_request_count(self):
+        ProxmoxVMDict(self.api)._get_vms()
+        self.assertEqual(3, self.transport.request_count)
+
+    def test_choose_by_most_free_ram_request_count(self):
+        node_dict = ProxmoxNodeDict(self.api)
+        self.assertEqual("node2", node_dict.choose_by_most_free_ram().id)
+        # Nodes are scored from a single cluster resources request
+        self.assertEqual(1, self.transport.request_count)
+
+    def test_choose_by_most_free_ram_without_numpy_request_count(self):
+        with patch("proxmoxmanager.utils.classes.nodes._import_numpy", side_effect=ImportError):
+            node_dict = ProxmoxNodeDict(self.api)
+            self.assertEqual("node2", node_dict.choose_by_most_free_ram().id)
+        self.assertEqual(3, self.transport.request_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
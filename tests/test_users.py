@@ -32,11 +32,47 @@ class TestProxmoxUser(unittest.TestCase):
     def test_change_password_too_short(self):
         self.assertRaises(ValueError, self.user.change_password, old_password="12345", new_password="1234")
 
+    def test_list_tokens(self):
+        return_value = [{"tokenid": "api", "privsep": 1, "expire": 0}]
+        with patch.object(APIWrapper, "list_user_tokens", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.user.list_tokens())
+            target_method.assert_called_once_with(userid=self.USERID + "@pve")
+
+    def test_create_token(self):
+        return_value = {"full-tokenid": self.USERID + "@pve!api", "value": "secret"}
+        with patch.object(APIWrapper, "create_user_token", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.user.create_token("api", privsep=False, comment="foo"))
+            target_method.assert_called_once_with(userid=self.USERID + "@pve", tokenid="api", privsep="0",
+                                                  comment="foo")
+
+    def test_revoke_token(self):
+        with patch.object(APIWrapper, "delete_user_token") as target_method:
+            self.user.revoke_token("api")
+            target_method.assert_called_once_with(userid=self.USERID + "@pve", tokenid="api")
+
     def test_delete(self):
         with patch.object(APIWrapper, "delete_user") as target_method:
             self.user.delete()
             target_method.assert_called_once_with(userid=self.USERID + "@pve")
 
+    def test_fullid(self):
+        self.assertEqual(self.USERID + "@pve", self.user.fullid)
+        self.assertEqual("pve", self.user.realm)
+
+    def test_other_realm(self):
+        user = ProxmoxUser(api=self.user._api, userid="foo@ldap")
+        self.assertEqual("foo@ldap", user.id)
+        self.assertEqual("foo@ldap", user.fullid)
+        self.assertEqual("ldap", user.realm)
+        self.assertEqual("foo", ProxmoxUser(api=self.user._api, userid="foo@pve").id)
+
+    def test_enabled_expired_from_info(self):
+        user = ProxmoxUser(api=self.user._api, userid="foo@ldap", info={"enable": 0, "expire": 1})
+        with patch.object(APIWrapper, "get_user") as target_method:
+            self.assertFalse(user.enabled())
+            self.assertTrue(user.expired())
+            target_method.assert_not_called()
+
     def test_repr(self):
         self.assertEqual(f"<ProxmoxUser: {self.USERID}>", repr(self.user))
 
@@ -44,7 +80,128 @@ class TestProxmoxUser(unittest.TestCase):
         self.assertEqual(self.USERID, str(self.user))
 
 
-# TODO: test ProxmoxUserDict
+class TestProxmoxUserDict(unittest.TestCase):
+    api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+
+    USERS = [{"userid": "root@pam", "enable": 1, "groups": "admins"},
+             {"userid": "foo@pve", "enable": 1, "groups": "students,lab"},
+             {"userid": "bar@pve", "enable": 0, "expire": 1, "groups": ""},
+             {"userid": "baz@ldap", "enable": 1, "groups": "students"}]
+
+    def test_get_users(self):
+        with patch.object(APIWrapper, "list_users", return_value=self.USERS) as target_method:
+            user_dict = ProxmoxUserDict(self.api)
+            self.assertEqual(["foo", "bar"], list(user_dict.keys()))
+            self.assertEqual("foo@pve", user_dict["foo@pve"].fullid)
+            self.assertTrue("bar" in user_dict)
+            target_method.assert_called_with()
+
+    def test_all_realms(self):
+        with patch.object(APIWrapper, "list_users", return_value=self.USERS):
+            user_dict = ProxmoxUserDict(self.api, realm=None)
+            self.assertEqual(["root@pam", "foo", "bar", "baz@ldap"], list(user_dict.keys()))
+            self.assertEqual(["baz@ldap"], [user.id for user in user_dict.filter(realm="ldap")])
+            self.assertEqual(["bar"], [user.id for user in user_dict.filter(enabled=False)])
+            self.assertEqual(["bar"], [user.id for user in user_dict.filter(expired=True)])
+            self.assertRaises(ValueError, user_dict.filter, group="students")
+
+    def test_filter_by_group(self):
+        with patch.object(APIWrapper, "list_users", return_value=self.USERS) as target_method:
+            user_dict = ProxmoxUserDict(self.api, realm=None, with_groups=True)
+            self.assertEqual(["baz@ldap", "foo"], [user.id for user in user_dict.filter(group="students")])
+            self.assertEqual(["foo"], [user.id for user in user_dict.filter(group="students", realm="pve")])
+            target_method.assert_called_with(full="1")
+
+    def test_filter_by_state(self):
+        users = self.USERS + [{"userid": "qux@pve", "enable": 1, "expire": 4102444800}]
+        with patch.object(APIWrapper, "list_users", return_value=users), \
+                patch.object(APIWrapper, "get_user") as target_method:
+            user_dict = ProxmoxUserDict(self.api, realm=None)
+            self.assertEqual(["baz@ldap", "foo", "qux", "root@pam"],
+                             [user.id for user in user_dict.filter(enabled=True, expired=False)])
+            self.assertEqual(["foo", "qux"], [user.id for user in user_dict.filter(realm="pve", enabled=True)])
+            self.assertEqual([], [user.id for user in user_dict.filter(enabled=True, expired=True)])
+            # Filtering uses indexes, user configs are not requested
+            target_method.assert_not_called()
+
+    def test_ttl(self):
+        with patch.object(APIWrapper, "list_users", return_value=self.USERS) as target_method:
+            user_dict = ProxmoxUserDict(self.api, ttl=60)
+            user_dict["foo"]
+            user_dict["bar"]
+            self.assertEqual(1, target_method.call_count)
+            user_dict.refresh()
+            self.assertEqual(2, target_method.call_count)
+
+    def test_create_tokens(self):
+        def create_user_token(userid, tokenid, privsep):
+            if userid == "bar@pve":
+                raise Exception("foo")
+            return {"value": "secret"}
+
+        with patch.object(APIWrapper, "create_user_token", side_effect=create_user_token):
+            result = ProxmoxUserDict(self.api).create_tokens(["foo", "bar"], "api")
+        self.assertEqual({"status": "ok", "error": None, "token": {"value": "secret"}}, result["foo"])
+        self.assertEqual({"status": "error", "error": "foo", "token": None}, result["bar"])
+
+    def test_create_many(self):
+        users = [{"userid": "root@pam"}, {"userid": "foo@pve"}]
+        specs = [{"user": "foo", "password": "12345"},
+                 {"user": "bar", "password": "12345", "email": "bar@foo.bar", "permissions": [("/vms/100", "Role")],
+                  "token": "api"},
+                 {"user": "baz", "password": "1234"},
+                 {"user": "qux", "password": "12345"},
+                 {"user": "quux", "password": "12345"},
+                 {"user": "quux@pve", "password": "67890"}]
+
+        def create_user(userid, password, **kwargs):
+            if userid == "qux@pve":
+                raise Exception("foo")
+
+        with patch.object(APIWrapper, "list_users", return_value=users) as target_method1, \
+                patch.object(APIWrapper, "create_user", side_effect=create_user) as target_method2, \
+                patch.object(APIWrapper, "update_access_control_list") as target_method3, \
+                patch.object(APIWrapper, "create_user_token", return_value={"value": "secret"}) as target_method4:
+            result = ProxmoxUserDict(self.api).create_many(specs)
+            target_method1.assert_called_once_with()
+            self.assertEqual(2, target_method2.call_count)
+            target_method2.assert_any_call(userid="bar@pve", password="12345", email="bar@foo.bar")
+            target_method3.assert_called_once_with(path="/vms/100", roles="Role", users="bar@pve", delete="0",
+                                                   propagate="0")
+            target_method4.assert_called_once_with(userid="bar@pve", tokenid="api", privsep="0")
+        self.assertEqual("error", result["foo"]["status"])
+        self.assertEqual({"status": "ok", "error": None, "token": {"value": "secret"}}, result["bar"])
+        self.assertEqual("error", result["baz"]["status"])
+        self.assertEqual({"status": "error", "error": "foo", "token": None}, result["qux"])
+        self.assertEqual({"status": "error", "error": "User quux is given 2 times", "token": None}, result["quux"])
+        self.assertEqual({"foo", "bar", "baz", "qux", "quux"}, set(result.keys()))
+
+    def test_create_many_other_realm(self):
+        users = [{"userid": "root@pam"}, {"userid": "foo@pve"}, {"userid": "bar@pam"}]
+        specs = [{"user": "foo", "password": "12345"}, {"user": "foo@pve", "password": "12345"},
+                 {"user": "bar@pam", "password": "12345"}, {"user": "baz", "password": "12345"},
+                 {"user": "baz@pve", "password": "67890"}]
+        with patch.object(APIWrapper, "list_users", return_value=users), \
+                patch.object(APIWrapper, "create_user") as target_method:
+            user_dict = ProxmoxUserDict(self.api, realm="pam")
+            result = user_dict.create_many(specs[:1] + specs[2:])
+            target_method.assert_not_called()
+            # Existing user is found even though it's not in realm of dict
+            self.assertRaises(ValueError, user_dict.create, "foo", "12345")
+        self.assertEqual({"status": "error", "error": "User foo already exists", "token": None}, result["foo"])
+        self.assertEqual("User bar@pam already exists", result["bar@pam"]["error"])
+        self.assertEqual({"status": "error", "error": "User baz is given 2 times", "token": None}, result["baz"])
+        with patch.object(APIWrapper, "list_users", return_value=users), patch.object(APIWrapper, "create_user"):
+            result = ProxmoxUserDict(self.api).create_many(specs[:2])
+        self.assertEqual({"foo"}, set(result.keys()))
+        self.assertEqual("error", result["foo"]["status"])
+
+    def test_create_many_partial(self):
+        with patch.object(APIWrapper, "list_users", return_value=[]), patch.object(APIWrapper, "create_user"), \
+                patch.object(APIWrapper, "create_user_token", side_effect=Exception("foo")):
+            result = ProxmoxUserDict(self.api).create_many([{"user": "foo", "password": "12345", "token": "api"}])
+        self.assertEqual({"status": "partial", "error": "foo", "token": None}, result["foo"])
+
 
 if __name__ == "__main__":
     unittest.main()
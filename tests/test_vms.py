@@ -1,5 +1,6 @@
 from proxmoxmanager.utils.classes.vms import ProxmoxVM, ProxmoxVMDict
 from proxmoxmanager.utils.api import APIWrapper
+from proxmoxer.core import ResourceException
 import unittest
 from unittest.mock import patch
 
@@ -28,6 +29,44 @@ class TestProxmoxVM(unittest.TestCase):
             self.assertEqual(return_value, self.vm.get_config())
             target_method.assert_called_once_with(vmid=self.VMID, node=self.NODE_NAME)
 
+    def test_set_config(self):
+        return_value = {"cores": 2, "memory": 1024, "digest": "abc"}
+        with patch.object(APIWrapper, "get_vm_config", return_value=return_value) as target_method1, \
+                patch.object(APIWrapper, "update_vm_config") as target_method2:
+            self.vm.set_config({"cores": "2", "memory": 2048, "description": None, "swap": None})
+            target_method1.assert_called_once_with(vmid=self.VMID, node=self.NODE_NAME)
+            target_method2.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID, memory=2048, digest="abc")
+
+    def test_set_config_no_changes(self):
+        return_value = {"cores": 2, "memory": 1024, "digest": "abc"}
+        with patch.object(APIWrapper, "get_vm_config", return_value=return_value), \
+                patch.object(APIWrapper, "update_vm_config") as target_method:
+            self.vm.set_config({"cores": 2})
+            target_method.assert_not_called()
+
+    def test_update_config(self):
+        return_value = {"cores": 2, "memory": 1024, "digest": "abc"}
+        with patch.object(APIWrapper, "get_vm_config", return_value=return_value), \
+                patch.object(APIWrapper, "update_vm_config_async", return_value="TASKID") as target_method:
+            self.assertEqual("TASKID", self.vm.update_config({"cores": 4}))
+            target_method.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID, cores=4, digest="abc")
+
+    def test_update_config_retry(self):
+        return_values = [{"cores": 2, "digest": "abc"}, {"cores": 3, "digest": "def"}]
+        side_effect = [ResourceException(500, "Internal Server Error",
+                                         "detected modified configuration - file changed by other user? Try again."),
+                       "TASKID"]
+        with patch.object(APIWrapper, "get_vm_config", side_effect=return_values) as target_method1, \
+                patch.object(APIWrapper, "update_vm_config_async", side_effect=side_effect) as target_method2:
+            self.assertEqual("TASKID", self.vm.update_config({"cores": 4}))
+            self.assertEqual(2, target_method1.call_count)
+            target_method2.assert_called_with(node=self.NODE_NAME, vmid=self.VMID, cores=4, digest="def")
+
+    def test_update_config_other_error(self):
+        with patch.object(APIWrapper, "get_vm_config", return_value={"cores": 2, "digest": "abc"}), \
+                patch.object(APIWrapper, "update_vm_config_async", side_effect=Exception("foo")):
+            self.assertRaises(Exception, self.vm.update_config, {"cores": 4})
+
     def test_running_true(self):
         return_value = {"status": "running", "maxdisk": 1000000, "maxmem": 100000}
         with patch.object(APIWrapper, "get_vm_status", return_value=return_value) as target_method:
@@ -59,6 +98,13 @@ class TestProxmoxVM(unittest.TestCase):
             target_method.assert_called_once_with(newid="101", node=self.NODE_NAME, vmid=self.VMID, full="1",
                                                   name="foo", target="other_node_name")
 
+    def test_clone_storage(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "clone_vm", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.vm.clone(newid=200, storage="ceph"))
+            target_method.assert_called_once_with(newid="200", node=self.NODE_NAME, vmid=self.VMID, full="1",
+                                                  storage="ceph")
+
     def test_clone_id_not_int(self):
         self.assertRaises(ValueError, self.vm.clone, newid="foo")
 
@@ -70,12 +116,27 @@ class TestProxmoxVM(unittest.TestCase):
         self.assertRaises(ValueError, self.vm.clone, newid=1_000_000_000)
         self.assertRaises(ValueError, self.vm.clone, newid="1000000000")
 
+    def test_migrate(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "migrate_vm", return_value=return_value) as target_method:
+            self.assertEqual(return_value,
+                             self.vm.migrate("other_node_name", online=True, bwlimit=1024, with_local_disks=True))
+            target_method.assert_called_once_with(target="other_node_name", node=self.NODE_NAME, vmid=self.VMID,
+                                                  online="1", bwlimit="1024", **{"with-local-disks": "1"})
+
     def test_delete(self):
         return_value = "TASKID"
         with patch.object(APIWrapper, "delete_vm", return_value=return_value) as target_method:
             self.assertEqual(return_value, self.vm.delete())
             target_method.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID)
 
+    def test_delete_purge(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "delete_vm", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.vm.delete(purge=True))
+            target_method.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID, purge="1",
+                                                  **{"destroy-unreferenced-disks": "1"})
+
     def test_start(self):
         return_value = "TASKID"
         with patch.object(APIWrapper, "start_vm", return_value=return_value) as target_method:
@@ -118,6 +179,37 @@ class TestProxmoxVM(unittest.TestCase):
             self.assertEqual(self.vm.resume(), return_value)
             target_method.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID)
 
+    def test_list_snapshots(self):
+        return_value = [{"name": "before-upgrade", "snaptime": 1650000000},
+                        {"name": "current", "parent": "before-upgrade"}]
+        with patch.object(APIWrapper, "list_vm_snapshots", return_value=return_value) as target_method:
+            self.assertEqual([{"name": "before-upgrade", "snaptime": 1650000000}], self.vm.list_snapshots())
+            target_method.assert_called_once_with(node=self.NODE_NAME, vmid=self.VMID)
+
+    def test_snapshot(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "create_vm_snapshot", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.vm.snapshot("before-upgrade", description="foo", vmstate=True))
+            target_method.assert_called_once_with(snapname="before-upgrade", node=self.NODE_NAME, vmid=self.VMID,
+                                                  description="foo", vmstate="1")
+
+    def test_snapshot_invalid_name(self):
+        for name in ("1st", "current", "with space", "x"):
+            self.assertRaises(ValueError, self.vm.snapshot, name)
+
+    def test_rollback(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "rollback_vm_snapshot", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.vm.rollback("before-upgrade", start=True))
+            target_method.assert_called_once_with(snapname="before-upgrade", node=self.NODE_NAME, vmid=self.VMID,
+                                                  start="1")
+
+    def test_delete_snapshot(self):
+        return_value = "TASKID"
+        with patch.object(APIWrapper, "delete_vm_snapshot", return_value=return_value) as target_method:
+            self.assertEqual(return_value, self.vm.delete_snapshot("before-upgrade"))
+            target_method.assert_called_once_with(snapname="before-upgrade", node=self.NODE_NAME, vmid=self.VMID)
+
     def test_view_permissions(self):
         return_value = [{"ugid": "foo@pve", "roleid": "Role1", "path": "/vms/100", "type": "user"},
                         {"ugid": "bar@pve", "roleid": "Role2", "path": "/vms/100", "type": "user"}]
@@ -132,7 +224,7 @@ class TestProxmoxVM(unittest.TestCase):
 
     def test_view_permissions_other_data(self):
         return_value = [{"ugid": "foo@pve", "roleid": "Role", "path": "/vms/101", "type": "user"},
-                        {"ugid": "root@pam", "roleid": "Role", "path": "/vms/100", "type": "user"},
+                        {"ugid": "root@pam", "roleid": "Role", "path": "/vms/101", "type": "user"},
                         {"ugid": "token1", "roleid": "Role", "path": "/vms/100", "type": "token"},
                         {"ugid": "foo@pve", "roleid": "Role", "path": "/vms", "type": "user"},
                         {"ugid": "foo@pve", "roleid": "Role", "path": "/nodes/100", "type": "user"}]
@@ -140,6 +232,15 @@ class TestProxmoxVM(unittest.TestCase):
             self.assertEqual([], self.vm.view_permissions())
             target_method.assert_called_once_with()
 
+    def test_view_permissions_other_realms(self):
+        return_value = [{"ugid": "root@pam", "roleid": "Role1", "path": "/vms/100", "type": "user"},
+                        {"ugid": "foo@ldap", "roleid": "Role2", "path": "/vms/100", "type": "user"}]
+        with patch.object(APIWrapper, "get_access_control_list", return_value=return_value) as target_method:
+            perm = self.vm.view_permissions()
+            self.assertEqual(["root@pam", "foo@ldap"], [user.fullid for user, role in perm])
+            self.assertEqual(["Role1", "Role2"], [role for user, role in perm])
+            target_method.assert_called_once_with()
+
     def test_add_permission(self):
         with patch.object(APIWrapper, "update_access_control_list") as target_method:
             self.vm.add_permission(user="foo", role="Role")
@@ -161,8 +262,85 @@ class TestProxmoxVM(unittest.TestCase):
             target_method1.assert_called_once_with()
             self.assertEqual(2, target_method2.call_count)
 
+    def test_remove_all_permissions_other_realms(self):
+        return_value = [{"ugid": "foo@ad", "roleid": "Role1", "path": "/vms/100", "type": "user"}]
+        with patch.object(APIWrapper, "get_access_control_list", return_value=return_value), \
+                patch.object(APIWrapper, "update_access_control_list") as target_method:
+            self.vm.remove_all_permissions()
+            target_method.assert_called_once_with(path="/vms/" + self.VMID, roles="Role1", users="foo@ad", delete="1",
+                                                  propagate="0")
+
+
+class TestProxmoxVMDict(unittest.TestCase):
+    def setUp(self):
+        self.api = APIWrapper("example.com:8006", "root@pam", "TOKEN_NAME", "SECRET_VALUE")
+        self.patchers = [patch.object(APIWrapper, "list_nodes", return_value=[{"node": "node1"}]),
+                         patch.object(APIWrapper, "list_vms", return_value=[{"vmid": 100}, {"vmid": 101}])]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_apply_configs(self):
+        with patch.object(ProxmoxVM, "update_config", side_effect=["TASKID", None]), \
+                patch("proxmoxmanager.utils.classes.vms.run_bulk_action",
+                      wraps=lambda api, targets, action, **kwargs: {vmid: action(targets[vmid]) for vmid in targets}):
+            result = ProxmoxVMDict(self.api).apply_configs({100: {"cores": 4}, 101: {"cores": 4}, 999: {"cores": 4}})
+        self.assertEqual("TASKID", result["100"])
+        self.assertEqual(None, result["101"])
+        self.assertEqual("error", result["999"]["status"])
+
+    def test_remove_many(self):
+        resources = [{"type": "qemu", "vmid": 100, "node": "node1", "status": "running"},
+                     {"type": "qemu", "vmid": 101, "node": "node2", "status": "stopped"},
+                     {"type": "qemu", "vmid": 102, "node": "node2", "status": "running"},
+                     {"type": "lxc", "vmid": 103, "node": "node2", "status": "stopped"}]
+        stop_results = {"100": {"node": "node1", "task": "UPID1", "status": "ok", "error": None},
+                        "102": {"node": "node2", "task": "UPID2", "status": "error", "error": "foo"}}
+        delete_results = {"100": {"node": "node1", "task": "UPID3", "status": "ok", "error": None},
+                          "101": {"node": "node2", "task": "UPID4", "status": "ok", "error": None}}
+        calls = []
+
+        def run_bulk_action(api, targets, action, **kwargs):
+            calls.append(sorted(targets.keys()))
+            return stop_results if len(calls) == 1 else delete_results
+
+        with patch.object(APIWrapper, "list_resources", return_value=resources) as target_method, \
+                patch("proxmoxmanager.utils.classes.vms.run_bulk_action", side_effect=run_bulk_action):
+            result = ProxmoxVMDict(self.api).remove_many([100, 101, "102", 103])
+            target_method.assert_called_once_with(type="vm")
+        self.assertEqual([["100", "102"], ["100", "101"]], calls)
+        self.assertEqual("ok", result["100"]["status"])
+        self.assertEqual("ok", result["101"]["status"])
+        self.assertEqual("Failed to stop: foo", result["102"]["error"])
+        self.assertEqual("error", result["103"]["status"])
+
+    def test_snapshot_many(self):
+        resources = [{"type": "qemu", "vmid": 100, "node": "node1"}, {"type": "qemu", "vmid": 101, "node": "node2"}]
+        with patch.object(APIWrapper, "list_resources", return_value=resources), \
+                patch.object(APIWrapper, "create_vm_snapshot", side_effect=["UPID1", Exception("foo")]), \
+                patch("proxmoxmanager.utils.classes.vms.run_bulk_action",
+                      wraps=lambda api, targets, action, **kwargs: {
+                          vmid: {"task": action(targets[vmid])} for vmid in sorted(targets)}) as target_method:
+            result = ProxmoxVMDict(self.api).snapshot_many([100, 999], "before-upgrade", per_node=1)
+            self.assertEqual(1, target_method.call_args.kwargs["per_node"])
+        self.assertEqual({"task": "UPID1"}, result["100"])
+        self.assertEqual("VM 999 not found", result["999"]["error"])
+        self.assertRaises(ValueError, ProxmoxVMDict(self.api).snapshot_many, [100], "1st")
+
+    def test_rollback_many(self):
+        resources = [{"type": "qemu", "vmid": 100, "node": "node1"}, {"type": "lxc", "vmid": 101, "node": "node2"}]
+        with patch.object(APIWrapper, "list_resources", return_value=resources), \
+                patch.object(APIWrapper, "rollback_vm_snapshot", return_value=True) as target_method, \
+                patch.object(APIWrapper, "list_tasks", return_value=[]):
+            result = ProxmoxVMDict(self.api).rollback_many(["100", "101"], "before-upgrade")
+            target_method.assert_called_once_with(snapname="before-upgrade", node="node1", vmid="100")
+        self.assertEqual("ok", result["100"]["status"])
+        self.assertEqual("VM 101 not found", result["101"]["error"])
 
-# TODO: test ProxmoxVMDict
+    # TODO: write more tests
 
 
 if __name__ == "__main__":